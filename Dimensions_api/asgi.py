@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Dimensions_api.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up. Task event streams are served outside Django, which cannot stream asynchronously.
+from Machine_api.streams import TaskEventsRouter  # noqa: E402
+
+application = TaskEventsRouter(django_application)
@@ -1,6 +1,9 @@
 from __future__ import absolute_import
+import logging
 import os
+import time
 from celery import Celery
+from celery.signals import worker_init
 from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Dimensions_api.settings')
@@ -13,6 +16,34 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
 
+logger = logging.getLogger(__name__)
+
+
+@worker_init.connect
+def preload_worker(sender=None, **kwargs):
+    """
+    Loads pyleecan, its materials and the machine schemas once in the worker's parent process,
+    before the pool processes are forked from it. The time it takes is published per worker hostname.
+    """
+    import redis
+    from pylee_ext.main import preload_pyleecan
+    from Machine_api.LPTN.pylee_setup import get_material_db
+    from Machine_api.redis_client import publish_worker_stat
+    from utils.schema import compile_schemas
+
+    start = time.perf_counter()
+    preload_pyleecan()
+    get_material_db()
+    compile_schemas()
+    seconds = time.perf_counter() - start
+    logger.info('Preloaded pyleecan in %.2f s', seconds)
+    # Published next to the broker, the API reports it at /api/machine/profiling/stats/
+    try:
+        publish_worker_stat('cold_start_seconds', getattr(sender, 'hostname', None) or 'worker', seconds)
+    except redis.RedisError as err:
+        logger.warning('Could not publish the cold start time: %s', err)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print('Request: {0!r}'.format(self.request))
@@ -59,7 +59,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'Machine_api.pagination.IdCursorPagination',
 }
 
 if os.environ.get("AUTHENTIFICATION_CLASS"):
@@ -76,6 +77,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in request profiling, a share of the requests get a Server-Timing header and feed /api/machine/profiling/stats/
+REQUEST_PROFILING = env.bool('REQUEST_PROFILING', default=False)
+REQUEST_PROFILING_SAMPLE_RATE = env.float('REQUEST_PROFILING_SAMPLE_RATE', default=0.05)
+# tracemalloc slows traced requests down several times, only enable it while investigating memory
+REQUEST_PROFILING_TRACEMALLOC = env.bool('REQUEST_PROFILING_TRACEMALLOC', default=False)
+if REQUEST_PROFILING:
+    MIDDLEWARE.insert(0, 'utils.profiling.ProfilingMiddleware')
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -160,12 +169,31 @@ DJOSER = {
 AUTH_USER_MODEL = 'Machine_api.User'
 
 # CELERY SETTINGS
-CELERY_BROKER_URL = 'redis://localhost:6379'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379'
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379')
+CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default='redis://localhost:6379')
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/London'
+# CPU-heavy tasks run on their own queues, each served by workers sized for it (see docker-compose.yml)
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_ROUTES = {
+    'lptn_results_task': {'queue': 'io'},
+    'lptn_*': {'queue': 'lptn'},
+    'create_machine_image_task': {'queue': 'render'},
+    'sweep_variant_task': {'queue': 'lptn'},
+    'sweep_aggregate_task': {'queue': 'io'},
+}
+# Long tasks are not reserved by a busy process while another one is idle
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1)
+
+# Cache of serialized machine trees, keyed by machine revision
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('CACHE_URL', default='redis://localhost:6379/1'),
+    }
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -0,0 +1,22 @@
+"""
+Settings of the API benchmark (manage.py benchmark).
+Uses a SQLite stand-in unless BENCHMARK_DB=postgres, an in-memory cache and runs Celery tasks inline.
+"""
+
+from .settings import *
+
+if env('BENCHMARK_DB', default='sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'benchmark.sqlite3'),
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CELERY_TASK_ALWAYS_EAGER = True
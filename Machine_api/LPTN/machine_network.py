@@ -0,0 +1,619 @@
+"""
+Builds the lumped-parameter thermal network of a machine from its serialized tree
+
+Every solid component is an annulus discretised into n_radial x n_axial ring nodes:
+Shaft, RotorLamInner, RotorMagnet (RotorWinding for wound rotors), RotorLamOuter,
+StatorTooth and StatorWinding side by side in the slot region, StatorBackIron and the WaterJacket (housing).
+Fluids are Airgap (one node per axial slice) and the end spaces EWFluidRotor/EWFluidStator (one node per end).
+Heat leaves the machine through the coolant of the water jacket and the ambient air around the housing.
+"""
+
+import math
+
+import numpy as np
+
+from Machine_api.materials import material_catalog
+from utils.global_functions import InvalidInputError
+from .network import ComponentSummary, ThermalNetwork
+
+# Fallback thermal conductivities [W/mK]
+DEFAULT_CONDUCTIVITY = {
+    "lamination": 28.0,
+    "shaft": 45.0,
+    "magnet": 9.0,
+    "conductor": 400.0,
+    "insulation": 0.2,
+    "housing": 200.0,
+    "air": 0.026,
+}
+# Fallback volumetric heat capacities, density x specific heat [J/m3K]
+DEFAULT_HEAT_CAPACITY = {
+    "lamination": 7650.0 * 460.0,
+    "shaft": 7850.0 * 460.0,
+    "magnet": 7500.0 * 440.0,
+    "conductor": 8960.0 * 385.0,
+    "insulation": 1400.0 * 1000.0,
+    "housing": 2700.0 * 900.0,
+    "air": 1.2 * 1005.0,
+}
+# Fallback heat transfer coefficients [W/m2K], overridden by Cooling.htc {component: htc}
+DEFAULT_HTC = {
+    "Airgap": 80.0,
+    "EWFluidRotor": 40.0,
+    "EWFluidStator": 40.0,
+    "WaterJacket": 2500.0,
+    "Ambient": 10.0,
+    "Contact": 2000.0,
+}
+# Fallback boundary temperatures [degC], overridden by Cooling.flow
+DEFAULT_COOLANT_TEMPERATURE = 65.0
+DEFAULT_AMBIENT_TEMPERATURE = 40.0
+# Fallback proportions for dimensions the serialized tree does not define
+DEFAULT_SLOT_NUMBER = 36
+DEFAULT_SLOT_WIDTH_FRACTION = 0.5
+DEFAULT_SLOT_DEPTH_FRACTION = 0.6
+DEFAULT_FILL_FACTOR = 0.4
+DEFAULT_LINER_THICKNESS = 0.3e-3
+DEFAULT_END_WINDING_FRACTION = 0.3
+MAGNET_LAYER = (0.6, 0.8)
+DEFAULT_MAGNET_FRACTION = 0.7
+# Longest simulated duty cycle [s], one week
+MAX_DUTY_CYCLE_DURATION = 7 * 24 * 3600.0
+# Most segments of a duty cycle, every segment boundary restarts the time stepping
+MAX_DUTY_CYCLE_SEGMENTS = 1000
+
+
+class Annulus:
+    """
+    Ring shaped component discretised into n_radial x n_axial nodes
+
+    Parameters
+    ----------
+    network: ThermalNetwork
+    component: str
+        Component name
+    r_in, r_out: float
+        Inner and outer radius [m]
+    length: float
+        Axial length [m]
+    n_radial, n_axial: int
+        Number of radial layers and axial slices
+    k_radial, k_axial: float
+        Thermal conductivity in radial and axial direction [W/mK]
+    heat_capacity: float
+        Volumetric heat capacity [J/m3K]
+    fraction: float
+        Share of the circumference occupied by the component
+    """
+
+    def __init__(self, network, component, r_in, r_out, length, n_radial, n_axial, k_radial, k_axial, heat_capacity,
+                 fraction=1.0):
+        self.component = component
+        self.radii = np.linspace(r_in, r_out, n_radial + 1)
+        self.r_mid = (self.radii[:-1] + self.radii[1:]) / 2
+        self.dz = length / n_axial
+        self.k_radial = k_radial
+        self.k_axial = k_axial
+        self.fraction = fraction
+        self.area = fraction * math.pi * (self.radii[1:] ** 2 - self.radii[:-1] ** 2)
+        self.nodes = [[network.add_node(component, capacity=heat_capacity * self.area[ir] * self.dz,
+                                        volume=self.area[ir] * self.dz)
+                       for _ in range(n_axial)]
+                      for ir in range(n_radial)]
+
+        for iz in range(n_axial):
+            for ir in range(n_radial - 1):
+                r = math.log(self.r_mid[ir + 1] / self.r_mid[ir]) / (2 * math.pi * k_radial * fraction * self.dz)
+                network.connect(self.nodes[ir][iz], self.nodes[ir + 1][iz], 1 / r)
+        for ir in range(n_radial):
+            g = k_axial * self.area[ir] / self.dz
+            for iz in range(n_axial - 1):
+                network.connect(self.nodes[ir][iz], self.nodes[ir][iz + 1], g)
+
+    @property
+    def n_axial(self):
+        return len(self.nodes[0])
+
+    def surface(self, side):
+        """Returns [(node, surface area, resistance node to surface)] per axial slice of the inner or outer surface"""
+        ir = 0 if side == "inner" else -1
+        r_surface = self.radii[0] if side == "inner" else self.radii[-1]
+        if r_surface <= 0:
+            return []
+        r = abs(math.log(self.r_mid[ir] / r_surface)) / (2 * math.pi * self.k_radial * self.fraction * self.dz)
+        area = 2 * math.pi * r_surface * self.fraction * self.dz
+        return [(self.nodes[ir][iz], area, r) for iz in range(self.n_axial)]
+
+    def end_faces(self, end):
+        """Returns [(node, face area, resistance node to face)] per radial layer of end 0 or 1"""
+        iz = 0 if end == 0 else -1
+        return [(self.nodes[ir][iz], self.area[ir], self.dz / 2 / (self.k_axial * self.area[ir]))
+                for ir in range(len(self.nodes))]
+
+
+def connect_surfaces(network, surface_a, surface_b, contact_resistance=0.0):
+    """Connects two surfaces slice by slice. contact_resistance is per unit area [m2K/W]."""
+    for (node_a, area_a, r_a), (node_b, area_b, r_b) in zip(surface_a, surface_b):
+        area = min(area_a, area_b)
+        network.connect(node_a, node_b, 1 / (r_a + r_b + contact_resistance / area))
+
+
+def connect_convection(network, surface, fluid_nodes, htc):
+    """Connects surface nodes to fluid nodes by convection. fluid_nodes is a list matching surface or a single node."""
+    for index, (node, area, r) in enumerate(surface):
+        fluid = fluid_nodes[index] if isinstance(fluid_nodes, list) else fluid_nodes
+        network.connect(node, fluid, 1 / (r + 1 / (htc * area)))
+
+
+def get_conductivity(material, default):
+    """Returns thermal conductivity of material from the material catalog, default if unknown"""
+    if not material:
+        return default
+    try:
+        return material_catalog.find_thermal_properties(material)["Thermal Conductivity"]
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def get_heat_capacity(material, default):
+    """Returns volumetric heat capacity (Density x Specific Heat) of material from the material catalog, default if unknown"""
+    if not material:
+        return default
+    try:
+        properties = material_catalog.find_thermal_properties(material)
+    except (KeyError, TypeError, ValueError):
+        return default
+    return properties["Density"] * properties["Specific Heat"]
+
+
+def get_winding_heat_capacity(conductor, fill_factor):
+    """Returns volumetric heat capacity of a winding of conductors in insulation"""
+    data = (conductor or {}).get("data") or {}
+    c_c = get_heat_capacity(data.get("ConductorMaterial"), DEFAULT_HEAT_CAPACITY["conductor"])
+    c_i = get_heat_capacity(data.get("InsulationMaterial"), DEFAULT_HEAT_CAPACITY["insulation"])
+    return fill_factor * c_c + (1 - fill_factor) * c_i
+
+
+def get_winding_conductivity(conductor, fill_factor):
+    """
+    Returns equivalent (transverse, axial) conductivity of a winding of conductors in insulation
+
+    Parameters
+    ----------
+    conductor: dict
+        Serialized conductor, may be None
+    fill_factor: float
+        Conductor share of the slot area
+    """
+    data = (conductor or {}).get("data") or {}
+    k_c = get_conductivity(data.get("ConductorMaterial"), DEFAULT_CONDUCTIVITY["conductor"])
+    k_i = get_conductivity(data.get("InsulationMaterial"), DEFAULT_CONDUCTIVITY["insulation"])
+    f = fill_factor
+    k_transverse = k_i * ((1 + f) * k_c + (1 - f) * k_i) / ((1 - f) * k_c + (1 + f) * k_i)
+    k_axial = f * k_c + (1 - f) * k_i
+    return k_transverse, k_axial
+
+
+def get_packing_factor(data):
+    """Returns PackingFactor of a lamination stack, 0.95 if undefined"""
+    packing = data.get("PackingFactor") or 0.95
+    if isinstance(packing, str) or not 0 < packing <= 1:
+        packing = 0.95
+    return packing
+
+
+def get_lamination_conductivity(data, default):
+    """Returns (in-plane, axial) conductivity of a lamination stack with packing factor PackingFactor"""
+    k = get_conductivity(data.get("Material"), default)
+    packing = get_packing_factor(data)
+    k_axial = 1 / (packing / k + (1 - packing) / DEFAULT_CONDUCTIVITY["air"])
+    return k * packing, k_axial
+
+
+def get_lamination_heat_capacity(data):
+    """Returns volumetric heat capacity of a lamination stack"""
+    packing = get_packing_factor(data)
+    c = get_heat_capacity(data.get("Material"), DEFAULT_HEAT_CAPACITY["lamination"])
+    return packing * c + (1 - packing) * DEFAULT_HEAT_CAPACITY["air"]
+
+
+def get_number(data, key, default):
+    """Returns data[key] if it is a positive number, else default"""
+    value = (data or {}).get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+        return default
+    return value
+
+
+def get_slot_depth(slot, stator_thickness):
+    """Returns slot depth as sum of the slot heights H0, H1, ... with a fallback for undefined slots"""
+    data = (slot or {}).get("data") or {}
+    depth = sum(value for key, value in data.items()
+                if key.startswith("H") and isinstance(value, (int, float)) and not isinstance(value, bool))
+    if not 0 < depth < stator_thickness:
+        depth = DEFAULT_SLOT_DEPTH_FRACTION * stator_thickness
+    return depth
+
+
+def get_cooling(machine_dict):
+    """Returns ({component: htc}, coolant temperature, ambient temperature) from the cooling of the machine"""
+    cooling = machine_dict.get("cooling") or {}
+    htc = dict(DEFAULT_HTC)
+    if isinstance(cooling.get("htc"), dict):
+        htc.update({key: value for key, value in cooling["htc"].items() if isinstance(value, (int, float))})
+    flow = cooling.get("flow") if isinstance(cooling.get("flow"), dict) else {}
+    t_coolant = get_number(flow, "InletTemperature", DEFAULT_COOLANT_TEMPERATURE)
+    t_ambient = get_number(flow, "AmbientTemperature", DEFAULT_AMBIENT_TEMPERATURE)
+    return htc, t_coolant, t_ambient
+
+
+def get_losses(machine_dict):
+    """Returns {component: loss [W]} from the loss of the machine"""
+    loss = machine_dict.get("loss") or {}
+    data = loss.get("data")
+    if not isinstance(data, dict):
+        return {}
+    return {key: float(value) for key, value in data.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+def build_machine_network(machine_dict, n_axial=4, n_radial=2):
+    """
+    Creates the thermal network of a machine
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized machine (GetMachineSerializer) after coerce_machine
+    n_axial: int
+        Number of axial slices of every component
+    n_radial: int
+        Number of radial layers of every solid component
+
+    Returns
+    -------
+    network: ThermalNetwork
+    """
+    rotor = machine_dict.get("rotor") or {}
+    stator = machine_dict.get("stator") or {}
+    housing = machine_dict.get("housing") or {}
+    if not rotor.get("data") or not stator.get("data") or not housing.get("data"):
+        raise InvalidInputError("ERROR: LPTN requires rotor, stator and housing dimensions")
+
+    rotor_lam = rotor["data"]
+    stator_lam = stator["data"]
+    frame = housing["data"]
+    try:
+        r_shaft = rotor_lam["InternalRadius"]
+        r_rotor = rotor_lam["ExternalRadius"]
+        r_stator_in = stator_lam["InternalRadius"]
+        r_stator_out = stator_lam["ExternalRadius"]
+        r_housing_in = frame["InternalRadius"]
+        r_housing_out = frame["ExternalRadius"]
+        l_rotor = rotor_lam["CoreLength"]
+        l_stator = stator_lam["CoreLength"]
+    except KeyError as err:
+        raise InvalidInputError(f"ERROR: LPTN input is missing {err}")
+    l_housing = get_number(frame, "FrameLength", l_stator)
+    if not 0 < r_shaft < r_rotor < r_stator_in < r_stator_out <= r_housing_in < r_housing_out:
+        raise InvalidInputError("ERROR: LPTN requires shaft < rotor < airgap < stator <= housing radii")
+
+    htc, t_coolant, t_ambient = get_cooling(machine_dict)
+    losses = get_losses(machine_dict)
+    network = ThermalNetwork()
+    n_radial = max(int(n_radial), 1)
+    n_axial = max(int(n_axial), 1)
+
+    #Rotor
+    k_rotor, k_rotor_axial = get_lamination_conductivity(rotor_lam, DEFAULT_CONDUCTIVITY["lamination"])
+    c_rotor = get_lamination_heat_capacity(rotor_lam)
+    r_layer_in = r_shaft + MAGNET_LAYER[0] * (r_rotor - r_shaft)
+    r_layer_out = r_shaft + MAGNET_LAYER[1] * (r_rotor - r_shaft)
+    k_shaft = DEFAULT_CONDUCTIVITY["shaft"]
+    shaft = Annulus(network, "Shaft", 0.0, r_shaft, l_rotor, n_radial, n_axial, k_shaft, k_shaft,
+                    DEFAULT_HEAT_CAPACITY["shaft"])
+    lam_inner = Annulus(network, "RotorLamInner", r_shaft, r_layer_in, l_rotor, n_radial, n_axial,
+                        k_rotor, k_rotor_axial, c_rotor)
+    if rotor.get("type") == "LamSlot":
+        k_layer, k_layer_axial = get_winding_conductivity(rotor.get("conductor"), DEFAULT_FILL_FACTOR)
+        c_layer = get_winding_heat_capacity(rotor.get("conductor"), DEFAULT_FILL_FACTOR)
+        layer = Annulus(network, "RotorWinding", r_layer_in, r_layer_out, l_rotor, n_radial, n_axial,
+                        k_layer, k_layer_axial, c_layer)
+    else:
+        hole_data = (rotor.get("hole") or {}).get("data") or {}
+        k_magnet = get_conductivity(hole_data.get("Material"), DEFAULT_CONDUCTIVITY["magnet"])
+        c_magnet = get_heat_capacity(hole_data.get("Material"), DEFAULT_HEAT_CAPACITY["magnet"])
+        k_layer = DEFAULT_MAGNET_FRACTION * k_magnet + (1 - DEFAULT_MAGNET_FRACTION) * k_rotor
+        c_layer = DEFAULT_MAGNET_FRACTION * c_magnet + (1 - DEFAULT_MAGNET_FRACTION) * c_rotor
+        layer = Annulus(network, "RotorMagnet", r_layer_in, r_layer_out, l_rotor, n_radial, n_axial,
+                        k_layer, k_layer, c_layer)
+    lam_outer = Annulus(network, "RotorLamOuter", r_layer_out, r_rotor, l_rotor, n_radial, n_axial,
+                        k_rotor, k_rotor_axial, c_rotor)
+    connect_surfaces(network, shaft.surface("outer"), lam_inner.surface("inner"), 1 / htc["Contact"])
+    connect_surfaces(network, lam_inner.surface("outer"), layer.surface("inner"))
+    connect_surfaces(network, layer.surface("outer"), lam_outer.surface("inner"))
+
+    #Stator
+    k_stator, k_stator_axial = get_lamination_conductivity(stator_lam, DEFAULT_CONDUCTIVITY["lamination"])
+    c_stator = get_lamination_heat_capacity(stator_lam)
+    k_winding, k_winding_axial = get_winding_conductivity(stator.get("conductor"), DEFAULT_FILL_FACTOR)
+    c_winding = get_winding_heat_capacity(stator.get("conductor"), DEFAULT_FILL_FACTOR)
+    slot = stator.get("slot") or {}
+    n_slot = int(get_number(slot.get("data"), "Zs", DEFAULT_SLOT_NUMBER))
+    r_slot_bottom = r_stator_in + get_slot_depth(slot, r_stator_out - r_stator_in)
+    f_slot = DEFAULT_SLOT_WIDTH_FRACTION
+    tooth = Annulus(network, "StatorTooth", r_stator_in, r_slot_bottom, l_stator, n_radial, n_axial,
+                    k_stator, k_stator_axial, c_stator, fraction=1 - f_slot)
+    winding = Annulus(network, "StatorWinding", r_stator_in, r_slot_bottom, l_stator, n_radial, n_axial,
+                      k_winding, k_winding_axial, c_winding, fraction=f_slot)
+    back_iron = Annulus(network, "StatorBackIron", r_slot_bottom, r_stator_out, l_stator, n_radial, n_axial,
+                        k_stator, k_stator_axial, c_stator)
+    r_liner = DEFAULT_LINER_THICKNESS / DEFAULT_CONDUCTIVITY["insulation"]
+    for ir in range(n_radial):
+        # Heat crosses the slot liner on both sides of every slot
+        w_slot = f_slot * 2 * math.pi * tooth.r_mid[ir] / n_slot
+        w_tooth = (1 - f_slot) * 2 * math.pi * tooth.r_mid[ir] / n_slot
+        area = 2 * n_slot * (tooth.radii[ir + 1] - tooth.radii[ir]) * tooth.dz
+        r = (r_liner + w_slot / 4 / k_winding + w_tooth / 4 / k_stator) / area
+        for iz in range(n_axial):
+            network.connect(tooth.nodes[ir][iz], winding.nodes[ir][iz], 1 / r)
+    connect_surfaces(network, tooth.surface("outer"), back_iron.surface("inner"))
+    connect_surfaces(network, winding.surface("outer"), back_iron.surface("inner"), r_liner)
+
+    #End windings, one ring of nodes per end
+    l_end_winding = DEFAULT_END_WINDING_FRACTION * l_stator
+    end_windings = []
+    for end in (0, 1):
+        end_nodes = []
+        for node, area, r in winding.end_faces(end):
+            end_node = network.add_node("StatorWinding", capacity=c_winding * area * l_end_winding,
+                                        volume=area * l_end_winding)
+            network.connect(node, end_node, 1 / (r + l_end_winding / 2 / (k_winding_axial * area)))
+            end_nodes.append(end_node)
+        end_windings.append(end_nodes)
+
+    #Housing
+    k_housing = get_conductivity(frame.get("Material"), DEFAULT_CONDUCTIVITY["housing"])
+    c_housing = get_heat_capacity(frame.get("Material"), DEFAULT_HEAT_CAPACITY["housing"])
+    water_jacket = Annulus(network, "WaterJacket", r_housing_in, r_housing_out, l_housing, n_radial, n_axial,
+                           k_housing, k_housing, c_housing)
+    connect_surfaces(network, back_iron.surface("outer"), water_jacket.surface("inner"), 1 / htc["Contact"])
+
+    #Boundaries
+    coolant = network.add_boundary("Coolant", t_coolant)
+    ambient = network.add_boundary("Ambient", t_ambient)
+    r_channel = (r_housing_in + r_housing_out) / 2
+    for ir in range(n_radial):
+        for iz in range(n_axial):
+            area = 2 * math.pi * r_channel * water_jacket.dz / n_radial
+            network.connect(water_jacket.nodes[ir][iz], coolant, htc["WaterJacket"] * area)
+    connect_convection(network, water_jacket.surface("outer"), ambient, htc["Ambient"])
+
+    #Airgap
+    airgap_area = math.pi * (r_stator_in ** 2 - r_rotor ** 2)
+    airgap = [network.add_node("Airgap", capacity=DEFAULT_HEAT_CAPACITY["air"] * airgap_area * lam_outer.dz,
+                               volume=airgap_area * lam_outer.dz)
+              for _ in range(n_axial)]
+    for iz in range(n_axial - 1):
+        network.connect(airgap[iz], airgap[iz + 1], DEFAULT_CONDUCTIVITY["air"] * airgap_area / lam_outer.dz)
+    connect_convection(network, lam_outer.surface("outer"), airgap, htc["Airgap"])
+    connect_convection(network, tooth.surface("inner"), airgap, htc["Airgap"])
+    connect_convection(network, winding.surface("inner"), airgap, 1 / (1 / htc["Airgap"] + r_liner))
+
+    #End spaces
+    r_end_winding_in = r_stator_in
+    r_end_winding_out = r_slot_bottom
+    for end in (0, 1):
+        ew_rotor = network.add_node("EWFluidRotor")
+        ew_stator = network.add_node("EWFluidStator")
+        for part in (shaft, lam_inner, layer, lam_outer):
+            connect_convection(network, part.end_faces(end), ew_rotor, htc["EWFluidRotor"])
+        for part in (tooth, back_iron):
+            connect_convection(network, part.end_faces(end), ew_stator, htc["EWFluidStator"])
+        connect_convection(network, water_jacket.end_faces(end), ew_stator, htc["EWFluidStator"])
+        for ir, end_node in enumerate(end_windings[end]):
+            share = winding.area[ir] / winding.area.sum()
+            area_in = 2 * math.pi * r_end_winding_in * l_end_winding * share
+            area_out = 2 * math.pi * r_end_winding_out * l_end_winding * share
+            network.connect(end_node, ew_rotor, htc["EWFluidRotor"] * area_in)
+            network.connect(end_node, ew_stator, htc["EWFluidStator"] * area_out)
+
+    #Losses
+    for component, loss in losses.items():
+        if component in network.components:
+            nodes = [node for node in network.components[component] if node not in network.boundary]
+            network.add_loss(nodes, loss)
+
+    return network
+
+
+def solve_machine_lptn(machine_dict, n_axial=4, n_radial=2):
+    """
+    Solves the steady state thermal network of a machine
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized machine (GetMachineSerializer) after coerce_machine
+    n_axial: int
+        Number of axial slices of every component
+    n_radial: int
+        Number of radial layers of every solid component
+
+    Returns
+    -------
+    results: dict
+        {component: {"Name", "AvgTemperature", "MaxTemperature", "HeatFluxes"}}
+    """
+    network = build_machine_network(machine_dict, n_axial, n_radial)
+    T = network.solve_steady()
+    return network.component_results(T)
+
+
+def get_finite(value):
+    """Returns value as a float, raises ValueError for inf and nan"""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{value} is not finite")
+    return value
+
+
+def get_point_losses(point, machine_losses):
+    """Returns {component: loss} of an operating point {"losses": {component: W}} or {"scale": factor}"""
+    losses = point.get("losses")
+    if losses is None:
+        scale = get_finite(point.get("scale", 1.0))
+        return {component: loss * scale for component, loss in machine_losses.items()}
+    return {component: get_finite(loss) for component, loss in losses.items()}
+
+
+def get_operating_points(operating_points, machine_losses):
+    """
+    Validates operating points of a batch solve
+
+    Parameters
+    ----------
+    operating_points: list
+        [{"losses": {component: W}}] or [{"scale": factor}], scale multiplies the losses of the machine
+    machine_losses: dict
+        {component: loss [W]} of the machine
+
+    Returns
+    -------
+    points: list
+        [{component: loss}]
+    """
+    if not isinstance(operating_points, list) or not operating_points:
+        raise InvalidInputError("ERROR: operating_points must be a non-empty list")
+    points = []
+    for index, point in enumerate(operating_points):
+        if not isinstance(point, dict):
+            raise InvalidInputError(f"ERROR: operating_points[{index}] must be an object")
+        try:
+            points.append(get_point_losses(point, machine_losses))
+        except (TypeError, ValueError, AttributeError):
+            raise InvalidInputError(f"ERROR: operating_points[{index}] needs numeric losses or scale")
+    return points
+
+
+def get_duty_cycle(duty_cycle, machine_losses):
+    """
+    Converts a duty cycle into segments of constant losses per component
+
+    Parameters
+    ----------
+    duty_cycle: list
+        [{"duration": s, "losses": {component: W}}] or [{"duration": s, "scale": factor}].
+        Segments with scale (default 1) scale the losses of the machine.
+        At most MAX_DUTY_CYCLE_SEGMENTS segments, lasting at most MAX_DUTY_CYCLE_DURATION in total.
+    machine_losses: dict
+        {component: loss [W]} of the machine
+
+    Returns
+    -------
+    segments: list
+        [(duration, {component: loss})]
+    """
+    if not isinstance(duty_cycle, list) or not duty_cycle:
+        raise InvalidInputError("ERROR: duty_cycle must be a non-empty list of segments")
+    if len(duty_cycle) > MAX_DUTY_CYCLE_SEGMENTS:
+        raise InvalidInputError(f"ERROR: duty_cycle must not have more than {MAX_DUTY_CYCLE_SEGMENTS} segments")
+    segments = []
+    for index, segment in enumerate(duty_cycle):
+        if not isinstance(segment, dict):
+            raise InvalidInputError(f"ERROR: duty_cycle[{index}] must be an object")
+        try:
+            duration = get_finite(segment.get("duration"))
+            losses = get_point_losses(segment, machine_losses)
+        except (TypeError, ValueError, AttributeError):
+            raise InvalidInputError(f"ERROR: duty_cycle[{index}] needs a numeric duration and numeric losses or scale")
+        if not duration > 0:
+            raise InvalidInputError(f"ERROR: duty_cycle[{index}] duration must be positive")
+        segments.append((duration, losses))
+    if sum(duration for duration, _ in segments) > MAX_DUTY_CYCLE_DURATION:
+        raise InvalidInputError(f"ERROR: duty_cycle must not last longer than {MAX_DUTY_CYCLE_DURATION:.0f} s")
+    return segments
+
+
+def solve_machine_lptn_transient(machine_dict, duty_cycle, n_axial=4, n_radial=2, n_output=200,
+                                 initial_temperature=None, tol=0.1, progress=None):
+    """
+    Solves the thermal network of a machine over a duty cycle
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized machine (GetMachineSerializer) after coerce_machine
+    duty_cycle: list
+        Segments of constant losses, see get_duty_cycle
+    n_axial: int
+        Number of axial slices of every component
+    n_radial: int
+        Number of radial layers of every solid component
+    n_output: int
+        Number of equally spaced time points of the returned series
+    initial_temperature: float
+        Initial temperature of all nodes [degC], defaults to the coolant temperature
+    tol: float
+        Maximum local error per time step [K]
+    progress: callable
+        Called as progress(t, t_end) after every time step
+
+    Returns
+    -------
+    results: dict
+        {"Mode": "Transient", "Time": [s], "Components": {component: {"AvgTemperature": [], "MaxTemperature": []}},
+        "Steps": int, "Final": {component: {"Name", "AvgTemperature", "MaxTemperature", "HeatFluxes"}}}
+    """
+    network = build_machine_network(machine_dict, n_axial, n_radial)
+    _, t_coolant, _ = get_cooling(machine_dict)
+    if initial_temperature is None:
+        initial_temperature = t_coolant
+
+    segments = get_duty_cycle(duty_cycle, get_losses(machine_dict))
+    t_end = sum(duration for duration, _ in segments)
+    node_segments = [(duration, network.loss_vector(losses)) for duration, losses in segments]
+    output_times = np.linspace(0.0, t_end, max(int(n_output), 2))
+    dt_initial = min(max(t_end / 1000, 1e-2), 10.0)
+
+    series, T = network.solve_transient(node_segments, initial_temperature, output_times, tol=tol,
+                                        dt_initial=dt_initial, progress=progress)
+    results = {"Mode": "Transient"}
+    results.update(series)
+    results["Final"] = network.component_results(T)
+    return results
+
+
+def solve_machine_lptn_batch(machine_dict, operating_points, n_axial=4, n_radial=2):
+    """
+    Solves the steady state of a machine for several operating points with one factorization
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized machine (GetMachineSerializer) after coerce_machine
+    operating_points: list
+        Losses of every operating point, see get_operating_points
+    n_axial: int
+        Number of axial slices of every component
+    n_radial: int
+        Number of radial layers of every solid component
+
+    Returns
+    -------
+    results: dict
+        {"Mode": "Batch", "Components": [component], "AvgTemperature": [[degC per component] per point],
+        "MaxTemperature": [[degC per component] per point]}
+    """
+    network = build_machine_network(machine_dict, n_axial, n_radial)
+    points = get_operating_points(operating_points, get_losses(machine_dict))
+    losses = np.array([network.loss_vector(point) for point in points])
+    T = network.solve_steady_batch(losses)
+    summary = ComponentSummary(network)
+    avg, max_ = summary.batch(T)
+    return {
+        "Mode": "Batch",
+        "Components": summary.names,
+        "AvgTemperature": np.round(avg, 1).tolist(),
+        "MaxTemperature": np.round(max_, 1).tolist(),
+    }
@@ -0,0 +1,378 @@
+"""Sparse lumped-parameter thermal network"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+# Time steps whose factorization is kept during a transient solve
+MAX_TRANSIENT_FACTORIZATIONS = 16
+
+
+class ThermalNetwork:
+    """
+    Thermal network of nodes grouped into named components.
+    Nodes are connected by thermal conductances, boundary nodes have a fixed temperature.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self.node_component = []
+        self.loss = []
+        self.capacity = []
+        self.volume = []
+        self.boundary = {}
+        self._edges_i = []
+        self._edges_j = []
+        self._edges_g = []
+        self._factorization = None
+
+    @property
+    def n_nodes(self):
+        return len(self.node_component)
+
+    def add_node(self, component, loss=0.0, capacity=0.0, volume=0.0):
+        """
+        Adds a node to component
+
+        Parameters
+        ----------
+        component: str
+            Name of the component the node belongs to
+        loss: float
+            Heat generated in the node [W]
+        capacity: float
+            Thermal capacity of the node [J/K]
+        volume: float
+            Volume of the node [m3], used to weigh the component's average temperature
+
+        Returns
+        -------
+        node: int
+            Node index
+        """
+        node = self.n_nodes
+        self.components.setdefault(component, []).append(node)
+        self.node_component.append(component)
+        self.loss.append(loss)
+        self.capacity.append(capacity)
+        self.volume.append(volume)
+        self._factorization = None
+        return node
+
+    def add_boundary(self, component, temperature):
+        """Adds a node with fixed temperature [degC], e.g. coolant inlet or ambient"""
+        node = self.add_node(component)
+        self.boundary[node] = temperature
+        return node
+
+    def connect(self, i, j, conductance):
+        """Connects nodes i and j with conductance [W/K]"""
+        if i == j or not conductance > 0:
+            return
+        self._edges_i.append(i)
+        self._edges_j.append(j)
+        self._edges_g.append(conductance)
+        self._factorization = None
+
+    def add_loss(self, nodes, loss):
+        """Distributes loss [W] over nodes proportionally to their volume"""
+        volumes = np.array([self.volume[node] for node in nodes], dtype=float)
+        if volumes.sum() > 0:
+            shares = volumes / volumes.sum()
+        else:
+            shares = np.full(len(nodes), 1.0 / len(nodes))
+        for node, share in zip(nodes, shares):
+            self.loss[node] += loss * share
+
+    def loss_vector(self, component_losses):
+        """
+        Returns loss per node for losses per component, distributed like add_loss
+
+        Parameters
+        ----------
+        component_losses: dict
+            {component: loss [W]}, unknown components are ignored
+
+        Returns
+        -------
+        loss: array
+            Loss per node [W]
+        """
+        volume = np.array(self.volume, dtype=float)
+        loss = np.zeros(self.n_nodes)
+        for component, component_loss in component_losses.items():
+            nodes = [node for node in self.components.get(component, []) if node not in self.boundary]
+            if not nodes:
+                continue
+            weights = volume[nodes]
+            if weights.sum() > 0:
+                loss[nodes] += component_loss * weights / weights.sum()
+            else:
+                loss[nodes] += component_loss / len(nodes)
+        return loss
+
+    def edges(self):
+        """Returns arrays (i, j, conductance) of all connections"""
+        return (np.array(self._edges_i, dtype=np.int64),
+                np.array(self._edges_j, dtype=np.int64),
+                np.array(self._edges_g, dtype=float))
+
+    def conductance_matrix(self):
+        """Returns the sparse (n_nodes x n_nodes) conductance matrix K, with K @ T = heat leaving each node"""
+        i, j, g = self.edges()
+        rows = np.concatenate((i, j, i, j))
+        cols = np.concatenate((j, i, i, j))
+        vals = np.concatenate((-g, -g, g, g))
+        return sp.csc_matrix((vals, (rows, cols)), shape=(self.n_nodes, self.n_nodes))
+
+    def factorize(self):
+        """
+        Splits the network into free and boundary nodes and factorizes the free part of K.
+        The factorization is reused until the network changes.
+        """
+        if self._factorization is None:
+            fixed = np.array(sorted(self.boundary), dtype=np.int64)
+            free = np.setdiff1d(np.arange(self.n_nodes), fixed)
+            if len(fixed) == 0:
+                raise ValueError("Thermal network needs at least one boundary node")
+            K = self.conductance_matrix()
+            K_ff = K[free][:, free].tocsc()
+            K_fd = K[free][:, fixed].tocsc()
+            T_fixed = np.array([self.boundary[node] for node in fixed], dtype=float)
+            self._factorization = {
+                "free": free,
+                "fixed": fixed,
+                "T_fixed": T_fixed,
+                "K_ff": K_ff,
+                "K_fd": K_fd,
+                "lu": splu(K_ff),
+                "transient": {},
+            }
+        return self._factorization
+
+    def _transient_lu(self, fact, dt):
+        """Returns the factorization of C/dt + K_ff, cached per time step"""
+        cache = fact["transient"]
+        if dt not in cache:
+            if len(cache) >= MAX_TRANSIENT_FACTORIZATIONS:
+                cache.pop(next(iter(cache)))
+            capacity = np.asarray(self.capacity, dtype=float)[fact["free"]]
+            cache[dt] = splu((sp.diags(capacity / dt) + fact["K_ff"]).tocsc())
+        return cache[dt]
+
+    def solve_steady(self, loss=None):
+        """
+        Solves the steady state K T = P
+
+        Parameters
+        ----------
+        loss: array
+            Loss per node [W], defaults to the losses of the network
+
+        Returns
+        -------
+        T: array
+            Temperature per node [degC]
+        """
+        fact = self.factorize()
+        loss = np.asarray(self.loss if loss is None else loss, dtype=float)
+        T = np.empty(self.n_nodes)
+        T[fact["fixed"]] = fact["T_fixed"]
+        T[fact["free"]] = fact["lu"].solve(loss[fact["free"]] - fact["K_fd"] @ fact["T_fixed"])
+        return T
+
+    def solve_steady_batch(self, losses):
+        """
+        Solves the steady state for several loss vectors with a single factorization
+
+        Parameters
+        ----------
+        losses: array
+            (n_points x n_nodes) loss per node [W] of every operating point
+
+        Returns
+        -------
+        T: array
+            (n_points x n_nodes) temperature per node [degC]
+        """
+        fact = self.factorize()
+        losses = np.atleast_2d(np.asarray(losses, dtype=float))
+        T = np.empty((len(losses), self.n_nodes))
+        T[:, fact["fixed"]] = fact["T_fixed"]
+        rhs = losses[:, fact["free"]].T - (fact["K_fd"] @ fact["T_fixed"])[:, None]
+        T[:, fact["free"]] = fact["lu"].solve(np.ascontiguousarray(rhs)).T
+        return T
+
+    def solve_transient(self, segments, T_initial, output_times, tol=0.1, dt_initial=1.0, dt_min=1e-3, dt_max=None,
+                        progress=None):
+        """
+        Solves C dT/dt + K T = P(t) with adaptive backward Euler steps.
+        The local error is estimated by step doubling and the step size is halved or doubled to keep it below tol.
+        Step sizes stay powers of two of dt_initial so their factorizations are reused.
+
+        Parameters
+        ----------
+        segments: list
+            [(duration [s], loss per node [W])], losses are constant within a segment
+        T_initial: float or array
+            Initial temperature of the free nodes [degC]
+        output_times: array
+            Sorted times at which component temperatures are recorded [s]
+        tol: float
+            Maximum local error per step [K]
+        dt_initial, dt_min, dt_max: float
+            Initial, minimum and maximum time step [s]
+        progress: callable
+            Called as progress(t, t_end) after every accepted step
+
+        Returns
+        -------
+        series: dict
+            {"Time": list, "Components": {component: {"AvgTemperature": list, "MaxTemperature": list}}, "Steps": int}
+        T: array
+            Temperature per node at the end of the last segment [degC]
+        """
+        fact = self.factorize()
+        free = fact["free"]
+        capacity = np.asarray(self.capacity, dtype=float)[free]
+        boundary_heat = fact["K_fd"] @ fact["T_fixed"]
+        t_end = float(sum(duration for duration, _ in segments))
+        dt_max = dt_max or t_end
+        output_times = np.asarray(output_times, dtype=float)
+
+        T = np.empty(self.n_nodes)
+        T[fact["fixed"]] = fact["T_fixed"]
+        T[free] = T_initial
+        summary = ComponentSummary(self)
+        records = []
+        i_out = 0
+        while i_out < len(output_times) and output_times[i_out] <= 0:
+            records.append(summary(T))
+            i_out += 1
+
+        def step(T_free, rhs_loss, dt):
+            return self._transient_lu(fact, dt).solve(capacity / dt * T_free + rhs_loss)
+
+        t = 0.0
+        dt = dt_initial
+        n_steps = 0
+        segment_end = 0.0
+        for duration, loss in segments:
+            segment_end += duration
+            rhs_loss = np.asarray(loss, dtype=float)[free] - boundary_heat
+            while segment_end - t > 1e-9 * max(t_end, 1.0):
+                h = min(dt, segment_end - t)
+                T_free = T[free]
+                full = step(T_free, rhs_loss, h)
+                half = step(step(T_free, rhs_loss, h / 2), rhs_loss, h / 2)
+                error = np.abs(full - half).max() if len(full) else 0.0
+                if error > tol and h / 2 >= dt_min:
+                    dt = h / 2
+                    continue
+
+                T_previous = T.copy()
+                # Richardson extrapolation of the two solutions
+                T[free] = 2 * half - full
+                t_previous = t
+                t += h
+                n_steps += 1
+                while i_out < len(output_times) and output_times[i_out] <= t + 1e-9:
+                    weight = (output_times[i_out] - t_previous) / h
+                    records.append(summary(T_previous + weight * (T - T_previous)))
+                    i_out += 1
+                if progress is not None:
+                    progress(t, t_end)
+                if h == dt and error < tol / 4 and dt * 2 <= dt_max:
+                    dt *= 2
+
+        names = summary.names
+        avg = np.array([record[0] for record in records]).reshape(len(records), len(names))
+        max_ = np.array([record[1] for record in records]).reshape(len(records), len(names))
+        series = {
+            "Time": [float(t_out) for t_out in output_times[:len(records)]],
+            "Components": {
+                name: {
+                    "AvgTemperature": np.round(avg[:, index], 1).tolist(),
+                    "MaxTemperature": np.round(max_[:, index], 1).tolist(),
+                }
+                for index, name in enumerate(names)
+            },
+            "Steps": n_steps,
+        }
+        return series, T
+
+    def component_results(self, T):
+        """
+        Summarises node temperatures per component
+
+        Parameters
+        ----------
+        T: array
+            Temperature per node [degC]
+
+        Returns
+        -------
+        results: dict
+            {component: {"Name", "AvgTemperature", "MaxTemperature", "HeatFluxes": {other component: W flowing in}}}
+        """
+        names = [name for name, nodes in self.components.items() if not all(node in self.boundary for node in nodes)]
+        comp_index = {name: index for index, name in enumerate(self.components)}
+        node_comp = np.array([comp_index[name] for name in self.node_component], dtype=np.int64)
+        volume = np.array(self.volume, dtype=float)
+
+        i, j, g = self.edges()
+        q = g * (T[j] - T[i])
+        n_comp = len(comp_index)
+        fluxes = np.zeros((n_comp, n_comp))
+        np.add.at(fluxes, (node_comp[i], node_comp[j]), q)
+        np.add.at(fluxes, (node_comp[j], node_comp[i]), -q)
+        connected = np.zeros((n_comp, n_comp), dtype=bool)
+        connected[node_comp[i], node_comp[j]] = True
+        connected[node_comp[j], node_comp[i]] = True
+
+        component_names = list(comp_index)
+        results = {}
+        for name in sorted(names):
+            nodes = self.components[name]
+            T_comp = T[nodes]
+            weights = volume[nodes]
+            avg = np.average(T_comp, weights=weights) if weights.sum() > 0 else T_comp.mean()
+            row = comp_index[name]
+            heat_fluxes = {
+                component_names[col]: float(fluxes[row, col])
+                for col in np.flatnonzero(connected[row])
+                if col != row
+            }
+            results[name] = {
+                "AvgTemperature": round(float(avg), 1),
+                "HeatFluxes": dict(sorted(heat_fluxes.items())),
+                "MaxTemperature": round(float(T_comp.max()), 1),
+                "Name": name,
+            }
+        return results
+
+
+class ComponentSummary:
+    """Computes volume weighted average and maximum temperature of every non-boundary component"""
+
+    def __init__(self, network):
+        volume = np.array(network.volume, dtype=float)
+        self.names = sorted(name for name, nodes in network.components.items()
+                            if not all(node in network.boundary for node in nodes))
+        self.nodes = [np.array(network.components[name], dtype=np.int64) for name in self.names]
+        self.weights = []
+        for nodes in self.nodes:
+            weights = volume[nodes]
+            self.weights.append(weights / weights.sum() if weights.sum() > 0 else np.full(len(nodes), 1 / len(nodes)))
+
+    def __call__(self, T):
+        avg = [float(T[nodes] @ weights) for nodes, weights in zip(self.nodes, self.weights)]
+        max_ = [float(T[nodes].max()) for nodes in self.nodes]
+        return avg, max_
+
+    def batch(self, T):
+        """Returns (n_points x n_components) average and maximum temperatures of (n_points x n_nodes) T"""
+        T = np.atleast_2d(T)
+        avg = np.column_stack([T[:, nodes] @ weights for nodes, weights in zip(self.nodes, self.weights)])
+        max_ = np.column_stack([T[:, nodes].max(axis=1) for nodes in self.nodes])
+        return avg, max_
@@ -1,4 +1,7 @@
+import functools
 import os
+import threading
+import time
 from pyleecan.Functions.load import load
 from pyleecan.Classes.MachineIPMSM import MachineIPMSM
 from pyleecan.Classes.LamHole import LamHole
@@ -7,6 +10,9 @@ from pyleecan.Classes.Frame import Frame
 from pyleecan.Classes.Shaft import Shaft
 from pyleecan.Classes.Winding import Winding
 from pyleecan.Functions.Load.import_class import import_class
+from utils import metrics
+
+MATERIAL_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "Input", "Material")
 
 def convert_dict_to_floats(d):
     """
@@ -49,29 +55,127 @@ def convert_list_to_dict(lst, key):
         new_dict[getattr(elem,key)] = elem
     return new_dict
 
-def get_material_db(material_dir):
+class MaterialRegistry:
     """
-    Creates pyleecan material database from json files located in material_dir
+    Pyleecan materials of a folder, each loaded on first lookup by name and kept for the lifetime of the process.
+    Files are reloaded only when their modification time changes.
+    Materials are shared by every caller and must not be modified, use copy() for a material that can be.
 
     Parameters
     ----------
     material_dir: str
-        Folder containing material files in json format
+        Folder containing the pyleecan materials in json format
+    check_interval: float
+        Minimum time in seconds between two checks of the files' modification times
+    """
+
+    def __init__(self, material_dir=MATERIAL_DIR, check_interval=2.0):
+        self.material_dir = material_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._mtimes = {}
+        self._loaded = {}
+        self._names = {}
+
+    def _scan(self):
+        """Returns {file name: modification time} of all json files in material_dir"""
+        mtimes = {}
+        try:
+            entries = os.scandir(self.material_dir)
+        except FileNotFoundError:
+            return mtimes
+        with entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith("json"):
+                    mtimes[entry.name] = entry.stat().st_mtime_ns
+        return mtimes
+
+    def refresh(self, force=False):
+        """Forgets materials whose file changed or was removed. Returns True if any file changed."""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            mtimes = self._scan()
+            if mtimes == self._mtimes:
+                return False
+            for file_name, (mtime, _) in list(self._loaded.items()):
+                if mtimes.get(file_name) != mtime:
+                    del self._loaded[file_name]
+            self._names = {name: file_name for name, file_name in self._names.items() if file_name in self._loaded}
+            self._mtimes = mtimes
+            return True
+
+    def _load(self, file_name):
+        """Returns the material of file_name, loading it if not loaded since its last change"""
+        if file_name in self._loaded:
+            return self._loaded[file_name][1]
+        material = load(os.path.join(self.material_dir, file_name))
+        metrics.incr("material_registry.load")
+        self._loaded[file_name] = (self._mtimes[file_name], material)
+        self._names[material.name] = file_name
+        return material
+
+    def get(self, name, default=None):
+        """Returns the material called name, default if there is none"""
+        self.refresh()
+        with self._lock:
+            # Files are named after their material, only otherwise every file is loaded to find it
+            file_name = self._names.get(name)
+            if file_name is None and f"{name}.json" in self._mtimes:
+                file_name = f"{name}.json"
+                self._load(file_name)
+            if self._names.get(name) is None:
+                for file_name in self._mtimes:
+                    self._load(file_name)
+            file_name = self._names.get(name)
+            return self._loaded[file_name][1] if file_name is not None else default
+
+    def __getitem__(self, name):
+        material = self.get(name)
+        if material is None:
+            raise KeyError(name)
+        return material
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def copy(self, name):
+        """Returns a copy of the material called name that can be modified. Raises KeyError if unknown."""
+        return self[name].copy()
+
+    def values(self):
+        """Returns all materials"""
+        self.refresh()
+        with self._lock:
+            return [self._load(file_name) for file_name in sorted(self._mtimes)]
+
+
+@functools.lru_cache(maxsize=None)
+def get_material_registry(material_dir=MATERIAL_DIR):
+    """Returns the registry of material_dir, shared by the whole process"""
+    return MaterialRegistry(os.path.realpath(material_dir))
+
+
+def get_material_db(material_dir=MATERIAL_DIR):
+    """
+    Returns the pyleecan materials of the json files located in material_dir.
+    Each file is loaded once per process and again only after it changed.
+
+    Parameters
+    ----------
+    material_dir: str
+        Folder containing the material files
 
     Returns
     -------
     material_db: list
         List containing pyleecan materials
     """
-
-    material_db = []
-    for fname in os.listdir(material_dir):
-        if fname.endswith('json'):
-            path = os.path.join(material_dir, fname)
-            material = load(path)
-            material_db.append(material)
-
-    return material_db
+    return get_material_registry(material_dir).values()
 
 def json_to_pyleecan(inp_dict, material_db):
     """
@@ -81,6 +185,8 @@ def json_to_pyleecan(inp_dict, material_db):
     ----------
     inp_dict: dict
         Frontend User Input
+    material_db: MaterialRegistry or list
+        Registry or list of pyleecan materials
 
     Returns
     -------
@@ -96,7 +202,10 @@ def json_to_pyleecan(inp_dict, material_db):
     inp_slot = inp_stator.get("slot")
     inp_cond = inp_stator.get("conductor")
     inp_frame = inp_dict["housing"]["data"]
-    material_dict = convert_list_to_dict(material_db, 'name')
+    if isinstance(material_db, MaterialRegistry):
+        material_dict = material_db
+    else:
+        material_dict = convert_list_to_dict(material_db, 'name')
 
     #Convert input types
     inp_hole["data"]["Zh"] = int(inp_hole["data"]["Zh"])
@@ -1,6 +1,6 @@
 import os
 import json
-from .pylee_setup import get_material_db, json_to_pyleecan, convert_dict_to_floats
+from .pylee_setup import get_material_registry, json_to_pyleecan, convert_dict_to_floats
 # from pylee_setup import get_material_db, json_to_pyleecan, convert_dict_to_floats
 import boto3
 
@@ -24,7 +24,7 @@ def create_machine_image(machine_dict):
 
     #Convert user input to pyleecan format
     # machine_dict = json.load(os.path.join('Debug', 'machine.json'))
-    material_db = get_material_db(os.path.join(lptn_root, "Input", "Material"))
+    material_db = get_material_registry(os.path.join(lptn_root, "Input", "Material"))
     machine = json_to_pyleecan(machine_dict, material_db)
 
     #Check machine
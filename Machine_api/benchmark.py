@@ -0,0 +1,247 @@
+"""
+Benchmark of the heavy API endpoints on synthetic data, run with manage.py benchmark.
+Seeds organisations, projects and machines at a given scale and measures latency, allocations and SQL queries
+of each endpoint. Results are compared against a stored baseline to catch regressions.
+"""
+
+import math
+import time
+import tracemalloc
+
+import redis
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.test import APIClient
+
+from utils.profiling import percentile
+
+from .clone import MAX_CLONES, clone_machine
+from .models import Conductor, Cooling, Hole, Housing, Loss, Machine, Organisation, Project, Rotor, Slot, Stator, User, Winding
+from .redis_client import get_redis
+
+MACHINES_PER_PROJECT = 50
+PROJECTS_PER_ORGANISATION = 20
+# Absolute latency increase always allowed [ms], the p95 of fast endpoints is dominated by noise
+LATENCY_SLACK_MS = 5.0
+# Endpoints coordinating through Redis, skipped if it is not available
+REDIS_ENDPOINTS = ('create_machine_image',)
+# Complete IPMSM whose copies populate the benchmark database
+BENCHMARK_MACHINE = {
+    'stator': {
+        'type': 'LamSlot',
+        'data': {'CoreLength': 0.1, 'ExternalRadius': 0.1, 'InternalRadius': 0.06, 'PackingFactor': 0.95, 'Material': 'M400-50A'},
+        'slot': {'type': 'SlotW11', 'data': {'Zs': 48, 'H0': 0.001, 'H1': 0.0, 'H2': 0.02, 'W0': 0.002, 'W1': 0.005, 'W2': 0.004}},
+        'winding': {'type': 'Winding', 'data': {}},
+        'conductor': {'type': 'CondType12', 'data': {'ConductorMaterial': 'Copper1', 'InsulationMaterial': 'Insulator1'}},
+    },
+    'rotor': {
+        'type': 'LamHole',
+        'data': {'CoreLength': 0.1, 'ExternalRadius': 0.059, 'InternalRadius': 0.02, 'PackingFactor': 0.95, 'Material': 'M400-50A'},
+        'hole': {'type': 'HoleM50', 'data': {'Zh': 8, 'Material': 'MagnetPrius'}},
+    },
+    'housing': {'type': 'Frame', 'data': {'FrameLength': 0.14, 'InternalRadius': 0.1, 'ExternalRadius': 0.11, 'Material': 'Aluminium'}},
+    'cooling': {'type': 'WaterJacket', 'htc': {'WaterJacket': 3000}, 'flow': {'InletTemperature': 65}},
+    'loss': {'type': 'Loss', 'data': {'StatorWinding': 800, 'StatorTooth': 150, 'StatorBackIron': 150, 'RotorMagnet': 40}},
+}
+
+
+def create_benchmark_machine(project, owner):
+    """Creates the machine copied by seed"""
+    components = {}
+    for name, model in (('stator', Stator), ('rotor', Rotor)):
+        inp = BENCHMARK_MACHINE[name]
+        children = {child: child_model.objects.create(**inp[child])
+                    for child, child_model in (('slot', Slot), ('winding', Winding), ('conductor', Conductor), ('hole', Hole))
+                    if child in inp}
+        components[name] = model.objects.create(type=inp['type'], data=inp['data'], **children)
+    return Machine.objects.create(
+        name='Machine 0', project=project, owner=owner,
+        housing=Housing.objects.create(**BENCHMARK_MACHINE['housing']),
+        cooling=Cooling.objects.create(**BENCHMARK_MACHINE['cooling']),
+        loss=Loss.objects.create(**BENCHMARK_MACHINE['loss']),
+        **components,
+    )
+
+
+def seed(n_machines):
+    """
+    Creates n_machines machines, MACHINES_PER_PROJECT per project and PROJECTS_PER_ORGANISATION per organisation
+
+    Returns
+    -------
+    data: dict
+        {"user", "organisations": [ids], "projects": [ids], "machines": [ids]}
+    """
+    user = User.objects.create_user('benchmark@example.com', 'Benchmark', password='benchmark')
+    n_projects = math.ceil(n_machines / MACHINES_PER_PROJECT)
+    projects = Project.objects.bulk_create([Project(name=f'Project {index}', owner=user) for index in range(n_projects)])
+    organisations = []
+    for start in range(0, n_projects, PROJECTS_PER_ORGANISATION):
+        organisation = Organisation.objects.create(name=f'Organisation {len(organisations)}')
+        organisation.projects.add(*projects[start:start + PROJECTS_PER_ORGANISATION])
+        organisations.append(organisation)
+
+    machine = create_benchmark_machine(projects[0], user)
+    overrides = [{'name': f'Machine {index}', 'project': projects[index // MACHINES_PER_PROJECT].id}
+                 for index in range(1, n_machines)]
+    machine_ids = [machine.id]
+    for start in range(0, len(overrides), MAX_CLONES):
+        machine_ids += [ids['id'] for ids in clone_machine(machine, overrides[start:start + MAX_CLONES])]
+    return {
+        'user': user,
+        'organisations': [organisation.id for organisation in organisations],
+        'projects': [project.id for project in projects],
+        'machines': machine_ids,
+    }
+
+
+def get_endpoints(data):
+    """Returns {name: (method, url, body)} of the benchmarked endpoints for seeded data"""
+    machine_id = data['machines'][0]
+    first_organisation = data['projects'][:PROJECTS_PER_ORGANISATION]
+    return {
+        'list_total': ('get', '/api/machine/dimensions/list_total/', None),
+        'get_org_projects': ('get', f"/api/machine/organisation/{data['organisations'][0]}/get_org_projects/", None),
+        'get_projects_machines': ('post', '/api/machine/dimensions/projects/get-machines/', {'project_ids': first_organisation}),
+        'total': ('get', f'/api/machine/dimensions/{machine_id}/total/', None),
+        'create_machine_image': ('get', f'/api/machine/dimensions/{machine_id}/create_machine_image/', None),
+        'get_materials': ('get', '/api/machine/dimensions/get_materials/', None),
+    }
+
+
+class QueryCounter:
+    """Execute wrapper counting the SQL queries of a connection. Unlike connection.queries it is not capped."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(client, method, url, body=None, repeat=5):
+    """
+    Requests an endpoint repeat times with an empty cache
+
+    Returns
+    -------
+    result: dict
+        {"status", "queries", "latency_ms": {"min", "median", "p95", "max"}, "peak_alloc_kb", "response_kb"}
+    """
+    def request():
+        cache.clear()
+        response = getattr(client, method)(url, body, format='json')
+        # Streamed responses are produced while they are read, only their size is kept
+        if response.streaming:
+            return response, sum(len(part) for part in response.streaming_content)
+        return response, len(response.content)
+
+    timings = []
+    for _ in range(repeat):
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            start = time.perf_counter()
+            response, size = request()
+            timings.append((time.perf_counter() - start) * 1000)
+    # Allocations are measured on a separate request, tracing slows requests down
+    tracemalloc.start()
+    try:
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'queries': queries.count,
+        'latency_ms': {'min': min(timings), 'median': percentile(timings, 50), 'p95': percentile(timings, 95),
+                       'max': max(timings)},
+        'peak_alloc_kb': round(peak / 1024, 1),
+        'response_kb': round(size / 1024, 1),
+    }
+
+
+def run_benchmark(n_machines, repeat=5, endpoints=None):
+    """
+    Seeds n_machines machines and measures the endpoints. Must run in a transaction that is rolled back afterwards.
+
+    Parameters
+    ----------
+    n_machines: int
+        Number of seeded machines
+    repeat: int
+        Number of timed requests per endpoint
+    endpoints: list
+        Names of the measured endpoints, default: all
+
+    Returns
+    -------
+    results: dict
+        {endpoint: result of measure}, {"skipped": reason} for endpoints whose services are not available
+    """
+    data = seed(n_machines)
+    client = APIClient()
+    client.force_authenticate(user=data['user'])
+    try:
+        get_redis().ping()
+        redis_error = None
+    except redis.RedisError as err:
+        redis_error = err
+    results = {}
+    for name, (method, url, body) in get_endpoints(data).items():
+        if endpoints is not None and name not in endpoints:
+            continue
+        if name in REDIS_ENDPOINTS and redis_error is not None:
+            results[name] = {'skipped': f'Redis is not available: {redis_error}'}
+        else:
+            results[name] = measure(client, method, url, body, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, latency_tolerance=1.0):
+    """
+    Returns the regressions of results against baseline
+
+    Parameters
+    ----------
+    results, baseline: dict
+        {scale: {endpoint: result of measure}}. Query counts, the p95 latency and the peak allocations of the
+        baseline are budgets, latency and allocations are compared only if the baseline contains them.
+    tolerance: float
+        Allowed relative increase of allocations
+    latency_tolerance: float
+        Allowed relative increase of the p95 latency, larger as it depends on the machine running the benchmark.
+        LATENCY_SLACK_MS is allowed in addition.
+
+    Returns
+    -------
+    regressions: list
+        Description of each regression
+    """
+    regressions = []
+    for scale, endpoints in baseline.items():
+        for name, expected in endpoints.items():
+            actual = results.get(scale, {}).get(name)
+            if actual is None or 'skipped' in actual or 'skipped' in expected:
+                continue
+            if actual['status'] >= 400:
+                regressions.append(f"{name} at {scale} machines: status {actual['status']}")
+            if actual['queries'] > expected['queries']:
+                regressions.append(f"{name} at {scale} machines: {actual['queries']} queries, budget {expected['queries']}")
+            budget = expected.get('latency_ms', {}).get('p95')
+            if budget is not None and actual['latency_ms']['p95'] > budget * (1 + latency_tolerance) + LATENCY_SLACK_MS:
+                regressions.append(f"{name} at {scale} machines: p95 {actual['latency_ms']['p95']:.1f} ms, "
+                                   f"baseline {expected['latency_ms']['p95']:.1f} ms")
+            if 'peak_alloc_kb' in expected and actual['peak_alloc_kb'] > expected['peak_alloc_kb'] * (1 + tolerance):
+                regressions.append(f"{name} at {scale} machines: {actual['peak_alloc_kb']} kB allocated, "
+                                   f"baseline {expected['peak_alloc_kb']} kB")
+    return regressions
+
+
+def get_baseline(results):
+    """Returns the baseline of results: the query count, p95 latency and peak allocations per scale and endpoint"""
+    return {scale: {name: {'queries': result['queries'], 'latency_ms': {'p95': round(result['latency_ms']['p95'], 1)},
+                           'peak_alloc_kb': result['peak_alloc_kb']}
+                    for name, result in endpoints.items() if 'skipped' not in result}
+            for scale, endpoints in results.items()}
@@ -0,0 +1,54 @@
+"""
+Read-through cache of machine trees and LPTN results, built on the revision-keyed responses of etag.py.
+
+Entries are stored in the Django cache under the ETag of the machine's revision. Saving or deleting any row of a
+machine's tree bumps the revision of every machine referencing it (signals.py), so changed machines are read under
+a new key and their old entries expire on their own.
+"""
+
+import json
+
+from .etag import cached_json_response, get_cached_json, get_etag
+from .models import Machine
+from .serializers import GetMachineSerializer
+
+
+def get_revision(machine_id):
+    """Returns the revision of a machine. Raises Machine.DoesNotExist."""
+    revision = Machine.objects.filter(pk=machine_id).values_list('revision', flat=True).first()
+    if revision is None:
+        raise Machine.DoesNotExist(f'Machine {machine_id} does not exist')
+    return revision
+
+
+def get_tree_etag(machine_id, revision):
+    return get_etag('machine', str(machine_id), revision)
+
+
+def load_tree(machine_id):
+    """Returns the serialized tree of a machine"""
+    return GetMachineSerializer(Machine.objects.with_tree().get(pk=machine_id)).data
+
+
+def load_lptn_result(machine_id):
+    """Returns the LPTN result of a machine, None if it has none"""
+    machine = Machine.objects.select_related('lptn').get(pk=machine_id)
+    return machine.lptn.result if machine.lptn_id else None
+
+
+def tree_response(request, machine_id):
+    """Returns the json response of a machine's tree, see etag.cached_json_response. Raises Machine.DoesNotExist."""
+    etag = get_tree_etag(machine_id, get_revision(machine_id))
+    return cached_json_response(request, etag, lambda: load_tree(machine_id))
+
+
+def lptn_result_response(request, machine_id):
+    """Returns the json response of a machine's LPTN result. Raises Machine.DoesNotExist."""
+    etag = get_etag('machine_result', machine_id, get_revision(machine_id))
+    return cached_json_response(request, etag, lambda: load_lptn_result(machine_id))
+
+
+def get_machine_tree(machine_id):
+    """Returns the serialized tree of a machine, sharing the cached entry of tree_response. Raises Machine.DoesNotExist."""
+    etag = get_tree_etag(machine_id, get_revision(machine_id))
+    return json.loads(get_cached_json(etag, lambda: load_tree(machine_id)))
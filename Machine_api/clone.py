@@ -0,0 +1,149 @@
+"""Deep copies of machines, creating every component of the tree with one INSERT per table"""
+
+from django.db import models, transaction
+
+from .models import Conductor, Cooling, Hole, Housing, Loss, Machine, Project, Rotor, Slot, Stator, Winding
+
+MAX_CLONES = 100
+LAMINATIONS = {
+    'stator': (Stator, {'slot': Slot, 'winding': Winding, 'conductor': Conductor}),
+    'rotor': (Rotor, {'slot': Slot, 'winding': Winding, 'conductor': Conductor, 'hole': Hole}),
+}
+COMPONENTS = {'housing': Housing, 'cooling': Cooling, 'loss': Loss}
+
+
+def get_value_fields(model):
+    """Returns the names of the copied fields of model, i.e. all but the id and foreign keys"""
+    return [field.name for field in model._meta.concrete_fields
+            if not field.primary_key and not isinstance(field, models.ForeignKey)]
+
+
+def copy_row(model, source, override, path):
+    """
+    Returns an unsaved copy of source with override applied, None if there is neither
+
+    Parameters
+    ----------
+    model: Model
+        Model of the row
+    source: Model instance
+        Row to copy, may be None
+    override: dict
+        {field: value}, json objects are merged into the copied object, other values replace it
+    path: str
+        Location of override, used in error messages
+    """
+    if source is None and override is None:
+        return None
+    if override is not None and not isinstance(override, dict):
+        raise ValueError(f'{path} must be an object')
+    fields = get_value_fields(model)
+    values = {name: getattr(source, name) for name in fields} if source is not None else {}
+    for name, value in (override or {}).items():
+        if name not in fields:
+            raise ValueError(f'{path}.{name} is not a field of {model.__name__}')
+        if isinstance(value, dict) and isinstance(values.get(name), dict):
+            value = {**values[name], **value}
+        values[name] = value
+    return model(**values)
+
+
+def clone_machine(machine, overrides, owner=None):
+    """
+    Creates one copy of machine per entry in overrides. LPTN results are not copied.
+
+    Parameters
+    ----------
+    machine: Machine
+        Source machine, best loaded with Machine.objects.with_tree()
+    overrides: list
+        One dict per copy: {"name", "project", "stator": {"type", "data", "slot": {...}, ...}, "housing": {...}, ...}
+    owner: User
+        Owner of the copies, default: owner of machine
+
+    Returns
+    -------
+    ids: list
+        {"id", "stator": {"id", "slot", "winding", "conductor"}, "rotor": {...}, "housing", "cooling", "loss"} per copy
+    """
+    allowed = {'name', 'project', *LAMINATIONS, *COMPONENTS}
+    for index, override in enumerate(overrides):
+        if not isinstance(override, dict):
+            raise ValueError(f'overrides[{index}] must be an object')
+        unknown = set(override) - allowed
+        if unknown:
+            raise ValueError(f'overrides[{index}] has unknown keys {sorted(unknown)}')
+    projects = {override['project'] for override in overrides if 'project' in override}
+    if projects:
+        if not all(isinstance(project, int) and not isinstance(project, bool) for project in projects):
+            raise ValueError('project must be a project id')
+        missing = projects - set(Project.objects.filter(pk__in=projects).values_list('id', flat=True))
+        if missing:
+            raise ValueError(f'Projects {sorted(missing)} do not exist')
+
+    # Unsaved rows per model, and per copy the rows each foreign key points to
+    rows = {}
+    links = []
+    for index, override in enumerate(overrides):
+        copy_links = {}
+        for name, (model, leaves) in LAMINATIONS.items():
+            lamination = getattr(machine, name)
+            lamination_override = override.get(name) or {}
+            if not isinstance(lamination_override, dict):
+                raise ValueError(f'overrides[{index}].{name} must be an object')
+            leaf_links = {}
+            for leaf, leaf_model in leaves.items():
+                row = copy_row(leaf_model, getattr(lamination, leaf) if lamination else None,
+                               lamination_override.get(leaf), f'overrides[{index}].{name}.{leaf}')
+                if row is not None:
+                    rows.setdefault(leaf_model, []).append(row)
+                leaf_links[leaf] = row
+            values = {key: value for key, value in lamination_override.items() if key not in leaves}
+            copy_links[name] = (copy_row(model, lamination, values if lamination_override else None,
+                                         f'overrides[{index}].{name}'), leaf_links)
+        for name, model in COMPONENTS.items():
+            row = copy_row(model, getattr(machine, name), override.get(name), f'overrides[{index}].{name}')
+            if row is not None:
+                rows.setdefault(model, []).append(row)
+            copy_links[name] = row
+        links.append(copy_links)
+
+    with transaction.atomic():
+        for model, model_rows in rows.items():
+            model.objects.bulk_create(model_rows)
+
+        for name, (model, _) in LAMINATIONS.items():
+            laminations = []
+            for copy_links in links:
+                lamination, leaf_links = copy_links[name]
+                if lamination is not None:
+                    for leaf, row in leaf_links.items():
+                        setattr(lamination, leaf, row)
+                    laminations.append(lamination)
+            model.objects.bulk_create(laminations)
+
+        machines = []
+        for index, (override, copy_links) in enumerate(zip(overrides, links)):
+            machines.append(Machine(
+                name=override.get('name', f'{machine.name} copy {index + 1}'),
+                project_id=override.get('project', machine.project_id),
+                owner_id=owner.id if owner is not None else machine.owner_id,
+                stator=copy_links['stator'][0],
+                rotor=copy_links['rotor'][0],
+                housing=copy_links['housing'],
+                cooling=copy_links['cooling'],
+                loss=copy_links['loss'],
+            ))
+        Machine.objects.bulk_create(machines)
+
+    ids = []
+    for new_machine, copy_links in zip(machines, links):
+        machine_ids = {'id': new_machine.id}
+        for name in LAMINATIONS:
+            lamination, leaf_links = copy_links[name]
+            machine_ids[name] = {'id': lamination.id if lamination else None,
+                                 **{leaf: row.id if row else None for leaf, row in leaf_links.items()}}
+        for name in COMPONENTS:
+            machine_ids[name] = copy_links[name].id if copy_links[name] else None
+        ids.append(machine_ids)
+    return ids
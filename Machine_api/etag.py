@@ -0,0 +1,89 @@
+"""Conditional GET support for the nested machine endpoints"""
+
+import hashlib
+import json
+import logging
+
+import redis
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from utils.profiling import span
+
+logger = logging.getLogger(__name__)
+
+# Bump when the serialized representation changes, so cached responses of older deployments are not served
+ETAG_VERSION = 1
+CACHE_TIMEOUT = 24 * 3600
+
+
+def get_etag(*parts):
+    """Returns a strong ETag of json serializable parts, e.g. ('machine', id, revision)"""
+    digest = hashlib.sha1(json.dumps([ETAG_VERSION, *parts], default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request, etag):
+    """Returns True if the If-None-Match header of request matches etag"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+def get_cached_json(etag, get_data):
+    """
+    Returns the json of get_data() stored under etag in the cache, serialized and stored on a miss
+
+    Parameters
+    ----------
+    etag: str
+        ETag of the current data, see get_etag
+    get_data: callable
+        Returns the data, only called on a cache miss
+
+    Returns
+    -------
+    content: bytes
+    """
+    key = f'json-response:{etag.strip(chr(34))}'
+    try:
+        content = cache.get(key)
+    except redis.RedisError as err:
+        logger.warning('Response cache unavailable: %s', err)
+        content = None
+    if content is None:
+        with span('serialize'):
+            content = json.dumps(get_data(), cls=DjangoJSONEncoder).encode()
+        try:
+            cache.set(key, content, CACHE_TIMEOUT)
+        except redis.RedisError as err:
+            logger.warning('Response cache unavailable: %s', err)
+    return content
+
+
+def cached_json_response(request, etag, get_data):
+    """
+    Returns 304 if the client holds etag, otherwise the json of get_data() from the cache or freshly serialized
+
+    Parameters
+    ----------
+    request: HttpRequest
+    etag: str
+        ETag of the current data, see get_etag
+    get_data: callable
+        Returns the data, only called on a cache miss
+
+    Returns
+    -------
+    response: HttpResponse
+    """
+    if is_not_modified(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(get_cached_json(etag, get_data), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,124 @@
+"""Task state and progress events published to Redis for streaming to clients"""
+
+import json
+import logging
+
+import redis
+from celery.signals import task_failure, task_prerun, task_revoked, task_success
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+EVENT_TTL = 3600
+FINAL_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+
+def get_event_channel(task_id):
+    """Returns the pub/sub channel events of task_id are published on"""
+    return f'task-events:{task_id}'
+
+
+def get_event_key(task_id):
+    """Returns the key holding the latest event of task_id, read by clients subscribing late"""
+    return f'task-event:{task_id}'
+
+
+def get_owner_key(task_id):
+    return f'task-owner:{task_id}'
+
+
+def register_task(task_id, user):
+    """Records the user who submitted task_id. Only that user can stream its events."""
+    owner = str(user.id) if user is not None and user.is_authenticated else ''
+    try:
+        get_redis().set(get_owner_key(task_id), owner, ex=EVENT_TTL)
+    except redis.RedisError as err:
+        logger.warning('Could not register owner of task %s: %s', task_id, err)
+
+
+def publish_event(task_id, state, **data):
+    """
+    Publishes a task event and keeps it as the task's latest event
+
+    Parameters
+    ----------
+    task_id: str
+        Celery task id
+    state: str
+        Celery state, e.g. STARTED, PROGRESS, SUCCESS
+    data:
+        Additional json serializable fields of the event
+    """
+    if not task_id:
+        return
+    event = json.dumps(dict(data, task_id=task_id, state=state), default=str)
+    try:
+        client = get_redis()
+        client.set(get_event_key(task_id), event, ex=EVENT_TTL)
+        client.publish(get_event_channel(task_id), event)
+    except redis.RedisError as err:
+        # Events are best effort, the result backend remains the source of truth
+        logger.warning('Could not publish %s event of task %s: %s', state, task_id, err)
+
+
+def get_steps_key(task_id):
+    return f'task-steps:{task_id}'
+
+
+def report_step(task_id, total, **data):
+    """
+    Counts a finished step of task_id, e.g. a subtask of a chord, and publishes the progress of all total steps
+
+    Parameters
+    ----------
+    task_id: str
+        Id the events are published under, e.g. of the chord callback
+    total: int
+        Number of steps
+    data:
+        Additional json serializable fields of the progress
+    """
+    try:
+        client = get_redis()
+        done = client.incr(get_steps_key(task_id))
+        client.expire(get_steps_key(task_id), EVENT_TTL)
+    except redis.RedisError as err:
+        logger.warning('Could not count step of task %s: %s', task_id, err)
+        return
+    publish_event(task_id, 'PROGRESS', meta=dict(data, done=done, total=total, progress=done / total))
+
+
+def get_latest_event(task_id):
+    """Returns the latest event of task_id, None if there is none or Redis is unavailable"""
+    try:
+        event = get_redis().get(get_event_key(task_id))
+    except redis.RedisError:
+        return None
+    return json.loads(event) if event is not None else None
+
+
+def report_progress(task, **meta):
+    """Stores a PROGRESS state of a bound task in the result backend and publishes it"""
+    task.update_state(state='PROGRESS', meta=meta)
+    publish_event(task.request.id, 'PROGRESS', meta=meta)
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, **kwargs):
+    publish_event(task_id, 'STARTED')
+
+
+@task_success.connect
+def on_task_success(sender=None, result=None, **kwargs):
+    publish_event(sender.request.id, 'SUCCESS', result=result)
+
+
+@task_failure.connect
+def on_task_failure(task_id=None, exception=None, **kwargs):
+    publish_event(task_id, 'FAILURE', error=str(exception))
+
+
+@task_revoked.connect
+def on_task_revoked(request=None, **kwargs):
+    publish_event(getattr(request, 'id', None), 'REVOKED')
@@ -0,0 +1,85 @@
+import json
+import os
+import platform
+
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from moto import mock_s3
+
+from Machine_api.benchmark import compare, get_baseline, run_benchmark
+from utils import global_functions
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                             'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Measures latency, allocations and SQL queries of the heavy API endpoints on synthetic data '
+            'in a test database and compares them with a baseline. '
+            'Run with DJANGO_SETTINGS_MODULE=Dimensions_api.settings_benchmark.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[10, 1000, 10000],
+                            help='Numbers of seeded machines')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint')
+        parser.add_argument('--endpoints', nargs='+', help='Measured endpoints, default: all')
+        parser.add_argument('--output', help='Writes the results as json to this file')
+        parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline the results are compared with')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative increase of allocations over the baseline')
+        parser.add_argument('--latency-tolerance', type=float, default=1.0,
+                            help='Allowed relative increase of the p95 latency over the baseline')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Stores the query counts, p95 latency and allocations of this run as baseline '
+                                 'instead of comparing')
+
+    def handle(self, *args, **options):
+        if not settings.CELERY_TASK_ALWAYS_EAGER:
+            raise CommandError('Tasks must run inline, use DJANGO_SETTINGS_MODULE=Dimensions_api.settings_benchmark')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with mock_s3():
+                global_functions._s3_client = None
+                boto3.client('s3').create_bucket(Bucket=os.environ['BUCKET_NAME'])
+                results = {}
+                for scale in options['scales']:
+                    self.stdout.write(f'Benchmarking {scale} machines')
+                    with transaction.atomic():
+                        results[str(scale)] = run_benchmark(scale, options['repeat'], options['endpoints'])
+                        transaction.set_rollback(True)
+                    for name, result in results[str(scale)].items():
+                        self.stdout.write(self.format_result(name, result))
+        finally:
+            global_functions._s3_client = None
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            report = {'database': connection.vendor, 'python': platform.python_version(), 'results': results}
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(get_baseline(results), file, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+            return
+
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as file:
+                regressions = compare(results, json.load(file), options['tolerance'], options['latency_tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regression against the baseline'))
+
+    def format_result(self, name, result):
+        if 'skipped' in result:
+            return f'  {name}: skipped, {result["skipped"]}'
+        latency = result['latency_ms']
+        return (f"  {name}: status {result['status']}, {result['queries']} queries, median {latency['median']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+                f"peak {result['peak_alloc_kb']} kB, response {result['response_kb']} kB")
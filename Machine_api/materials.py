@@ -0,0 +1,157 @@
+"""In-process catalog of the thermal material files in Machine_api/Materials"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+MATERIAL_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Materials')
+THERMAL_PROPERTIES = ('Thermal Conductivity', 'Specific Heat', 'Density')
+
+logger = logging.getLogger(__name__)
+
+
+class MaterialCatalog:
+    """
+    Loads the material files once per worker and keeps them indexed by (file, material).
+    Files are re-read only when their modification time changes.
+
+    Parameters
+    ----------
+    material_dir: str
+        Folder containing the material files in json format
+    check_interval: float
+        Minimum time in seconds between two checks of the files' modification times
+    """
+
+    def __init__(self, material_dir=MATERIAL_DIR, check_interval=2.0):
+        self.material_dir = material_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._mtimes = {}
+        self._files = {}
+        self._index = {}
+        self._listing = {}
+        self._listing_bytes = b'{}'
+
+    def _scan(self):
+        """Returns {file name: modification time} of all files in material_dir"""
+        mtimes = {}
+        try:
+            entries = os.scandir(self.material_dir)
+        except FileNotFoundError:
+            return mtimes
+        with entries:
+            for entry in entries:
+                if entry.is_file():
+                    mtimes[entry.name] = entry.stat().st_mtime_ns
+        return mtimes
+
+    def refresh(self, force=False):
+        """Reloads added, changed or removed files. Returns True if the catalog changed."""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            mtimes = self._scan()
+            if mtimes == self._mtimes:
+                return False
+
+            for file_name, mtime in mtimes.items():
+                if self._mtimes.get(file_name) == mtime:
+                    continue
+                key = file_name.split('.')[0]
+                try:
+                    with open(os.path.join(self.material_dir, file_name), 'r') as file:
+                        self._files[key] = json.load(file)
+                except (KeyError, ValueError) as err:
+                    logger.warning('Skipping material file %s: %s', file_name, err)
+                    self._files.pop(key, None)
+            for file_name in set(self._mtimes) - set(mtimes):
+                self._files.pop(file_name.split('.')[0], None)
+            self._mtimes = mtimes
+            self._build_index()
+            return True
+
+    def _build_index(self):
+        index = {}
+        listing = {}
+        for key, data in self._files.items():
+            if key == 'AWG' or key == 'SWG':
+                listing[key] = sorted(set(int(material) for material in data.keys()))
+            else:
+                listing[key] = sorted(set(data.keys()))
+            for material, properties in data.items():
+                index[(key, material)] = properties
+        self._index = index
+        self._listing = listing
+        self._listing_bytes = json.dumps(listing).encode()
+
+    def listing(self):
+        """Returns {file: [materials]}"""
+        self.refresh()
+        return self._listing
+
+    def listing_bytes(self):
+        """Returns the json encoded listing, serialized once per catalog change"""
+        self.refresh()
+        return self._listing_bytes
+
+    def get(self, filename, material):
+        """Returns the raw properties of material in filename. Raises KeyError if unknown."""
+        self.refresh()
+        return self._index[(filename, material)]
+
+    def get_thermal_properties(self, filename, material):
+        """
+        Returns thermal conductivity, specific heat and density of material in filename
+
+        Parameters
+        ----------
+        filename: str
+            Material file name without extension
+        material: str
+            Material name
+
+        Returns
+        -------
+        properties: dict
+            {'Thermal Conductivity': float, 'Specific Heat': float, 'Density': float}
+
+        Raises KeyError if the material is unknown, ValueError if it lacks a numeric property.
+        """
+        data = self.get(filename, material)
+        properties = {}
+        for name in THERMAL_PROPERTIES:
+            try:
+                properties[name] = float(data[name])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f'{material} in {filename} has no numeric {name}')
+        return properties
+
+    def find_thermal_properties(self, material):
+        """
+        Returns thermal properties of material from the first file defining it
+
+        Parameters
+        ----------
+        material: str
+            Material name
+
+        Returns
+        -------
+        properties: dict
+            {'Thermal Conductivity': float, 'Specific Heat': float, 'Density': float}
+        """
+        self.refresh()
+        for filename in sorted(self._files):
+            if (filename, material) in self._index:
+                return self.get_thermal_properties(filename, material)
+        raise KeyError(material)
+
+
+material_catalog = MaterialCatalog()
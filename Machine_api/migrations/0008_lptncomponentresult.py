@@ -0,0 +1,57 @@
+# Generated by Django 4.0 on 2022-07-12 10:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_component_results(apps, schema_editor):
+    """Copies the components of existing LPTN results into LPTNComponentResult"""
+    Machine = apps.get_model('Machine_api', 'Machine')
+    LPTNComponentResult = apps.get_model('Machine_api', 'LPTNComponentResult')
+    rows = []
+    for machine in Machine.objects.filter(lptn__isnull=False).select_related('lptn').iterator(chunk_size=500):
+        result = machine.lptn.result
+        if not isinstance(result, dict):
+            continue
+        for component, values in result.items():
+            if isinstance(values, dict) and 'AvgTemperature' in values and 'MaxTemperature' in values:
+                rows.append(LPTNComponentResult(
+                    lptn_id=machine.lptn_id, machine_id=machine.id, component=component,
+                    avg_temperature=values['AvgTemperature'], max_temperature=values['MaxTemperature'],
+                    heat_fluxes=values.get('HeatFluxes', {})))
+    LPTNComponentResult.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Machine_api', '0007_winding_rotor_winding_stator_winding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LPTNComponentResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('component', models.CharField(max_length=100)),
+                ('avg_temperature', models.FloatField()),
+                ('max_temperature', models.FloatField()),
+                ('heat_fluxes', models.JSONField(blank=True, default=dict)),
+                ('lptn', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='Machine_api.lptn')),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='component_results', to='Machine_api.machine')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='lptncomponentresult',
+            index=models.Index(fields=['component', '-max_temperature'], name='lptn_component_max_temp'),
+        ),
+        migrations.AddIndex(
+            model_name='lptncomponentresult',
+            index=models.Index(fields=['component', '-avg_temperature'], name='lptn_component_avg_temp'),
+        ),
+        migrations.AddConstraint(
+            model_name='lptncomponentresult',
+            constraint=models.UniqueConstraint(fields=('lptn', 'component'), name='unique_lptn_component'),
+        ),
+        migrations.RunPython(copy_component_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2022-07-14 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Machine_api', '0008_lptncomponentresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machine',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
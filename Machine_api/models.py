@@ -133,6 +133,29 @@ class LPTN(models.Model):
     result = models.JSONField(blank=True, null=True, default=list)
 
 
+class MachineQuerySet(models.QuerySet):
+    def with_tree(self):
+        """
+        Joins every component of the machine tree serialized by GetMachineSerializer.
+        All links are foreign keys, so the whole tree is loaded in a single query regardless of list size.
+        """
+        return self.select_related(
+            'project__owner',
+            'owner',
+            'stator__slot',
+            'stator__winding',
+            'stator__conductor',
+            'rotor__slot',
+            'rotor__winding',
+            'rotor__conductor',
+            'rotor__hole',
+            'housing',
+            'cooling',
+            'loss',
+            'lptn',
+        )
+
+
 class Machine(models.Model):
     name = models.CharField(max_length=100, null=True)
     project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True)
@@ -143,6 +166,10 @@ class Machine(models.Model):
     cooling = models.ForeignKey(Cooling, on_delete=models.SET_NULL, null=True)
     loss = models.ForeignKey(Loss, on_delete=models.SET_NULL, null=True)
     lptn = models.ForeignKey(LPTN, on_delete=models.SET_NULL, null=True)
+    # Incremented whenever the machine or a linked row changes, see signals.py
+    revision = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = MachineQuerySet.as_manager()
 
     def get_absolute_url(self):
         return reverse('Machine detail', kwargs={'id': self.id})
@@ -156,3 +183,32 @@ class Machine(models.Model):
                     form.save()
                 messages.success(request, message='value changed')
             return redirect('machine')
+
+
+class LPTNComponentResult(models.Model):
+    """Steady state LPTN result of one component, stored per row so results can be ranked and filtered in SQL"""
+    lptn = models.ForeignKey(LPTN, on_delete=models.CASCADE, related_name='components')
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='component_results')
+    component = models.CharField(max_length=100)
+    avg_temperature = models.FloatField()
+    max_temperature = models.FloatField()
+    heat_fluxes = models.JSONField(blank=True, default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lptn', 'component'], name='unique_lptn_component'),
+        ]
+        indexes = [
+            models.Index(fields=['component', '-max_temperature'], name='lptn_component_max_temp'),
+            models.Index(fields=['component', '-avg_temperature'], name='lptn_component_avg_temp'),
+        ]
+
+    @classmethod
+    def from_result(cls, lptn_id, machine_id, result):
+        """Returns unsaved rows of a component_results dict"""
+        return [
+            cls(lptn_id=lptn_id, machine_id=machine_id, component=component, avg_temperature=values['AvgTemperature'],
+                max_temperature=values['MaxTemperature'], heat_fluxes=values.get('HeatFluxes', {}))
+            for component, values in result.items()
+            if isinstance(values, dict) and 'AvgTemperature' in values and 'MaxTemperature' in values
+        ]
@@ -0,0 +1,19 @@
+"""Pagination of the list endpoints"""
+
+from rest_framework.pagination import CursorPagination
+
+# Page size of list endpoints, clients may request up to MAX_PAGE_SIZE rows with ?page_size=
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Cursor pagination on -id, newest rows first.
+    Pages cost the same at any depth since the cursor is an id filter, not an offset,
+    and rows added between two requests do not shift the next page.
+    """
+    ordering = '-id'
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
@@ -0,0 +1,34 @@
+"""Shared Redis connection for coordination state that lives next to the Celery broker"""
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_client = None
+_async_client = None
+
+
+def get_redis():
+    """Returns a process-wide Redis client connected to CELERY_BROKER_URL"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _client
+
+
+def get_async_redis():
+    """Returns a process-wide asyncio Redis client connected to CELERY_BROKER_URL, used by the ASGI streams"""
+    global _async_client
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _async_client
+
+
+def publish_worker_stat(name, worker, value):
+    """Stores a measurement of a Celery worker, e.g. its cold start time, for the API processes"""
+    get_redis().hset(f'worker_stats:{name}', worker, value)
+
+
+def get_worker_stats(name):
+    """Returns {worker hostname: value} of a measurement published by the Celery workers"""
+    return {worker.decode(): float(value) for worker, value in get_redis().hgetall(f'worker_stats:{name}').items()}
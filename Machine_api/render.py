@@ -0,0 +1,74 @@
+"""Submission of axial-slice renders to the Celery render pipeline"""
+
+import hashlib
+import json
+import uuid
+
+from celery import current_app
+
+from utils.plot import get_axial_slice_key
+from .redis_client import get_redis
+from .tasks import create_machine_image_task
+
+# Time a render task id stays registered for a machine state. Matches the lifetime of the task result.
+RENDER_TASK_TTL = 60 * 60
+# Deletes KEYS[1] only if it still holds ARGV[1], so a render registered by another request is not dropped
+COMPARE_AND_DELETE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def get_state_hash(machine_dict):
+    """Returns a hash identifying the serialized state of a machine"""
+    machine_json = json.dumps(machine_dict, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(machine_json.encode()).hexdigest()
+
+
+def is_failed_render(task):
+    """
+    Returns True if a render task failed, so the same machine state must be rendered again.
+    create_machine_image_task reports exceptions in a result without image, e.g. after a transient S3 error.
+    The errors of a rendered invalid machine come with its image and are kept.
+    """
+    if task.status in ('FAILURE', 'REVOKED'):
+        return True
+    result = task.result if task.status == 'SUCCESS' else None
+    return isinstance(result, dict) and result.get('error') is not None and result.get('img_loc') is None
+
+
+def submit_machine_image(machine_dict, img_format='png', dpi=None):
+    """
+    Submits the render of machine_dict unless the same machine state is already rendering or rendered
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized machine (GetMachineSerializer)
+    img_format: {'png', 'svg'}
+        Image format
+    dpi: int
+        Resolution of the image, matplotlib default if None
+
+    Returns
+    -------
+    task: AsyncResult
+        New or already running render task
+    """
+    key = f"machine_image:{get_axial_slice_key(machine_dict['id'], img_format, dpi)}:{get_state_hash(machine_dict)}"
+    client = get_redis()
+
+    while True:
+        task_id = client.get(key)
+        if task_id is not None:
+            task = current_app.AsyncResult(task_id.decode())
+            if not is_failed_render(task):
+                return task
+            client.eval(COMPARE_AND_DELETE, 1, key, task_id)
+
+        task_id = str(uuid.uuid4())
+        if client.set(key, task_id, nx=True, ex=RENDER_TASK_TTL):
+            return create_machine_image_task.apply_async(args=[machine_dict, img_format, dpi], task_id=task_id)
+        # Another request registered the same render in the meantime, it is reused unless it expired already
@@ -25,6 +25,12 @@ class GetProjectSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'created_at', 'active', 'owner']
+
+
 class UserCreateSerializer(UserCreateSerializer):
     class Meta(UserCreateSerializer.Meta):
         model = User
@@ -191,6 +197,13 @@ class GetLPTNSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class MachineSummarySerializer(serializers.ModelSerializer):
+    """Machine without its component tree, for listings"""
+    class Meta:
+        model = Machine
+        fields = ['id', 'name', 'project', 'owner', 'revision']
+
+
 class GetMachineSerializer(serializers.ModelSerializer):
     project = GetProjectSerializer(allow_null=True, read_only=True)
     stator = CompleteStatorSerializer(allow_null=True, read_only=True)
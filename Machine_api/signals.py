@@ -0,0 +1,63 @@
+"""Keeps Machine.revision current when the machine or any row of its serialized tree changes"""
+
+from django.db.models import F, Q
+from django.db.models.signals import post_save, pre_delete, pre_save
+
+from .models import Conductor, Cooling, Hole, Housing, Loss, LPTN, Machine, Project, Rotor, Slot, Stator, User, \
+    Winding
+
+# Paths from Machine to every model serialized by GetMachineSerializer
+MACHINE_LOOKUPS = {
+    Project: ('project',),
+    User: ('project__owner',),
+    Stator: ('stator',),
+    Rotor: ('rotor',),
+    Slot: ('stator__slot', 'rotor__slot'),
+    Winding: ('stator__winding', 'rotor__winding'),
+    Conductor: ('stator__conductor', 'rotor__conductor'),
+    Hole: ('rotor__hole',),
+    Housing: ('housing',),
+    Cooling: ('cooling',),
+    Loss: ('loss',),
+    LPTN: ('lptn',),
+}
+
+
+def bump_revisions(model, pk):
+    """Increments the revision of every machine referencing row pk of model"""
+    query = Q()
+    for lookup in MACHINE_LOOKUPS[model]:
+        query |= Q(**{f'{lookup}_id': pk})
+    return Machine.objects.filter(query).update(revision=F('revision') + 1)
+
+
+def on_component_changed(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    # Logins only touch last_login, which is not serialized
+    if sender is User and update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_revisions(sender, instance.pk)
+
+
+def on_machine_saving(sender, instance, **kwargs):
+    # Increment in SQL, writing back a loaded revision would lose concurrent increments
+    if not instance._state.adding:
+        instance.revision = F('revision') + 1
+
+
+def on_machine_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and 'revision' not in update_fields:
+        Machine.objects.filter(pk=instance.pk).update(revision=F('revision') + 1)
+    instance.refresh_from_db(fields=['revision'])
+
+
+def connect_signals():
+    for model in MACHINE_LOOKUPS:
+        uid = f'machine_revision_{model.__name__}'
+        post_save.connect(on_component_changed, sender=model, dispatch_uid=uid)
+        # Before deletion, while machines still reference the row
+        pre_delete.connect(on_component_changed, sender=model, dispatch_uid=uid)
+    pre_save.connect(on_machine_saving, sender=Machine, dispatch_uid='machine_revision_Machine')
+    post_save.connect(on_machine_saved, sender=Machine, dispatch_uid='machine_revision_Machine')
@@ -0,0 +1,93 @@
+"""
+Streaming responses of bulk machine exports.
+Rows are read from a database cursor and serialized chunk by chunk, so memory does not grow with the number of rows.
+"""
+
+import itertools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+# Rows fetched from the cursor and serialized at once
+STREAM_CHUNK_SIZE = 200
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline delimited json, one row per line. Selected with ?format=ndjson or Accept: application/x-ndjson."""
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(dumps(row) + '\n' for row in rows).encode()
+
+
+# Renderers of the streaming actions, the default ones and ndjson
+STREAM_RENDERERS = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+
+
+def iter_chunks(queryset, serializer_class, chunk_size=None):
+    """Yields lists of serialized rows of queryset, fetched chunk_size rows at a time with a server-side cursor"""
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    # One serializer for all chunks, its fields are bound once instead of per chunk
+    serializer = serializer_class(many=True)
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield serializer.to_representation(chunk)
+
+
+def stream_json(chunks, key=None):
+    """Yields the json array of the rows in chunks, or the object {row[key]: row} if key is given"""
+    yield '{' if key else '['
+    separator = ''
+    for chunk in chunks:
+        if key:
+            items = [f'{dumps(str(row[key]))}:{dumps(row)}' for row in chunk]
+        else:
+            items = [dumps(row) for row in chunk]
+        yield separator + ','.join(items)
+        separator = ','
+    yield '}' if key else ']'
+
+
+def stream_ndjson(chunks):
+    """Yields one line of json per row"""
+    for chunk in chunks:
+        yield ''.join(dumps(row) + '\n' for row in chunk)
+
+
+def streaming_response(request, queryset, serializer_class, key=None):
+    """
+    Returns a StreamingHttpResponse of the rows of queryset serialized by serializer_class
+
+    Parameters
+    ----------
+    request: Request
+        ndjson is returned if the NDJSONRenderer was negotiated, json otherwise
+    queryset: QuerySet
+        Rows in response order. Only select_related joins are loaded, prefetch_related is ignored by iterator().
+    serializer_class:
+        Serializer of a row
+    key: str
+        Field of the rows keying the json object, a json array is returned if None
+
+    Returns
+    -------
+    response: StreamingHttpResponse
+    """
+    chunks = iter_chunks(queryset, serializer_class)
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format == NDJSONRenderer.format:
+        return StreamingHttpResponse(stream_ndjson(chunks), content_type=NDJSON_MEDIA_TYPE)
+    return StreamingHttpResponse(stream_json(chunks, key), content_type='application/json')
@@ -0,0 +1,149 @@
+"""
+Server-sent event stream of Celery task events, served directly by the ASGI application.
+Clients connect to /api/machine/task_events/<task_id>/ with an access token and receive state
+and progress events until the task finishes, instead of polling the task endpoints.
+
+The token is checked by the authentication classes configured for the REST API, e.g. simplejwt or Firebase.
+Browsers pass it as ?token= query parameter, it therefore appears in the access logs of proxies and servers
+unless they strip the query string of this path.
+"""
+
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .events import FINAL_STATES, get_event_channel, get_event_key, get_owner_key
+from .redis_client import get_async_redis
+
+TASK_EVENTS_PATH = re.compile(r'^/api/machine/task_events/(?P<task_id>[\w-]+)/?$')
+HEARTBEAT_INTERVAL = 15.0
+POLL_TIMEOUT = 1.0
+
+
+def format_event(event):
+    """Returns event (json bytes or str) as a server-sent event named after its state"""
+    if isinstance(event, bytes):
+        event = event.decode()
+    state = json.loads(event).get('state', 'message')
+    return f'event: {state}\ndata: {event}\n\n'.encode()
+
+
+def get_authorization(scope):
+    """Returns the Authorization header, built from the token query parameter if there is none"""
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            return value.decode()
+    # EventSource cannot set headers, browsers pass the token as query parameter
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    return f'{jwt_settings.AUTH_HEADER_TYPES[0]} {token[0]}' if token else None
+
+
+def get_user_id(scope):
+    """Returns the id of the user authenticated by the configured DRF authentication classes, None if none does"""
+    authorization = get_authorization(scope)
+    if not authorization:
+        return None
+    request = HttpRequest()
+    request.META['HTTP_AUTHORIZATION'] = authorization
+    request = Request(request)
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except APIException:
+            continue
+        if result is not None:
+            return str(result[0].pk)
+    return None
+
+
+async def send_json(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+
+async def task_events(scope, receive, send, task_id):
+    """Streams the events of task_id until it reaches a final state or the client disconnects"""
+    # Authentication classes may look the user up in the database
+    user_id = await sync_to_async(get_user_id)(scope)
+    if user_id is None:
+        return await send_json(send, 401, {'error': 'A valid access token is required'})
+
+    client = get_async_redis()
+    owner = await client.get(get_owner_key(task_id))
+    if owner is None:
+        return await send_json(send, 404, {'error': 'Unknown task'})
+    if owner.decode() not in ('', user_id):
+        return await send_json(send, 403, {'error': 'Task belongs to another user'})
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    pubsub = client.pubsub()
+    # Subscribe before reading the latest event so no event published in between is lost
+    await pubsub.subscribe(get_event_channel(task_id))
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                (b'access-control-allow-origin', b'*'),
+            ],
+        })
+        latest = await client.get(get_event_key(task_id))
+        if latest is not None:
+            await send({'type': 'http.response.body', 'body': format_event(latest), 'more_body': True})
+            if json.loads(latest).get('state') in FINAL_STATES:
+                return await send({'type': 'http.response.body', 'body': b''})
+
+        loop = asyncio.get_event_loop()
+        last_sent = loop.time()
+        while not disconnected.is_set():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=POLL_TIMEOUT)
+            if message is not None:
+                await send({'type': 'http.response.body', 'body': format_event(message['data']), 'more_body': True})
+                last_sent = loop.time()
+                if json.loads(message['data']).get('state') in FINAL_STATES:
+                    break
+            elif loop.time() - last_sent > HEARTBEAT_INTERVAL:
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                last_sent = loop.time()
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        await pubsub.unsubscribe()
+        await pubsub.reset()
+
+
+class TaskEventsRouter:
+    """ASGI application serving task event streams and passing every other request to application"""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = TASK_EVENTS_PATH.match(scope['path'])
+            if match:
+                return await task_events(scope, receive, send, match.group('task_id'))
+        return await self.application(scope, receive, send)
@@ -0,0 +1,187 @@
+"""Parameter sweeps of a machine: generation of the variant designs, their evaluation and the table of results"""
+
+import copy
+import hashlib
+import itertools
+import json
+
+from utils.plot import create_axial_slice
+from utils.schema import SchemaError, validate_machine
+from .LPTN.machine_network import solve_machine_lptn
+
+MAX_SWEEP_VARIANTS = 200
+# Components of a serialized machine a sweep can change, and which define a design
+DESIGN_COMPONENTS = ('stator', 'rotor', 'housing', 'cooling', 'loss')
+# Folder of the axial slices of sweep variants in the bucket, one per design
+SWEEP_IMAGE_DIR = 'Sweeps/{design_hash}'
+SWEEP_COLUMNS = ['design_hash', 'valid', 'error', 'img_loc', 'MaxTemperature']
+
+
+def get_parameter_values(parameter):
+    """
+    Returns the path and values of a swept parameter
+
+    Parameters
+    ----------
+    parameter: dict
+        {"path": "stator.slot.data.Zs", "values": [36, 48]}
+        or {"path": "stator.data.ExternalRadius", "start": 0.09, "stop": 0.11, "num": 3}, including start and stop
+
+    Returns
+    -------
+    path: list
+        Keys leading to the value in the serialized machine
+    values: list
+    """
+    if not isinstance(parameter, dict) or not isinstance(parameter.get('path'), str):
+        raise ValueError('Every parameter must be an object with a path')
+    path = parameter['path'].split('.')
+    if path[0] not in DESIGN_COMPONENTS or len(path) < 3:
+        raise ValueError(f"Invalid path {parameter['path']}, e.g. stator.data.CoreLength or stator.slot.data.Zs")
+
+    if 'values' in parameter:
+        values = parameter['values']
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"values of {parameter['path']} must be a non-empty list")
+    elif all(key in parameter for key in ('start', 'stop', 'num')):
+        start, stop, num = float(parameter['start']), float(parameter['stop']), int(parameter['num'])
+        if not 0 < num <= MAX_SWEEP_VARIANTS:
+            raise ValueError(f"num of {parameter['path']} must be 1-{MAX_SWEEP_VARIANTS}")
+        step = (stop - start) / (num - 1) if num > 1 else 0.0
+        values = [start + index * step for index in range(num)]
+    else:
+        raise ValueError(f"{parameter['path']} needs values or start, stop and num")
+    return path, values
+
+
+def set_value(machine_dict, path, value):
+    """Sets the value at path of a serialized machine. Raises ValueError if its parent does not exist."""
+    parent = machine_dict
+    for key in path[:-1]:
+        parent = parent.get(key) if isinstance(parent, dict) else None
+    if not isinstance(parent, dict):
+        raise ValueError(f"{'.'.join(path[:-1])} is not defined for this machine")
+    parent[path[-1]] = value
+
+
+def strip_ids(value):
+    """Returns a copy of nested dicts without their id entries"""
+    if isinstance(value, dict):
+        return {key: strip_ids(item) for key, item in value.items() if key != 'id'}
+    return value
+
+
+def get_design_hash(machine_dict):
+    """Returns a hash of the design of a serialized machine, independent of its id, name, project and owner"""
+    machine, _, _ = validate_machine(machine_dict)
+    design = {key: strip_ids(machine.get(key)) for key in DESIGN_COMPONENTS}
+    design_json = json.dumps(design, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(design_json.encode()).hexdigest()
+
+
+def generate_variants(machine_dict, parameters):
+    """
+    Returns the variants of a machine for every combination of the values of parameters
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized base machine (GetMachineSerializer)
+    parameters: list
+        Swept parameters, see get_parameter_values
+
+    Returns
+    -------
+    paths: list
+        Path of each parameter, joined with dots
+    variants: list
+        {"values": [value per parameter], "design_hash", "machine": serialized variant} per combination
+    """
+    if not isinstance(parameters, list) or not parameters:
+        raise ValueError('parameters must be a non-empty list')
+    paths, values = zip(*(get_parameter_values(parameter) for parameter in parameters))
+    n_variants = 1
+    for parameter_values in values:
+        n_variants *= len(parameter_values)
+    if n_variants > MAX_SWEEP_VARIANTS:
+        raise ValueError(f'The sweep has {n_variants} variants, at most {MAX_SWEEP_VARIANTS} are allowed')
+
+    base = json.loads(json.dumps(machine_dict, default=str))
+    variants = []
+    for combination in itertools.product(*values):
+        machine = copy.deepcopy(base)
+        for path, value in zip(paths, combination):
+            set_value(machine, path, value)
+        variants.append({'values': list(combination), 'design_hash': get_design_hash(machine), 'machine': machine})
+    return ['.'.join(path) for path in paths], variants
+
+
+def run_variant(machine_dict, design_hash, options):
+    """
+    Validates a variant, solves its thermal network and renders its axial slice
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Serialized variant
+    design_hash: str
+        Hash of the variant's design, names the folder of its image
+    options: dict
+        {"lptn": bool, "image": bool, "n_axial": int, "n_radial": int}
+
+    Returns
+    -------
+    result: dict
+        {"design_hash", "valid", "error", "img_loc", "components": {component: {"AvgTemperature", "MaxTemperature"}}}
+    """
+    result = {'design_hash': design_hash, 'valid': True, 'error': None, 'img_loc': None, 'components': {}}
+    machine, errors, _ = validate_machine(machine_dict)
+    if errors:
+        result.update(valid=False, error=SchemaError(errors).args[0])
+        return result
+
+    if options.get('lptn'):
+        components = solve_machine_lptn(machine, options['n_axial'], options['n_radial'])
+        result['components'] = {name: {'AvgTemperature': component['AvgTemperature'],
+                                       'MaxTemperature': component['MaxTemperature']}
+                                for name, component in components.items()}
+    if options.get('image'):
+        img_dict = create_axial_slice(machine, img_dir=SWEEP_IMAGE_DIR.format(design_hash=design_hash))
+        result.update(valid=img_dict['valid_machine'], img_loc=img_dict['img_loc'], error=img_dict.get('error'))
+    return result
+
+
+def aggregate_sweep(paths, variants, results):
+    """
+    Returns the table of results of a sweep, one row per variant
+
+    Parameters
+    ----------
+    paths: list
+        Swept parameters
+    variants: list
+        {"values", "design_hash"} per variant
+    results: list
+        Result of run_variant per design
+
+    Returns
+    -------
+    table: dict
+        {"columns": parameters, SWEEP_COLUMNS and the maximum temperature of each component, "rows": [[...]],
+        "variants": number of variants, "designs": number of distinct designs}
+    """
+    by_hash = {result['design_hash']: result for result in results}
+    components = sorted({name for result in results for name in result['components']})
+    rows = []
+    for variant in variants:
+        result = by_hash[variant['design_hash']]
+        temperatures = [result['components'].get(name, {}).get('MaxTemperature') for name in components]
+        max_temperature = max((t for t in temperatures if t is not None), default=None)
+        rows.append(variant['values'] + [result['design_hash'], result['valid'], result['error'], result['img_loc'],
+                                         max_temperature] + temperatures)
+    return {
+        'columns': list(paths) + SWEEP_COLUMNS + [f'{name}.MaxTemperature' for name in components],
+        'rows': rows,
+        'variants': len(variants),
+        'designs': len(by_hash),
+    }
@@ -1,38 +1,159 @@
 from celery.utils.log import get_task_logger
-from time import sleep
-from celery import shared_task
+from celery import Task, shared_task
+import traceback
+import hashlib
 import json
-import boto3
 import os
 
+import redis
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from utils.global_functions import s3_copy_prefix
+from utils.schema import coerce_machine
+from utils.plot import create_axial_slice
+from .LPTN.machine_network import solve_machine_lptn, solve_machine_lptn_batch, solve_machine_lptn_transient
+from .models import LPTN, LPTNComponentResult, Machine
+from .serializers import GetMachineSerializer
+from .events import report_progress, report_step
+from .sweep import aggregate_sweep, run_variant
+
 logger = get_task_logger(__name__)
 
+# Time results of sweep variants are reused by variants of the same design
+SWEEP_RESULT_TTL = 24 * 60 * 60
+
+
+def save_lptn_result(machine_id, result):
+    """Stores result as the machine's LPTN result, creating the LPTN entry if needed, and its rows per component"""
+    with transaction.atomic():
+        machine = Machine.objects.select_for_update().get(id=machine_id)
+        if machine.lptn_id:
+            LPTN.objects.filter(id=machine.lptn_id).update(result=result)
+            # update() sends no signals, the machine's revision is bumped here
+            Machine.objects.filter(id=machine_id).update(revision=F('revision') + 1)
+        else:
+            machine.lptn = LPTN.objects.create(result=result)
+            machine.save(update_fields=['lptn'])
+        LPTNComponentResult.objects.filter(lptn_id=machine.lptn_id).delete()
+        LPTNComponentResult.objects.bulk_create(LPTNComponentResult.from_result(machine.lptn_id, machine.id, result))
+
+
+class LPTNResultTask(Task):
+    """Publishes the plots of a successful solve, once its result has been persisted by the task"""
+
+    def on_success(self, retval, task_id, args, kwargs):
+        machine_id = args[0] if args else kwargs['machine_id']
+        lptn_results_task.delay(machine_id)
+
+
+@shared_task(base=LPTNResultTask, name='lptn_solve_task')
+def lptn_solve_task(machine_id, n_axial=4, n_radial=2):
+    """
+    Solves the steady state thermal network of a machine. Returns results per component.
+    The result is stored before the task returns, so clients seeing the task succeed read it from the machine.
+    """
+    machine = Machine.objects.with_tree().get(id=machine_id)
+    machine_dict = coerce_machine(GetMachineSerializer(machine).data)
+    result = solve_machine_lptn(machine_dict, n_axial, n_radial)
+    save_lptn_result(machine_id, result)
+    return result
+
+
+@shared_task(name='lptn_batch_task')
+def lptn_batch_task(machine_id, operating_points, n_axial=4, n_radial=2):
+    """Solves the thermal network of a machine for several operating points in one task"""
+    machine = Machine.objects.with_tree().get(id=machine_id)
+    machine_dict = coerce_machine(GetMachineSerializer(machine).data)
+    return solve_machine_lptn_batch(machine_dict, operating_points, n_axial, n_radial)
 
-@shared_task(name='lptn_solve_task')
-def lptn_solve_task():
-    sleep(10)
-    with open('component_results.json') as file:
-        data = json.load(file)
-        return data
+
+@shared_task(bind=True, name='lptn_transient_task')
+def lptn_transient_task(self, machine_id, duty_cycle, n_axial=4, n_radial=2, n_output=200, initial_temperature=None):
+    """Solves the thermal network of a machine over a duty cycle. Reports the simulated time as progress."""
+    machine = Machine.objects.with_tree().get(id=machine_id)
+    machine_dict = coerce_machine(GetMachineSerializer(machine).data)
+
+    reported = {'progress': 0.0}
+
+    def progress(t, t_end):
+        # Report in steps of at least 2% to keep the result backend quiet
+        if t / t_end - reported['progress'] >= 0.02:
+            reported['progress'] = t / t_end
+            report_progress(self, time=t, end_time=t_end, progress=t / t_end)
+
+    return solve_machine_lptn_transient(machine_dict, duty_cycle, n_axial, n_radial, n_output,
+                                        initial_temperature, progress=progress)
+
+
+@shared_task(name='create_machine_image_task')
+def create_machine_image_task(machine_dict, img_format='png', dpi=None):
+    """Checks machine input and uploads its 2D axial view. Errors are reported in the result."""
+    try:
+        return create_axial_slice(machine_dict, img_format, dpi)
+    except Exception as err:
+        if settings.DEBUG:
+            err = traceback.format_exc()
+        return {"error": str(err)}
+
+
+@shared_task(name='sweep_variant_task')
+def sweep_variant_task(sweep_id, n_designs, design_hash, machine_dict, options):
+    """
+    Validates a design of a sweep, solves its LPTN and renders it, unless a sweep with the same options did already.
+    Errors are reported in the result, so the sweep completes with the other designs.
+    """
+    options_hash = hashlib.sha256(json.dumps(options, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+    key = f"sweep_variant:{design_hash}:{options_hash}"
+    try:
+        result = cache.get(key)
+    except redis.RedisError as err:
+        logger.warning('Sweep result cache unavailable: %s', err)
+        result = None
+    if result is None:
+        try:
+            result = run_variant(machine_dict, design_hash, options)
+        except Exception as err:
+            if settings.DEBUG:
+                err = traceback.format_exc()
+            result = {'design_hash': design_hash, 'valid': False, 'error': str(err), 'img_loc': None, 'components': {}}
+        else:
+            try:
+                cache.set(key, result, SWEEP_RESULT_TTL)
+            except redis.RedisError as err:
+                logger.warning('Sweep result cache unavailable: %s', err)
+    report_step(sweep_id, n_designs, design_hash=design_hash)
+    return result
+
+
+@shared_task(name='sweep_aggregate_task')
+def sweep_aggregate_task(results, paths, variants):
+    """Collects the results of the designs of a sweep into one table"""
+    return aggregate_sweep(paths, variants, results)
 
 
 @shared_task(name='lptn_results_task')
 def lptn_results_task(machine_id):
-    s3 = boto3.resource('s3')
+    """Publishes the LPTN result plots to the machine's folder. Unchanged plots are not copied again."""
     bucket = os.environ["BUCKET_NAME"]
-    s3_bucket = s3.Bucket(bucket)
-    plots = s3_bucket.objects.filter(Prefix='Images/Results')
-    for obj in plots:
-        img_name = "/".join(obj.key.split('/')[-2:])
-        source = {
-            "Bucket": bucket,
-            "Key": obj.key
-        }
-        s3.meta.client.copy(source, bucket, f"{machine_id}/Results/LPTN/{img_name}")
+
+    def get_dest_key(key):
+        img_name = "/".join(key.split('/')[-2:])
+        return f"{machine_id}/Results/LPTN/{img_name}"
+
+    report = s3_copy_prefix(bucket, 'Images/Results', get_dest_key)
+    for key, duration in report["timings"].items():
+        logger.info("Copied %s in %.3fs", key, duration)
 
     results = {
         "img_generated": True,
-        "img_uploaded": True,
-        "error": None
+        "img_uploaded": not report["errors"],
+        "error": report["errors"] or None,
+        "copied": len(report["copied"]),
+        "skipped": len(report["skipped"]),
+        "timings": report["timings"],
     }
     return results
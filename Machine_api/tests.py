@@ -1,3 +1,1293 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import boto3
+from asgiref.sync import async_to_sync
+import matplotlib.pyplot as plt
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from moto import mock_s3
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Dimensions_api.celery import preload_worker
+
+from .LPTN.pylee_setup import MaterialRegistry
+from .LPTN.machine_network import (build_machine_network, get_duty_cycle, get_operating_points, solve_machine_lptn,
+                                   solve_machine_lptn_batch, solve_machine_lptn_transient)
+from .benchmark import compare, run_benchmark
+from .cache import get_machine_tree
+from .management.commands.benchmark import BASELINE_PATH
+from .materials import MaterialCatalog
+from .render import submit_machine_image
+from .events import publish_event
+from .streams import task_events
+from .sweep import run_variant
+from .tasks import lptn_results_task, lptn_solve_task, save_lptn_result, sweep_variant_task
+from .models import *
+from .serializers import GetMachineSerializer
+from firebase_authentication.cache import TTLCache
+from pylee_ext.cache import ComponentCache, get_component_cache
+from pylee_ext.main import expand_pylee_classes, get_pylee_machine
+from pyleecan.Classes.Material import Material as PyleecanMaterial
+from pyleecan.Classes.Shaft import Shaft
+from utils import metrics
+from utils import global_functions
+from utils.global_functions import InvalidInputError
+from utils.plot import create_axial_slice, get_geometry_hash
+from utils.profiling import request_stats
+from utils.schema import Field, SchemaError, coerce_machine, compile_schemas, get_pyleecan_schema, validate_machine
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LocalCacheTestCase(TestCase):
+    """Tests use a process-local cache, they must neither need Redis nor write test rows into the shared cache"""
+
+
+def read_json(response):
+    """Returns the json of a response, streamed or not"""
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    return json.loads(content)
+
+
+def create_machine_tree(project, owner, name='Machine'):
+    """Creates a machine with every component of the tree populated"""
+    stator = Stator.objects.create(
+        type='LamSlot',
+        data={'CoreLength': 0.1, 'ExternalRadius': 0.1, 'InternalRadius': 0.06, 'Material': 'M400-50A'},
+        slot=Slot.objects.create(type='SlotW11', data={'Zs': 48}),
+        winding=Winding.objects.create(type='Winding', data={}),
+        conductor=Conductor.objects.create(type='CondType12', data={}),
+    )
+    rotor = Rotor.objects.create(
+        type='LamHole',
+        data={'CoreLength': 0.1, 'ExternalRadius': 0.059, 'InternalRadius': 0.02, 'Material': 'M400-50A'},
+        slot=Slot.objects.create(type='SlotW11', data={'Zs': 8}),
+        winding=Winding.objects.create(type='Winding', data={}),
+        conductor=Conductor.objects.create(type='CondType12', data={}),
+        hole=Hole.objects.create(type='HoleM50', data={'Zh': 8}),
+    )
+    return Machine.objects.create(
+        name=name,
+        project=project,
+        owner=owner,
+        stator=stator,
+        rotor=rotor,
+        housing=Housing.objects.create(type='Frame', data={}),
+        cooling=Cooling.objects.create(type='WaterJacket', htc={}, flow={}),
+        loss=Loss.objects.create(type='Loss', data={}),
+        lptn=LPTN.objects.create(input={}, result={}),
+    )
+
+
+class BenchmarkTest(LocalCacheTestCase):
+    def test_query_budgets_of_the_baseline(self):
+        cache.clear()
+        with open(BASELINE_PATH) as file:
+            # Timings of the test settings are not comparable with the benchmark ones
+            baseline = {'10': {name: {'queries': expected['queries']} for name, expected in json.load(file)['10'].items()}}
+        results = {'10': run_benchmark(10, repeat=1, endpoints=list(baseline['10']))}
+        self.assertEqual(compare(results, baseline), [])
+        self.assertEqual(compare({'10': {'total': dict(results['10']['total'], queries=100)}}, baseline),
+                         [f"total at 10 machines: 100 queries, budget {baseline['10']['total']['queries']}"])
+
+    def test_latency_and_allocation_budgets(self):
+        with open(BASELINE_PATH) as file:
+            baseline = json.load(file)
+        self.assertTrue(all('latency_ms' in expected and 'peak_alloc_kb' in expected
+                            for endpoints in baseline.values() for expected in endpoints.values()))
+        expected = baseline['10000']['list_total']
+        result = dict(expected, status=200, latency_ms={'p95': expected['latency_ms']['p95'] * 1.5},
+                      peak_alloc_kb=expected['peak_alloc_kb'] * 1.1)
+        self.assertEqual(compare({'10000': {'list_total': result}}, baseline), [])
+        result = dict(result, latency_ms={'p95': expected['latency_ms']['p95'] * 3}, peak_alloc_kb=expected['peak_alloc_kb'] * 2)
+        self.assertEqual(len(compare({'10000': {'list_total': result}}, baseline)), 2)
+
+
+class MachineTreeQueryTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.project = Project.objects.create(name='Project', owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def add_machines(self, n):
+        for i in range(n):
+            create_machine_tree(self.project, self.user, name=f'Machine {i}')
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+            read_json(response)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_with_tree_loads_whole_tree_in_one_query(self):
+        self.add_machines(5)
+        with self.assertNumQueries(1):
+            data = GetMachineSerializer(Machine.objects.with_tree(), many=True).data
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['rotor']['hole']['type'], 'HoleM50')
+        self.assertEqual(data[0]['project']['owner']['email'], 'owner@example.com')
+
+    def test_list_endpoints_query_count_is_constant(self):
+        urls = [
+            ('get', '/api/machine/dimensions/list_total/', None),
+            ('get', f'/api/machine/dimensions/project/{self.project.id}/get_machines/', None),
+            ('post', '/api/machine/dimensions/projects/get-machines/', {'project_ids': [self.project.id]}),
+        ]
+        self.add_machines(2)
+        small = [self.count_queries(*url) for url in urls]
+        self.add_machines(20)
+        large = [self.count_queries(*url) for url in urls]
+        self.assertEqual(small, large)
+
+    def test_total_query_count(self):
+        machine = create_machine_tree(self.project, self.user)
+        url = f'/api/machine/dimensions/{machine.id}/total/'
+        # Revision and tree
+        self.assertEqual(self.count_queries('get', url), 2)
+        # Revision only, the serialized tree comes from the cache
+        self.assertEqual(self.count_queries('get', url), 1)
+
+
+class ListPaginationTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.organisation = Organisation.objects.create(name='Organisation')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def add_projects(self, n):
+        start = Project.objects.count()
+        owners = [User.objects.create_user(f'owner{i}@example.com', f'Owner {i}') for i in range(start, start + n)]
+        projects = [Project.objects.create(name=f'Project {i}', owner=owner) for i, owner in enumerate(owners)]
+        self.organisation.projects.add(*projects)
+        return projects
+
+    def test_org_projects_pages_in_bounded_queries(self):
+        url = f'/api/machine/organisation/{self.organisation.id}/get_org_projects/?page_size=5'
+        self.add_projects(3)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        projects = self.add_projects(9)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url).json()
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual([project['id'] for project in response['projects']], [p.id for p in projects[::-1][:5]])
+        self.assertEqual(response['projects'][0]['owner']['email'], projects[-1].owner.email)
+        self.assertIsNone(response['previous'])
+
+        ids = []
+        while url:
+            response = self.client.get(url).json()
+            ids += [project['id'] for project in response['projects']]
+            url = response['next']
+        self.assertEqual(len(ids), 12)
+
+        response = self.client.get(f'/api/machine/organisation/{self.organisation.id}/get_org_projects/?view=summary')
+        self.assertEqual(response.json()['projects'][0]['owner'], projects[-1].owner.id)
+
+    def test_list_endpoints_are_paginated(self):
+        project = self.add_projects(1)[0]
+        machines = [create_machine_tree(project, self.user, name=f'Machine {i}') for i in range(3)]
+        response = self.client.get('/api/machine/dimensions/?page_size=2').json()
+        self.assertEqual([machine['id'] for machine in response['results']], [machines[2].id, machines[1].id])
+        self.assertEqual(len(self.client.get(response['next']).json()['results']), 1)
+        self.assertEqual(len(self.client.get('/api/machine/organisation/').json()['results']), 1)
+
+    def test_machine_summary(self):
+        project = self.add_projects(1)[0]
+        machine = create_machine_tree(project, self.user)
+        summary = {'id': machine.id, 'name': 'Machine', 'project': project.id, 'owner': self.user.id, 'revision': machine.revision}
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/machine/dimensions/projects/get-machines/?view=summary',
+                                        {'project_ids': [project.id]}, format='json')
+            self.assertEqual(read_json(response), [summary])
+        response = self.client.get(f'/api/machine/dimensions/project/{project.id}/get_machines/?view=summary')
+        self.assertEqual(response.json(), [summary])
+        response = self.client.get('/api/machine/dimensions/list_total/?view=summary')
+        self.assertEqual(read_json(response), {str(machine.id): summary})
+
+
+class StreamingExportTest(LocalCacheTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.project = Project.objects.create(name='Project', owner=self.user)
+        self.machines = [create_machine_tree(self.project, self.user, name=f'Machine {i}') for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @mock.patch('Machine_api.streaming.STREAM_CHUNK_SIZE', 2)
+    def test_json_and_ndjson_match_serializer(self):
+        expected = GetMachineSerializer(Machine.objects.with_tree().order_by('id'), many=True).data
+        expected = json.loads(json.dumps(expected, default=str))
+
+        response = self.client.get('/api/machine/dimensions/list_total/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(read_json(response), {str(machine['id']): machine for machine in expected[::-1]})
+
+        url = '/api/machine/dimensions/projects/get-machines/'
+        self.assertEqual(read_json(self.client.post(url, {'project_ids': [self.project.id]}, format='json')), expected)
+        response = self.client.post(f'{url}?format=ndjson', {'project_ids': [self.project.id]}, format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+        response = self.client.post(url, {'project_ids': [0]}, format='json')
+        self.assertEqual(read_json(response), [])
+        response = self.client.get('/api/machine/dimensions/list_total/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+
+
+class MachineETagTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.project = Project.objects.create(name='Project', owner=self.user)
+        self.machine = create_machine_tree(self.project, self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_total_not_modified_until_tree_changes(self):
+        url = f'/api/machine/dimensions/{self.machine.id}/total/'
+        response = self.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url, etag).status_code, 304)
+
+        slot = Slot.objects.get(id=self.machine.stator.slot_id)
+        slot.data = {'Zs': 36}
+        slot.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stator']['slot']['data'], {'Zs': 36})
+        etag = response['ETag']
+
+        Hole.objects.get(id=self.machine.rotor.hole_id).delete()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['rotor']['hole'])
+
+        self.machine.name = 'Renamed'
+        self.machine.save()
+        self.assertEqual(self.get(url, response['ETag']).json()['name'], 'Renamed')
+
+    def test_project_machines_and_result(self):
+        url = f'/api/machine/dimensions/project/{self.project.id}/get_machines/'
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        create_machine_tree(self.project, self.user, name='Second')
+        self.assertEqual(len(self.get(url, etag).json()), 2)
+
+        url = f'/api/machine/dimensions/{self.machine.id}/get_result/'
+        response = self.get(url)
+        self.assertEqual(response.json(), self.machine.lptn.result)
+        save_lptn_result(self.machine.id, {'Shaft': {'AvgTemperature': 70.0, 'MaxTemperature': 71.0}})
+        response = self.get(url, response['ETag'])
+        self.assertEqual(response.json()['Shaft']['MaxTemperature'], 71.0)
+        save_lptn_result(self.machine.id, {'Shaft': {'AvgTemperature': 80.0, 'MaxTemperature': 81.0}})
+        self.assertEqual(self.get(url, response['ETag']).json()['Shaft']['MaxTemperature'], 81.0)
+
+
+class ProfilingMiddlewareTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        request_stats.clear()
+        self.user = User.objects.create_superuser('owner@example.com', 'Owner', password='password')
+        self.machine = create_machine_tree(Project.objects.create(name='Project', owner=self.user), self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0, REQUEST_PROFILING_TRACEMALLOC=True,
+                       MIDDLEWARE=['utils.profiling.ProfilingMiddleware'] + settings.MIDDLEWARE)
+    def test_server_timing_and_stats(self):
+        response = self.client.get(f'/api/machine/dimensions/{self.machine.id}/total/')
+        timings = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(timings['db'].split(';desc=')[1], '"2 queries"')
+        self.assertIn('serialize', timings)
+        self.assertIn('total', timings)
+        self.assertIn('mem', timings)
+
+        stats = self.client.get('/api/machine/profiling/stats/').json()
+        total = stats['actions']['MachineViewset.total']
+        self.assertEqual(total['count'], 1)
+        self.assertEqual(total['queries'], {'p50': 2, 'p95': 2, 'p99': 2})
+        self.assertGreater(total['total']['p99'], 0)
+
+    @override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=1.0,
+                       MIDDLEWARE=['utils.profiling.ProfilingMiddleware'] + settings.MIDDLEWARE)
+    def test_streamed_responses_and_unresolved_requests(self):
+        response = self.client.get('/api/machine/dimensions/list_total/')
+        self.assertEqual(request_stats.summary(), {})
+        self.assertEqual(len(read_json(response)), 1)
+        stats = request_stats.summary()['MachineViewset.list_total']
+        self.assertGreater(stats['queries']['p50'], 0)
+        self.assertGreater(stats['stream']['p50'], 0)
+
+        for path in ('/missing/', '/api/machine/missing/'):
+            self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(request_stats.summary()['unresolved']['count'], 2)
+        self.assertEqual(set(request_stats.summary()), {'MachineViewset.list_total', 'unresolved'})
+
+    @mock.patch('Machine_api.redis_client.get_redis')
+    def test_worker_cold_start(self, get_redis):
+        get_redis.return_value = FakeRedis()
+        with mock.patch('pylee_ext.main.preload_pyleecan'), \
+                mock.patch('Machine_api.LPTN.pylee_setup.get_material_db'), \
+                mock.patch('utils.schema.compile_schemas'):
+            preload_worker(sender=mock.Mock(hostname='celery@worker-1'))
+        stats = self.client.get('/api/machine/profiling/stats/').json()
+        self.assertEqual(list(stats['worker_cold_start_seconds']), ['celery@worker-1'])
+        self.assertGreaterEqual(stats['worker_cold_start_seconds']['celery@worker-1'], 0)
+
+    def test_not_profiled_by_default(self):
+        response = self.client.get(f'/api/machine/dimensions/{self.machine.id}/total/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_stats.summary(), {})
+
+
+class MachineCloneTest(LocalCacheTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.project = Project.objects.create(name='Project', owner=self.user)
+        self.machine = create_machine_tree(self.project, self.user)
+        save_lptn_result(self.machine.id, {'Shaft': {'AvgTemperature': 70.0, 'MaxTemperature': 71.0}})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def clone(self, data):
+        return self.client.post(f'/api/machine/dimensions/{self.machine.id}/clone/', data, format='json')
+
+    def test_query_count_does_not_depend_on_copies(self):
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(self.clone({'copies': 1}).status_code, 201)
+        with CaptureQueriesContext(connection) as many:
+            response = self.clone({'copies': 10})
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+        self.assertEqual(len(response.json()['machines']), 10)
+        self.assertEqual(Slot.objects.count(), 2 * 12)
+
+    def test_copies_tree_with_overrides(self):
+        response = self.clone({'overrides': [
+            {},
+            {'name': 'Long', 'stator': {'data': {'CoreLength': 0.2}, 'slot': {'data': {'Zs': 36}}},
+             'cooling': {'htc': {'Airgap': 50}}},
+        ]})
+        first, second = response.json()['machines']
+        original = GetMachineSerializer(Machine.objects.with_tree().get(id=self.machine.id)).data
+        copy = GetMachineSerializer(Machine.objects.with_tree().get(id=first['id'])).data
+        self.assertEqual(copy['name'], 'Machine copy 1')
+        self.assertIsNone(copy['lptn'])
+        self.assertNotEqual(copy['rotor']['hole']['id'], original['rotor']['hole']['id'])
+        self.assertEqual(copy['rotor']['hole']['data'], original['rotor']['hole']['data'])
+
+        long = Machine.objects.with_tree().get(id=second['id'])
+        self.assertEqual(long.name, 'Long')
+        self.assertEqual(long.stator.data['CoreLength'], 0.2)
+        self.assertEqual(long.stator.data['ExternalRadius'], 0.1)
+        self.assertEqual(long.stator.slot.data, {'Zs': 36})
+        self.assertEqual(long.stator.slot_id, second['stator']['slot'])
+        self.assertEqual(long.cooling.htc, {'Airgap': 50})
+        self.assertEqual(Slot.objects.get(id=self.machine.stator.slot_id).data, {'Zs': 48})
+
+    def test_invalid_overrides_create_nothing(self):
+        count = Machine.objects.count()
+        self.assertEqual(self.clone({'overrides': [{}, {'stator': {'colour': 'red'}}]}).status_code, 400)
+        self.assertEqual(self.clone({'copies': 1000}).status_code, 400)
+        self.assertEqual(self.clone({'copies': 10 ** 12}).status_code, 400)
+        self.assertEqual(self.clone({'copies': 'many'}).status_code, 400)
+        self.assertEqual(self.clone({'copies': 1.5}).status_code, 400)
+        self.assertEqual(self.clone({'overrides': [{'project': self.project.id + 1}]}).status_code, 400)
+        self.assertEqual(self.clone({'overrides': [{'project': 'other'}]}).status_code, 400)
+        self.assertEqual(Machine.objects.count(), count)
+
+    def test_copies_into_other_project(self):
+        other = Project.objects.create(name='Other', owner=self.user)
+        response = self.clone({'overrides': [{'project': other.id}]})
+        self.assertEqual(Machine.objects.get(id=response.json()['machines'][0]['id']).project_id, other.id)
+
+
+class MaterialCatalogTest(LocalCacheTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.catalog = MaterialCatalog(self.tmp_dir.name, check_interval=0)
+
+    def write(self, file_name, data, mtime):
+        path = os.path.join(self.tmp_dir.name, file_name)
+        with open(path, 'w') as file:
+            json.dump(data, file)
+        os.utime(path, ns=(mtime, mtime))
+
+    def test_listing_and_lookup(self):
+        self.write('Steel.json', {'M19': {'Thermal Conductivity': '28', 'Specific Heat': 460, 'Density': 7650}}, 1)
+        self.write('AWG.json', {'10': {}, '12': {}}, 1)
+        self.assertEqual(json.loads(self.catalog.listing_bytes()), {'Steel': ['M19'], 'AWG': [10, 12]})
+        self.assertEqual(self.catalog.get_thermal_properties('Steel', 'M19'),
+                         {'Thermal Conductivity': 28.0, 'Specific Heat': 460.0, 'Density': 7650.0})
+        with self.assertRaises(KeyError):
+            self.catalog.get('Steel', 'M400-50A')
+
+    def test_refresh_on_mtime_change(self):
+        self.write('Steel.json', {'M19': {}}, 1)
+        self.assertEqual(self.catalog.listing(), {'Steel': ['M19']})
+        self.assertFalse(self.catalog.refresh())
+        self.write('Steel.json', {'M19': {}, 'M400-50A': {}}, 2)
+        self.assertTrue(self.catalog.refresh())
+        self.assertEqual(self.catalog.listing(), {'Steel': ['M19', 'M400-50A']})
+        os.remove(os.path.join(self.tmp_dir.name, 'Steel.json'))
+        self.assertEqual(self.catalog.listing(), {})
+
+    def test_missing_property(self):
+        self.write('Steel.json', {'M19': {'Thermal Conductivity': 28, 'Specific Heat': 460}}, 1)
+        with open(os.path.join(self.tmp_dir.name, 'Broken.json'), 'w') as file:
+            file.write('{')
+        with self.assertLogs('Machine_api.materials', 'WARNING'):
+            self.catalog.refresh()
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('owner@example.com', 'Owner', password='password'))
+        with mock.patch('Machine_api.views.material_catalog', self.catalog):
+            response = client.post('/api/machine/dimensions/get_material_dict/',
+                                   {'filename': 'Steel', 'material': 'M19'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'M19 in Steel has no numeric Density'})
+
+
+class MaterialRegistryTest(LocalCacheTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.registry = MaterialRegistry(self.tmp_dir.name, check_interval=0)
+        metrics.reset()
+
+    def write(self, file_name, name, mtime, rho=7650):
+        path = os.path.join(self.tmp_dir.name, file_name)
+        with open(path, 'w') as file:
+            json.dump({'__class__': 'Material', 'name': name, 'struct': {'__class__': 'MatStructural', 'rho': rho}}, file)
+        os.utime(path, ns=(mtime, mtime))
+
+    def test_materials_are_loaded_once_on_lookup(self):
+        self.write('M19.json', 'M19', 1)
+        self.write('Copper.json', 'Copper1', 1)
+        material = self.registry['M19']
+        self.assertIs(self.registry.get('M19'), material)
+        self.assertEqual(metrics.get_counters(), {'material_registry.load': 1})
+
+        self.assertEqual(self.registry.get('Copper1').name, 'Copper1')
+        self.assertIsNone(self.registry.get('Air'))
+        self.assertEqual(metrics.get_counters(), {'material_registry.load': 2})
+        copy = self.registry.copy('M19')
+        copy.struct.rho = 0
+        self.assertEqual(self.registry['M19'].struct.rho, 7650)
+
+    def test_changed_files_are_reloaded(self):
+        self.write('M19.json', 'M19', 1)
+        self.write('M400-50A.json', 'M400-50A', 1)
+        material = self.registry['M19']
+        unchanged = self.registry['M400-50A']
+        self.write('M19.json', 'M19', 2, rho=7600)
+        self.assertEqual(self.registry['M19'].struct.rho, 7600)
+        self.assertIsNot(self.registry['M19'], material)
+        self.assertIs(self.registry['M400-50A'], unchanged)
+        os.remove(os.path.join(self.tmp_dir.name, 'M19.json'))
+        with self.assertRaises(KeyError):
+            self.registry['M19']
+
+
+class TTLCacheTest(LocalCacheTestCase):
+    def test_entries_expire_and_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1, now=0)
+        cache.set('b', 2, expires_at=5, now=0)
+        self.assertEqual(cache.get('a', now=1), 1)
+        self.assertIsNone(cache.get('b', now=5))
+        cache.set('b', 2, now=6)
+        cache.set('c', 3, now=6)
+        self.assertIsNone(cache.get('a', now=6))
+        self.assertEqual((cache.get('b', now=6), cache.get('c', now=6)), (2, 3))
+        cache.set('d', 4, expires_at=1, now=6)
+        self.assertIsNone(cache.get('d', now=6))
+
+
+FIREBASE_SETTINGS = ('FIREBASE_SERVICE_ACCOUNT', 'FIREBASE_PROJECTID', 'FIREBASE_PRIVATEKEYID', 'FIREBASE_PRIVATEKEY',
+                     'FIREBASE_CLIENT_EMAIL', 'FIREBASE_CLIENTID', 'FIREBASE_AUTHURL', 'FIREBASE_TOKENURL',
+                     'FIREBASE_AUTHPROVIDER', 'FIREBASE_CLIENT_CERT')
+
+
+def import_firebase_authentication():
+    """Returns firebase_authentication.authentication, which initializes the Firebase app on import"""
+    # The credentials are not available to the tests
+    with mock.patch.dict(os.environ, {name: 'test' for name in FIREBASE_SETTINGS}), \
+            mock.patch('firebase_admin.credentials.Certificate'), mock.patch('firebase_admin.initialize_app'):
+        return importlib.import_module('firebase_authentication.authentication')
+
+
+class FirebaseAuthenticationTest(LocalCacheTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authentication = import_firebase_authentication()
+
+    def setUp(self):
+        self.authentication.token_cache.clear()
+        self.authentication.user_cache.clear()
+
+    def test_user_cache_is_bounded_by_token_expiry(self):
+        token = {'uid': 'firebase-uid', 'exp': 1000}
+        with mock.patch.object(self.authentication.auth, 'verify_id_token', return_value=token):
+            decoded_token = self.authentication.verify_token('id-token', now=900)
+        user = self.authentication.get_user(decoded_token['uid'], decoded_token['exp'], now=900)
+        self.assertEqual(user.email, 'firebase-uid')
+
+        User.objects.filter(id=user.id).update(is_active=False)
+        with self.assertNumQueries(0):
+            cached = self.authentication.get_user('firebase-uid', decoded_token['exp'], now=999)
+        self.assertEqual(cached.id, user.id)
+        # Every request gets its own instance, changes made by one are not seen by the others
+        self.assertIsNot(cached, user)
+        cached.name = 'Changed'
+        self.assertEqual(self.authentication.get_user('firebase-uid', decoded_token['exp'], now=999).name, '')
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user('firebase-uid', decoded_token['exp'], now=1000)
+
+    def test_revocation_is_checked_at_the_configured_interval(self):
+        interval = self.authentication.REVOCATION_CHECK_INTERVAL
+        token = {'uid': 'firebase-uid', 'exp': 10 * interval}
+        with mock.patch.object(self.authentication.auth, 'verify_id_token', return_value=token) as verify_id_token:
+            self.authentication.verify_token('id-token', now=0)
+            self.authentication.verify_token('id-token', now=interval - 1)
+            self.assertEqual(verify_id_token.call_count, 1)
+            verify_id_token.assert_called_with('id-token', check_revoked=True)
+
+            verify_id_token.side_effect = ValueError('Token revoked')
+            with self.assertRaises(ValueError):
+                self.authentication.verify_token('id-token', now=interval)
+            with self.assertRaises(ValueError):
+                self.authentication.verify_token('id-token', now=interval + 1)
+        self.assertEqual(verify_id_token.call_count, 3)
+
+
+class FakeRedis:
+    """Dict backed stand-in for the few Redis commands used by the render pipeline and task events"""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return False
+        self.data[key] = value.encode()
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def eval(self, script, numkeys, key, value):
+        # Only the compare-and-delete script of render.py is used
+        if self.data.get(key) == (value if isinstance(value, bytes) else value.encode()):
+            del self.data[key]
+            return 1
+        return 0
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+    def incr(self, key):
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field.encode()] = str(value).encode()
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+
+class MachineCacheTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.machine = create_machine_tree(Project.objects.create(name='Project', owner=self.user), self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_tree_readers_share_the_cached_entry(self):
+        url = f'/api/machine/dimensions/{self.machine.id}/total/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Revision only, the tree validated comes from the entry of total
+        with self.assertNumQueries(1):
+            self.assertEqual(get_machine_tree(self.machine.id)['stator']['slot']['data'], {'Zs': 48})
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/machine/dimensions/{self.machine.id}/validate/')
+
+        slot = Slot.objects.get(id=self.machine.stator.slot_id)
+        slot.data = {'Zs': 36}
+        slot.save()
+        self.assertEqual(get_machine_tree(self.machine.id)['stator']['slot']['data'], {'Zs': 36})
+
+    def test_unknown_machine(self):
+        self.assertEqual(self.client.get('/api/machine/dimensions/0/total/').status_code, 404)
+        self.assertEqual(self.client.get('/api/machine/dimensions/0/get_result/').status_code, 404)
+        self.assertEqual(self.client.get('/api/machine/dimensions/0/validate/').status_code, 404)
+
+
+class RenderPipelineTest(LocalCacheTestCase):
+    @mock.patch('Machine_api.render.get_redis')
+    @mock.patch('Machine_api.render.create_machine_image_task.apply_async')
+    def test_identical_renders_are_submitted_once(self, apply_async, get_redis):
+        get_redis.return_value = FakeRedis()
+        apply_async.side_effect = lambda args, task_id: mock.Mock(id=task_id, status='PENDING')
+
+        with mock.patch('Machine_api.render.current_app.AsyncResult') as async_result:
+            async_result.side_effect = lambda task_id: mock.Mock(id=task_id, status='STARTED')
+            first = submit_machine_image({'id': 1, 'name': 'Machine'})
+            second = submit_machine_image({'id': 1, 'name': 'Machine'})
+            third = submit_machine_image({'id': 1, 'name': 'Renamed'})
+
+        self.assertEqual(first.id, second.id)
+        self.assertNotEqual(first.id, third.id)
+        self.assertEqual(apply_async.call_count, 2)
+
+    @mock.patch('Machine_api.render.get_redis')
+    @mock.patch('Machine_api.render.create_machine_image_task.apply_async')
+    def test_failed_renders_are_submitted_again(self, apply_async, get_redis):
+        get_redis.return_value = FakeRedis()
+        apply_async.side_effect = lambda args, task_id: mock.Mock(id=task_id, status='PENDING')
+        results = {}
+
+        with mock.patch('Machine_api.render.current_app.AsyncResult') as async_result:
+            async_result.side_effect = lambda task_id: mock.Mock(id=task_id, status='SUCCESS', result=results[task_id])
+            first = submit_machine_image({'id': 1, 'name': 'Machine'})
+            results[first.id] = {'error': 'S3 unavailable'}
+            second = submit_machine_image({'id': 1, 'name': 'Machine'})
+            results[second.id] = {'valid_machine': False, 'img_loc': 'Machines/1/img.png', 'error': 'Invalid slot'}
+            third = submit_machine_image({'id': 1, 'name': 'Machine'})
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(second.id, third.id)
+        self.assertEqual(apply_async.call_count, 2)
+
+    @mock.patch('Machine_api.render.get_redis')
+    @mock.patch('Machine_api.render.create_machine_image_task.apply_async')
+    def test_concurrent_resubmissions_render_once(self, apply_async, get_redis):
+        client = FakeRedis()
+        get_redis.return_value = client
+        apply_async.side_effect = lambda args, task_id: mock.Mock(id=task_id, status='PENDING')
+        statuses = {}
+
+        with mock.patch('Machine_api.render.current_app.AsyncResult') as async_result:
+            async_result.side_effect = lambda task_id: mock.Mock(id=task_id, status=statuses.get(task_id, 'PENDING'))
+            failed = submit_machine_image({'id': 1, 'name': 'Machine'})
+            statuses[failed.id] = 'FAILURE'
+            first = submit_machine_image({'id': 1, 'name': 'Machine'})
+            # The second request read the failed render before the first one registered its replacement
+            get, stale = client.get, [failed.id.encode()]
+            client.get = lambda key: stale.pop() if stale else get(key)
+            second = submit_machine_image({'id': 1, 'name': 'Machine'})
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(apply_async.call_count, 2)
+
+    @mock.patch('Machine_api.render.get_redis')
+    @mock.patch('Machine_api.render.create_machine_image_task.apply_async')
+    def test_registered_render_expiring_meanwhile(self, apply_async, get_redis):
+        client = FakeRedis()
+        # Registered by another request, then expired before it is read
+        client.set = mock.Mock(side_effect=[False, True])
+        get_redis.return_value = client
+        apply_async.side_effect = lambda args, task_id: mock.Mock(id=task_id, status='PENDING')
+        self.assertEqual(submit_machine_image({'id': 1, 'name': 'Machine'}).status, 'PENDING')
+        self.assertEqual(apply_async.call_count, 1)
+
+
+class FakePyleecanMachine:
+    def json_to_pyleecan(self, machine_dict):
+        return self
+
+    def check(self):
+        pass
+
+    def plot(self, is_show_fig=True):
+        plt.plot([0, 1], [0, 1])
+
+
+class AxialSliceCacheTest(LocalCacheTestCase):
+    def setUp(self):
+        global_functions._s3_client = None
+        user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        project = Project.objects.create(name='Project', owner=user)
+        self.machine = create_machine_tree(project, user)
+
+    def get_machine_dict(self):
+        return json.loads(json.dumps(GetMachineSerializer(Machine.objects.with_tree().get()).data))
+
+    def test_geometry_hash_ignores_non_geometric_edits(self):
+        before = self.get_machine_dict()
+        Machine.objects.update(name='Renamed')
+        Cooling.objects.update(htc={'Airgap': 100})
+        Loss.objects.update(data={'StatorWinding': 500})
+        self.assertEqual(get_geometry_hash(before), get_geometry_hash(self.get_machine_dict()))
+        Slot.objects.filter(id=self.machine.stator.slot_id).update(data={'Zs': 36})
+        self.assertNotEqual(get_geometry_hash(before), get_geometry_hash(self.get_machine_dict()))
+
+    @mock_s3
+    def test_unchanged_geometry_returns_stored_image(self):
+        bucket = os.environ['BUCKET_NAME']
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=bucket)
+        machine_dict = self.get_machine_dict()
+        converted = coerce_machine(self.get_machine_dict())
+        manifest = {'geometry_hash': get_geometry_hash(converted), 'valid_machine': True, 'error': None}
+        s3.put_object(Bucket=bucket, Key=f'{self.machine.id}/MachinePlot.json', Body=json.dumps(manifest).encode())
+        metrics.reset()
+
+        with mock.patch('utils.plot.get_pylee_machine') as get_pylee_machine:
+            img_dict = create_axial_slice(machine_dict)
+
+        get_pylee_machine.assert_not_called()
+        self.assertEqual(img_dict, {'valid_machine': True, 'img_loc': f's3://{bucket}/{self.machine.id}/MachinePlot.png'})
+        self.assertEqual(metrics.get_counters(), {'axial_slice.cache_hit': 1})
+
+    @mock_s3
+    def test_render_is_uploaded_from_memory(self):
+        bucket = os.environ['BUCKET_NAME']
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=bucket)
+        metrics.reset()
+
+        with mock.patch('utils.plot.get_pylee_machine', return_value=FakePyleecanMachine()):
+            img_dict = create_axial_slice(self.get_machine_dict(), img_format='svg', dpi=50)
+            cached = create_axial_slice(self.get_machine_dict(), img_format='svg', dpi=50)
+
+        key = f'{self.machine.id}/MachinePlot_50dpi.svg'
+        self.assertEqual(img_dict, {'valid_machine': True, 'img_loc': f's3://{bucket}/{key}'})
+        self.assertEqual(cached, img_dict)
+        obj = s3.get_object(Bucket=bucket, Key=key)
+        self.assertEqual(obj['ContentType'], 'image/svg+xml')
+        self.assertIn(b'<svg', obj['Body'].read())
+        self.assertEqual(metrics.get_counters(), {'axial_slice.cache_miss': 1, 'axial_slice.cache_hit': 1})
+        self.assertFalse(os.path.exists(os.path.join('temp', 'MachinePlot.png')))
+
+
+class PyleecanComponentCacheTest(LocalCacheTestCase):
+    def setUp(self):
+        expand_pylee_classes()
+        get_component_cache().clear()
+        metrics.reset()
+
+    def get_machine_dict(self, Zs=48):
+        lamination = {'CoreLength': 0.1, 'PackingFactor': 0.95, 'Material': 'M400-50A'}
+        return {
+            'type': 'IPMSM',
+            'stator': {'id': 1, 'type': 'LamSlot', 'data': dict(lamination, ExternalRadius=0.1, InternalRadius=0.06),
+                       'slot': {'id': 2, 'type': 'SlotW11', 'data': {'Zs': Zs}},
+                       'conductor': {'id': 3, 'type': 'CondType12', 'data': {'ConductorMaterial': 'Copper1', 'InsulationMaterial': 'Insulator1'}}},
+            'rotor': {'id': 4, 'type': 'LamHole', 'data': dict(lamination, ExternalRadius=0.059, InternalRadius=0.02),
+                      'hole': {'id': 5, 'type': 'HoleM50', 'data': {'Zh': 8, 'Material': 'MagnetPrius'}}},
+            'housing': {'id': 6, 'type': 'Frame', 'data': {'FrameLength': 0.12, 'InternalRadius': 0.1, 'ExternalRadius': 0.11, 'Material': 'M400-50A'}},
+        }
+
+    def build(self, machine_dict):
+        return get_pylee_machine(machine_dict).json_to_pyleecan(machine_dict)
+
+    def test_edited_slot_is_rebuilt_alone(self):
+        first = self.build(self.get_machine_dict())
+        self.assertEqual(metrics.get_counters(), {'pyleecan_cache.miss': 5})
+
+        second = self.build(self.get_machine_dict())
+        self.assertIsNot(second.rotor.hole[0], first.rotor.hole[0])
+        self.assertEqual(second.rotor.hole[0].as_dict(), first.rotor.hole[0].as_dict())
+        self.assertIs(first.stator.slot.parent, first.stator)
+        self.assertIs(second.stator.slot.parent, second.stator)
+        self.assertEqual(metrics.get_counters(), {'pyleecan_cache.miss': 5, 'pyleecan_cache.hit': 5})
+
+        third = self.build(self.get_machine_dict(Zs=36))
+        self.assertEqual(third.stator.slot.Zs, 36)
+        self.assertIsNot(third.stator.slot, second.stator.slot)
+        self.assertEqual(third.stator.winding.conductor.as_dict(), second.stator.winding.conductor.as_dict())
+        self.assertEqual(metrics.get_counters(), {'pyleecan_cache.miss': 6, 'pyleecan_cache.hit': 9})
+
+    def test_copies_share_the_materials(self):
+        material = PyleecanMaterial(name='Steel')
+        component_cache = ComponentCache()
+        shafts = [component_cache.get('shaft', {'id': 1, 'type': 'Shaft', 'data': 0.04},
+                                      lambda: Shaft(Drsh=0.04, mat_type=material), material) for _ in range(2)]
+        self.assertIsNot(shafts[0], shafts[1])
+        self.assertTrue(all(shaft.mat_type is material and shaft.Drsh == 0.04 for shaft in shafts))
+
+    def test_least_recently_used_is_evicted(self):
+        component_cache = ComponentCache(maxsize=2)
+        for id in (1, 2, 1, 3):
+            component_cache.get('slot', {'id': id, 'type': 'SlotW11', 'data': {}}, object)
+        self.assertEqual([key[1] for key in component_cache.entries], [1, 3])
+        self.assertEqual(metrics.get_counters(), {'pyleecan_cache.miss': 3, 'pyleecan_cache.hit': 1, 'pyleecan_cache.eviction': 1})
+
+
+class MachineSchemaTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.machine = create_machine_tree(Project.objects.create(name='Project', owner=self.user), self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_coerces_to_pyleecan_types(self):
+        machine_dict = json.loads(json.dumps(GetMachineSerializer(Machine.objects.with_tree().get()).data))
+        machine_dict['stator']['slot']['data'] = {'Zs': '36', 'W0': '0.004', 'H1_is_rad': 'false'}
+        machine_dict['cooling']['flow'] = {'InletTemperature': '65'}
+        machine = coerce_machine(machine_dict)
+        self.assertEqual(machine['type'], 'IPMSM')
+        self.assertEqual(machine['stator']['slot']['data'], {'Zs': 36, 'W0': 0.004, 'H1_is_rad': False})
+        self.assertIsInstance(machine['rotor']['hole']['data']['Zh'], int)
+        self.assertEqual(machine['cooling']['flow'], {'InletTemperature': 65.0})
+        self.assertEqual(machine_dict['stator']['slot']['data']['Zs'], '36')
+
+    def test_reports_every_invalid_value_with_its_path(self):
+        Slot.objects.filter(id=self.machine.stator.slot_id).update(type='SlotW11', data={'Zs': 36.5, 'W0': -1})
+        Hole.objects.filter(id=self.machine.rotor.hole_id).update(type='HoleUnknown')
+        response = self.client.get(f'/api/machine/dimensions/{self.machine.id}/validate/').json()
+        self.assertFalse(response['valid'])
+        self.assertEqual([error['path'] for error in response['errors']],
+                         ['stator.slot.data.Zs', 'stator.slot.data.W0', 'rotor.hole.type'])
+        self.assertIn('stator.data.PackingFactor', response['missing'])
+
+        with self.assertRaises(SchemaError) as context:
+            coerce_machine(GetMachineSerializer(Machine.objects.with_tree().get()).data)
+        self.assertEqual(len(context.exception.errors), 3)
+        response = self.client.get(f'/api/machine/dimensions/{self.machine.id}/create_machine_image/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_finite_numbers_and_invalid_ids(self):
+        for value in ('nan', 'inf', '-inf', float('nan')):
+            with self.assertRaises(ValueError):
+                Field('float', vmin=0, vmax=1).coerce(value)
+        with self.assertRaises(ValueError):
+            Field('float', vmin=0).coerce('inf')
+        _, errors, _ = validate_machine({'stator': {'id': 'abc', 'type': 'LamSlot', 'data': {}}})
+        self.assertEqual(errors, [{'path': 'stator.id', 'message': "expected a number, got 'abc'"}])
+
+    def test_classes_without_sources_are_coerced_loosely(self):
+        get_pyleecan_schema.cache_clear()
+        self.addCleanup(get_pyleecan_schema.cache_clear)
+        with mock.patch('utils.schema.inspect.getsource', side_effect=OSError('could not get source code')):
+            self.assertIsNone(get_pyleecan_schema('SlotW11'))
+            compile_schemas()
+            machine, errors, _ = validate_machine({'stator': {'id': 1, 'type': 'LamSlot', 'data': {},
+                                                              'slot': {'id': 2, 'type': 'SlotW11', 'data': {'Zs': '36'}}}})
+        self.assertEqual(errors, [])
+        self.assertEqual(machine['stator']['slot']['data'], {'Zs': 36.0})
+
+
+class LPTNResultsCopyTest(LocalCacheTestCase):
+    def setUp(self):
+        global_functions._s3_client = None
+
+    @mock_s3
+    def test_copies_changed_objects_only(self):
+        bucket = os.environ['BUCKET_NAME']
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=bucket)
+        for index in range(12):
+            s3.put_object(Bucket=bucket, Key=f'Images/Results/Temperature/plot{index}.png', Body=b'plot%d' % index)
+
+        results = lptn_results_task(7)
+        self.assertEqual((results['copied'], results['skipped']), (12, 0))
+        self.assertEqual(len(results['timings']), 12)
+        self.assertIsNone(results['error'])
+        body = s3.get_object(Bucket=bucket, Key='7/Results/LPTN/Temperature/plot3.png')['Body'].read()
+        self.assertEqual(body, b'plot3')
+
+        s3.put_object(Bucket=bucket, Key='Images/Results/Temperature/plot3.png', Body=b'changed')
+        results = lptn_results_task(7)
+        self.assertEqual((results['copied'], results['skipped']), (1, 11))
+        body = s3.get_object(Bucket=bucket, Key='7/Results/LPTN/Temperature/plot3.png')['Body'].read()
+        self.assertEqual(body, b'changed')
+
+
+class S3UploadDirTest(LocalCacheTestCase):
+    def setUp(self):
+        global_functions._s3_client = None
+        self.directory = tempfile.TemporaryDirectory()
+        for index in range(5):
+            with open(os.path.join(self.directory.name, f'plot{index}.png'), 'wb') as file:
+                file.write(b'png%d' % index)
+        with open(os.path.join(self.directory.name, 'results.json'), 'w') as file:
+            json.dump({'StatorWinding': {'MaxTemperature': 120.0}}, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @mock_s3
+    def test_sync_uploads_changed_files_only(self):
+        bucket = os.environ['BUCKET_NAME']
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=bucket)
+        manifest = global_functions.s3_upload_dir(self.directory.name, bucket, 'Results', sync=True, compress=True)
+        self.assertEqual(len(manifest['uploaded']), 6)
+        self.assertFalse(manifest['skipped'] or manifest['errors'])
+
+        obj = s3.get_object(Bucket=bucket, Key='Results/results.json')
+        self.assertIn('gzip', obj['ContentEncoding'])
+        self.assertEqual(json.loads(gzip.decompress(obj['Body'].read())), {'StatorWinding': {'MaxTemperature': 120.0}})
+        self.assertEqual(manifest['uploaded']['Results/plot1.png']['etag'], s3.head_object(Bucket=bucket, Key='Results/plot1.png')['ETag'])
+
+        with open(os.path.join(self.directory.name, 'plot2.png'), 'wb') as file:
+            file.write(b'changed')
+        manifest = global_functions.s3_upload_dir(self.directory.name, bucket, 'Results', sync=True, compress=True)
+        self.assertEqual(list(manifest['uploaded']), ['Results/plot2.png'])
+        self.assertEqual(len(manifest['skipped']), 5)
+
+    @mock_s3
+    def test_sync_lists_the_bucket_directory_only(self):
+        bucket = os.environ['BUCKET_NAME']
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=bucket)
+        s3.put_object(Bucket=bucket, Key='Other/plot1.png', Body=b'other')
+        s3.put_object(Bucket=bucket, Key='Results/Old/plot1.png', Body=b'old')
+        global_functions.s3_upload_dir(self.directory.name, bucket, 'Results', sync=True)
+        client = global_functions.get_s3_client()
+        listings = []
+
+        def get_paginator(name):
+            paginator = get_real_paginator(name)
+            paginate = paginator.paginate
+            paginator.paginate = lambda **kwargs: listings.append(kwargs) or paginate(**kwargs)
+            return paginator
+
+        get_real_paginator = client.get_paginator
+        with mock.patch.object(client, 'get_paginator', side_effect=get_paginator):
+            manifest = global_functions.s3_upload_dir(self.directory.name, bucket, '', sync=True)
+            self.assertEqual(len(manifest['uploaded']), 6)
+            manifest = global_functions.s3_upload_dir(self.directory.name, bucket, 'Results', sync=True)
+            self.assertEqual(len(manifest['skipped']), 6)
+        self.assertEqual([(listing['Prefix'], listing['Delimiter']) for listing in listings], [('', '/'), ('Results/', '/')])
+
+    @mock_s3
+    def test_failed_uploads_raise(self):
+        bucket = os.environ['BUCKET_NAME']
+        boto3.client('s3').create_bucket(Bucket=bucket)
+        with mock.patch.object(global_functions.get_s3_client(), 'upload_file', side_effect=OSError('Connection reset')):
+            with self.assertRaises(global_functions.S3UploadError) as context:
+                global_functions.s3_upload_dir(self.directory.name, bucket, 'Results', filter='.png')
+            self.assertEqual(len(context.exception.manifest['errors']), 5)
+            manifest = global_functions.s3_upload_dir(self.directory.name, bucket, 'Results', filter='.png',
+                                                      raise_errors=False)
+        self.assertEqual(len(manifest['errors']), 5)
+
+
+LPTN_MACHINE = {
+    'rotor': {
+        'type': 'LamHole',
+        'data': {'InternalRadius': 0.02, 'ExternalRadius': 0.059, 'CoreLength': 0.1, 'PackingFactor': 0.95},
+        'hole': {'type': 'HoleM50', 'data': {'Zh': 8}},
+    },
+    'stator': {
+        'type': 'LamSlot',
+        'data': {'InternalRadius': 0.06, 'ExternalRadius': 0.1, 'CoreLength': 0.1},
+        'slot': {'type': 'SlotW11', 'data': {'Zs': 48, 'H0': 0.001, 'H2': 0.02}},
+        'conductor': {'type': 'CondType12', 'data': {}},
+    },
+    'housing': {'type': 'Frame', 'data': {'InternalRadius': 0.1, 'ExternalRadius': 0.11, 'FrameLength': 0.14}},
+    'cooling': {'htc': {'WaterJacket': 3000}, 'flow': {'InletTemperature': 65}},
+    'loss': {'data': {'StatorWinding': 800, 'StatorTooth': 150, 'StatorBackIron': 150, 'RotorMagnet': 40}},
+}
+
+
+class ComponentResultQueryTest(LocalCacheTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.project = Project.objects.create(name='Project', owner=self.user)
+        other_project = Project.objects.create(name='Other', owner=self.user)
+        for name, temperature, project in [('Cool', 90.0, self.project), ('Hot', 150.0, self.project),
+                                           ('Warm', 120.0, self.project), ('Other', 200.0, other_project)]:
+            machine = create_machine_tree(project, self.user, name=name)
+            save_lptn_result(machine.id, {
+                'StatorWinding': {'Name': 'StatorWinding', 'AvgTemperature': temperature - 10,
+                                  'MaxTemperature': temperature, 'HeatFluxes': {'StatorTooth': -100.0}},
+                'Shaft': {'Name': 'Shaft', 'AvgTemperature': 70.0, 'MaxTemperature': 71.0, 'HeatFluxes': {}},
+            })
+
+    def query(self, **params):
+        return self.client.get('/api/machine/dimensions/component_results/', params)
+
+    def test_ranks_and_filters_in_sql(self):
+        with self.assertNumQueries(1):
+            response = self.query(component='StatorWinding', project_ids=str(self.project.id), limit=2)
+        self.assertEqual([row['machine_name'] for row in response.json()], ['Hot', 'Warm'])
+
+        response = self.query(component='StatorWinding', min_temperature=100, max_temperature=160, order='asc')
+        self.assertEqual([row['max_temperature'] for row in response.json()], [120.0, 150.0])
+        response = self.query(component='StatorWinding', temperature='avg', max_temperature=100)
+        self.assertEqual([row['machine_name'] for row in response.json()], ['Cool'])
+
+    def test_resolve_replaces_rows(self):
+        machine = Machine.objects.get(name='Hot')
+        save_lptn_result(machine.id, {'StatorWinding': {'AvgTemperature': 50.0, 'MaxTemperature': 60.0}})
+        self.assertEqual(machine.component_results.count(), 1)
+        self.assertEqual(self.query(component='StatorWinding', limit=1).json()[0]['machine_name'], 'Other')
+        self.assertEqual(self.query(component='StatorWinding', temperature='median').status_code, 400)
+
+
+class LPTNSolverTest(LocalCacheTestCase):
+    def test_results_schema(self):
+        with open('component_results.json') as file:
+            reference = json.load(file)
+        results = solve_machine_lptn(LPTN_MACHINE)
+        self.assertEqual(set(results), set(reference))
+        for name, result in results.items():
+            self.assertEqual(set(result), set(reference[name]))
+            self.assertEqual(result['Name'], name)
+            self.assertGreaterEqual(result['MaxTemperature'], result['AvgTemperature'])
+            self.assertGreater(result['AvgTemperature'], 65)
+        self.assertEqual(set(results['RotorMagnet']['HeatFluxes']), set(reference['RotorMagnet']['HeatFluxes']))
+
+    def test_energy_balance(self):
+        network = build_machine_network(LPTN_MACHINE, n_axial=25, n_radial=6)
+        self.assertGreater(network.n_nodes, 1000)
+        T = network.solve_steady()
+        heat_out = network.conductance_matrix() @ T
+        boundary = list(network.boundary)
+        self.assertAlmostEqual(-heat_out[boundary].sum(), 1140, places=6)
+
+    def test_solve_task(self):
+        user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        machine = create_machine_tree(Project.objects.create(name='Project', owner=user), user)
+        Housing.objects.filter(id=machine.housing_id).update(data=LPTN_MACHINE['housing']['data'])
+        Rotor.objects.filter(id=machine.rotor_id).update(data=LPTN_MACHINE['rotor']['data'])
+        Loss.objects.filter(id=machine.loss_id).update(data=LPTN_MACHINE['loss']['data'])
+        results = lptn_solve_task(machine.id)
+        self.assertLess(results['WaterJacket']['AvgTemperature'], results['StatorWinding']['AvgTemperature'])
+
+    def test_transient_converges_to_steady_state(self):
+        steady = solve_machine_lptn(LPTN_MACHINE)
+        duty_cycle = [{'duration': 600, 'scale': 0.5}, {'duration': 2e5, 'scale': 1.0}]
+        results = solve_machine_lptn_transient(LPTN_MACHINE, duty_cycle, n_output=50)
+        self.assertEqual(len(results['Time']), 50)
+        winding = results['Components']['StatorWinding']['MaxTemperature']
+        self.assertEqual(len(winding), 50)
+        self.assertAlmostEqual(winding[0], 65.0)
+        self.assertAlmostEqual(winding[-1], steady['StatorWinding']['MaxTemperature'], delta=0.2)
+        self.assertEqual(set(results['Final']), set(steady))
+
+    def test_batch_matches_single_solves(self):
+        points = [{'scale': 0.5}, {'scale': 1.0}, {'losses': {'StatorWinding': 300.0}}]
+        results = solve_machine_lptn_batch(LPTN_MACHINE, points)
+        self.assertEqual(len(results['AvgTemperature']), 3)
+        steady = solve_machine_lptn(LPTN_MACHINE)
+        for index, name in enumerate(results['Components']):
+            self.assertEqual(results['AvgTemperature'][1][index], steady[name]['AvgTemperature'])
+            self.assertEqual(results['MaxTemperature'][1][index], steady[name]['MaxTemperature'])
+            self.assertLessEqual(results['MaxTemperature'][0][index], results['MaxTemperature'][1][index])
+
+    def test_invalid_duty_cycle(self):
+        with self.assertRaises(InvalidInputError):
+            get_duty_cycle([{'duration': -1, 'scale': 1.0}], {})
+        with self.assertRaises(InvalidInputError):
+            get_duty_cycle([], {})
+        for segment in ({'duration': 'inf'}, {'duration': '1e400'}, {'duration': 'nan'}, {'duration': 1e7},
+                        {'duration': 60, 'scale': 'inf'}, {'duration': 60, 'losses': {'Shaft': 'nan'}}):
+            with self.assertRaises(InvalidInputError):
+                get_duty_cycle([segment], {'Shaft': 10.0})
+        with self.assertRaises(InvalidInputError):
+            get_operating_points([{'scale': float('inf')}], {'Shaft': 10.0})
+        with self.assertRaises(InvalidInputError):
+            get_duty_cycle([{'duration': 0.001, 'scale': 1.0}] * 20000, {'Shaft': 10.0})
+        self.assertEqual(len(get_duty_cycle([{'duration': 1, 'scale': 1.0}] * 1000, {'Shaft': 10.0})), 1000)
+
+
+class SweepTest(LocalCacheTestCase):
+    def setUp(self):
+        cache.clear()
+        self.redis = FakeRedis()
+        patcher = mock.patch('Machine_api.events.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.machine = create_machine_tree(Project.objects.create(name='Project', owner=self.user), self.user)
+        Housing.objects.filter(id=self.machine.housing_id).update(data=LPTN_MACHINE['housing']['data'])
+        Rotor.objects.filter(id=self.machine.rotor_id).update(data=LPTN_MACHINE['rotor']['data'])
+        Loss.objects.filter(id=self.machine.loss_id).update(data=LPTN_MACHINE['loss']['data'])
+
+    def sweep(self, parameters):
+        return self.client.post(f'/api/machine/dimensions/{self.machine.id}/sweep/',
+                                {'parameters': parameters, 'image': False}, format='json')
+
+    def test_designs_are_evaluated_once_and_tabulated(self):
+        with mock.patch('Machine_api.tasks.run_variant', wraps=run_variant) as evaluate:
+            response = self.sweep([{'path': 'stator.data.ExternalRadius', 'values': [0.1, '0.1', 0.11]},
+                                   {'path': 'loss.data.StatorWinding', 'start': 400, 'stop': 800, 'num': 2}])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['variants'], data['designs']), (6, 4))
+        self.assertEqual(evaluate.call_count, 4)
+
+        table = data['result']
+        self.assertEqual(table['columns'][:4], ['stator.data.ExternalRadius', 'loss.data.StatorWinding', 'design_hash', 'valid'])
+        self.assertEqual(len(table['rows']), 6)
+        rows = {tuple(row[:2]): row for row in table['rows']}
+        self.assertEqual(rows[(0.1, 400.0)][2:], rows[('0.1', 400.0)][2:])
+        winding = table['columns'].index('StatorWinding.MaxTemperature')
+        self.assertLess(rows[(0.1, 400.0)][winding], rows[(0.1, 800.0)][winding])
+        progress = [event['meta'] for channel, event in self.redis.published
+                    if channel == f"task-events:{data['task_id']}" and event['state'] == 'PROGRESS']
+        self.assertEqual([(meta['done'], meta['total']) for meta in progress], [(1, 4), (2, 4), (3, 4), (4, 4)])
+
+    @mock.patch('Machine_api.tasks.run_variant', return_value={'design_hash': 'abc', 'valid': True})
+    def test_variant_results_survive_cache_errors(self, evaluate):
+        options = {'lptn': True, 'image': False, 'n_axial': 4, 'n_radial': 2}
+        with mock.patch('Machine_api.tasks.cache') as variant_cache:
+            variant_cache.get.side_effect = redis.ConnectionError('Connection refused')
+            variant_cache.set.side_effect = redis.ConnectionError('Connection refused')
+            self.assertEqual(sweep_variant_task('sweep', 1, 'abc', {}, options), {'design_hash': 'abc', 'valid': True})
+        key = variant_cache.set.call_args[0][0]
+        self.assertRegex(key, r'^sweep_variant:abc:[0-9a-f]{64}$')
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.sweep([{'path': 'name', 'values': ['a']}]).status_code, 400)
+        self.assertEqual(self.sweep([{'path': 'stator.slot.data.Zs', 'start': 1, 'stop': 500, 'num': 500}]).status_code, 400)
+        self.assertEqual(self.sweep([{'path': 'stator.missing.data.Zs', 'values': [36]}]).status_code, 400)
+
+
+class FakeAsyncRedis:
+    """Serves the events of a FakeRedis to the ASGI stream, messages are queued on the pub/sub"""
+
+    def __init__(self, redis, messages=()):
+        self.redis = redis
+        self.messages = list(messages)
+
+    async def get(self, key):
+        return self.redis.get(key)
+
+    def pubsub(self):
+        return self
+
+    async def subscribe(self, channel):
+        pass
+
+    async def unsubscribe(self):
+        pass
+
+    async def reset(self):
+        pass
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        if self.messages:
+            return {'type': 'message', 'data': json.dumps(self.messages.pop(0)).encode()}
+        return None
+
+
+class TaskEventsTest(LocalCacheTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch('Machine_api.events.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('owner@example.com', 'Owner', password='password')
+
+    def stream(self, task_id, token, messages=()):
+        scope = {'type': 'http', 'method': 'GET', 'headers': [], 'query_string': f'token={token}'.encode()}
+        sent = []
+
+        async def receive():
+            await asyncio.sleep(10)
+
+        async def send(message):
+            sent.append(message)
+
+        with mock.patch('Machine_api.streams.get_async_redis', return_value=FakeAsyncRedis(self.redis, messages)):
+            # Runs the authentication, which is sync_to_async, in this thread and its test transaction
+            async_to_sync(task_events)(scope, receive, send, task_id)
+        return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:]).decode()
+
+    @mock.patch('Machine_api.tasks.lptn_results_task.delay')
+    def test_solve_result_is_persisted_by_the_task(self, results_delay):
+        machine = create_machine_tree(Project.objects.create(name='Project', owner=self.user), self.user)
+        Housing.objects.filter(id=machine.housing_id).update(data=LPTN_MACHINE['housing']['data'])
+        Rotor.objects.filter(id=machine.rotor_id).update(data=LPTN_MACHINE['rotor']['data'])
+        result = lptn_solve_task.apply(args=[machine.id]).get()
+
+        machine.refresh_from_db()
+        self.assertEqual(machine.lptn.result, result)
+        self.assertEqual(LPTN.objects.count(), 1)
+        self.assertEqual(machine.component_results.count(), len(result))
+        results_delay.assert_called_once_with(machine.id)
+        self.assertEqual([event['state'] for _, event in self.redis.published], ['STARTED', 'SUCCESS'])
+
+        lptn_solve_task.apply(args=[machine.id])
+        self.assertEqual(LPTN.objects.count(), 1)
+        self.assertEqual(LPTNComponentResult.objects.count(), len(result))
+
+        # Stored by the task body, before the result backend marks the task successful
+        LPTN.objects.update(result=None)
+        lptn_solve_task.run(machine.id)
+        self.assertEqual(LPTN.objects.get().result, result)
+        self.assertEqual(results_delay.call_count, 2)
+
+    def test_stream_sends_events_until_final_state(self):
+        token = str(AccessToken.for_user(self.user))
+        self.redis.set('task-owner:abc', str(self.user.id))
+        publish_event('abc', 'STARTED')
+        status, body = self.stream('abc', token, [
+            {'task_id': 'abc', 'state': 'PROGRESS', 'meta': {'progress': 0.5}},
+            {'task_id': 'abc', 'state': 'SUCCESS', 'result': {'Airgap': {}}},
+            {'task_id': 'abc', 'state': 'PROGRESS', 'meta': {'progress': 1.0}},
+        ])
+        self.assertEqual(status, 200)
+        self.assertEqual([line for line in body.split('\n') if line.startswith('event:')],
+                         ['event: STARTED', 'event: PROGRESS', 'event: SUCCESS'])
+
+        publish_event('abc', 'SUCCESS', result={})
+        status, body = self.stream('abc', token)
+        self.assertTrue(body.startswith('event: SUCCESS'))
+
+    def test_stream_requires_owner_token(self):
+        self.redis.set('task-owner:abc', str(self.user.id))
+        self.assertEqual(self.stream('abc', 'invalid')[0], 401)
+        other = User.objects.create_user('other@example.com', 'Other', password='password')
+        self.assertEqual(self.stream('abc', str(AccessToken.for_user(other)))[0], 403)
+        self.assertEqual(self.stream('unknown', str(AccessToken.for_user(other)))[0], 404)
+
+    def test_stream_accepts_the_configured_authentication(self):
+        authentication = import_firebase_authentication()
+        authentication.token_cache.clear()
+        authentication.user_cache.clear()
+        classes = settings.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] + [
+            'firebase_authentication.authentication.FirebaseAuthentication']
+        firebase_user = User.objects.create_user('firebase-uid', 'Firebase', password='password')
+        self.redis.set('task-owner:abc', str(firebase_user.id))
+        publish_event('abc', 'SUCCESS', result={})
+        token = {'uid': 'firebase-uid', 'exp': 4102444800}
+        with override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_AUTHENTICATION_CLASSES=classes)), \
+                mock.patch.object(authentication.auth, 'verify_id_token', return_value=token):
+            self.assertEqual(self.stream('abc', 'firebase-id-token')[0], 200)
+        self.assertEqual(self.stream('abc', 'firebase-id-token')[0], 401)
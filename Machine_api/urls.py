@@ -1,4 +1,5 @@
 
+from django.urls import path
 from rest_framework.routers import SimpleRouter
 
 from . import views
@@ -21,4 +22,6 @@ router.register(r'slot', views.SlotViewset, basename='slot')
 router.register(r'cooling', views.CoolingViewset, basename='cooling')
 router.register(r'hole', views.HoleViewset, basename='hole')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('profiling/stats/', views.ProfilingStatsView.as_view(), name='profiling-stats'),
+]
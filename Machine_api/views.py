@@ -1,33 +1,76 @@
-import traceback
-import glob
-import json
-import os
+import uuid
 
-from celery import current_app
+import redis
+from celery import chord, current_app
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
 
-from django.http import JsonResponse
 from django.conf import settings
+from django.db.models import F, Prefetch
+from django.http import Http404, HttpResponse, JsonResponse
 
 from .serializers import *
 from .models import *
-from utils.plot import create_axial_slice
-from .tasks import lptn_solve_task, lptn_results_task
+from .materials import material_catalog
+from .redis_client import get_worker_stats
+from .render import submit_machine_image
+from .events import get_latest_event, register_task
+from .etag import cached_json_response, get_etag
+from .cache import get_machine_tree, lptn_result_response, tree_response
+from .clone import MAX_CLONES, clone_machine
+from .streaming import STREAM_RENDERERS, streaming_response
+from .sweep import generate_variants
+from utils.plot import get_axial_slice_key
+from utils.schema import SchemaError, validate_machine
+from .tasks import lptn_solve_task, lptn_transient_task, lptn_batch_task, sweep_aggregate_task, sweep_variant_task
+from .LPTN.machine_network import get_duty_cycle, get_operating_points
+from utils.global_functions import InvalidInputError
+from utils import metrics
+from utils.profiling import request_stats, span
+
+# Value of the view query parameter returning rows without their nested relations
+SUMMARY_VIEW = 'summary'
+
+
+def is_summary(request):
+    """Returns True if request asks for the summary representation, ?view=summary"""
+    return request.query_params.get('view') == SUMMARY_VIEW
 
 
 class OrganisationViewSet(ModelViewSet):
     serializer_class = OrganisationSerializer
     queryset = Organisation.objects.order_by('-id').all()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # OrganisationSerializer lists the ids of the projects
+            queryset = queryset.prefetch_related(Prefetch('projects', queryset=Project.objects.only('id')))
+        return queryset
+
     @action(detail=True, methods=['GET'])
     def get_org_projects(self, request, pk=None):
+        """
+        Returns a page of the organisation's projects, {"projects", "next", "previous"}.
+        Projects are joined with their owner, ?view=summary returns the owner's id only.
+        """
         organisation = self.get_object()
-        get_org_projects_serializer = GetOrgProjectsSerializer(organisation)
-        return Response(get_org_projects_serializer.data)
+        projects = organisation.projects.all()
+        if is_summary(request):
+            serializer_class = ProjectSummarySerializer
+        else:
+            serializer_class = GetProjectSerializer
+            projects = projects.select_related('owner')
+        page = self.paginate_queryset(projects)
+        with span('serialize'):
+            data = serializer_class(page, many=True).data
+        return Response({'projects': data, 'next': self.paginator.get_next_link(),
+                         'previous': self.paginator.get_previous_link()})
 
 
 class ProjectViewSet(ModelViewSet):
@@ -69,9 +112,47 @@ class UserViewSet(ModelViewSet):
             return JsonResponse('failure', safe=False)
 
 
+# Discretisation limits of the thermal network per component
+MAX_LPTN_AXIAL = 200
+MAX_LPTN_RADIAL = 50
+# Maximum number of time points of a transient result
+MAX_LPTN_OUTPUT = 2000
+# Maximum number of operating points of a batch solve
+MAX_LPTN_POINTS = 1000
+# Maximum number of rows returned by a component result query
+MAX_COMPONENT_RESULTS = 1000
+
+
+def get_lptn_resolution(params):
+    """Returns (n_axial, n_radial) from request parameters. Raises ValueError if out of bounds."""
+    try:
+        n_axial = int(params.get('n_axial', 4))
+        n_radial = int(params.get('n_radial', 2))
+    except (TypeError, ValueError):
+        raise ValueError('n_axial and n_radial must be integers')
+    if not (0 < n_axial <= MAX_LPTN_AXIAL and 0 < n_radial <= MAX_LPTN_RADIAL):
+        raise ValueError(f'n_axial must be 1-{MAX_LPTN_AXIAL} and n_radial 1-{MAX_LPTN_RADIAL}')
+    return n_axial, n_radial
+
+
 class MachineViewset(viewsets.ModelViewSet):
     serializer_class = MachineSerializer
     queryset = Machine.objects.order_by('-id').all()
+    # Actions serializing the complete machine tree
+    tree_actions = ('list_total', 'clone')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.tree_actions:
+            queryset = queryset.with_tree()
+        return queryset
+
+    def get_tree(self, pk):
+        """Returns the serialized tree of machine pk, from the response cache if available"""
+        try:
+            return get_machine_tree(int(pk))
+        except (ValueError, Machine.DoesNotExist):
+            raise Http404
 
     def create(self, request, *args, **kwargs):
         coming_data = request.data
@@ -86,36 +167,43 @@ class MachineViewset(viewsets.ModelViewSet):
     @action(detail=False, methods=['GET'], url_path="project/(?P<project_id>[^/.]+)/get_machines")
     def get_all(self, request, *args, **kwargs):
         project_id = kwargs.get('project_id')
-        machines = Machine.objects.filter(project_id=project_id)
-        get_machines_serializer = GetMachineSerializer(machines, many=True)
-        return Response(get_machines_serializer.data)
-
-    @action(detail=False, methods=['POST'], url_path="projects/get-machines")
+        machines = Machine.objects.filter(project_id=project_id).order_by('id')
+        # The ETag changes when a machine is added, removed or any machine's revision changes
+        revisions = list(machines.values_list('id', 'revision'))
+        if is_summary(request):
+            etag = get_etag('project_machines', project_id, SUMMARY_VIEW, revisions)
+            return cached_json_response(request, etag, lambda: MachineSummarySerializer(machines, many=True).data)
+        etag = get_etag('project_machines', project_id, revisions)
+        return cached_json_response(request, etag,
+                                    lambda: GetMachineSerializer(machines.with_tree(), many=True).data)
+
+    @action(detail=False, methods=['POST'], url_path="projects/get-machines", renderer_classes=STREAM_RENDERERS)
     def get_projects_machines(self, request, *args, **kwargs):
+        """Streams the machines of project_ids as a json array, or ndjson with ?format=ndjson"""
         project_ids = request.data.get('project_ids')
-        machines = Machine.objects.filter(project_id__in=project_ids)
-        get_machines_serializer = GetMachineSerializer(machines, many=True)
-        return Response(get_machines_serializer.data)
+        machines = Machine.objects.filter(project_id__in=project_ids).order_by('id')
+        if is_summary(request):
+            return streaming_response(request, machines, MachineSummarySerializer)
+        return streaming_response(request, machines.with_tree(), GetMachineSerializer)
 
     @action(detail=True, methods=['GET'])
     def total(self, request, pk=None):
-        machine = self.get_object()
-        serializer = GetMachineSerializer(machine)
-        return Response(serializer.data)
+        try:
+            return tree_response(request, int(pk))
+        except (ValueError, Machine.DoesNotExist):
+            raise Http404
 
     @action(detail=True, methods=['GET', 'POST'])
     def get_housing_type(self, request, pk=None):
         housingType = Housing.objects.values('type').get(id=pk)['type']
         return JsonResponse(housingType, safe=False)
 
-    @action(detail=False, methods=['GET'])
+    @action(detail=False, methods=['GET'], renderer_classes=STREAM_RENDERERS)
     def list_total(self, request):
-        header = request.META.get('HTTP_AUTHORIZATION')
-        qs = super().get_queryset()
-        res_dict = {}
-        for machine in qs:
-            res_dict[machine.id] = GetMachineSerializer(machine).data
-        return JsonResponse(res_dict)
+        """Streams all machines as a json object keyed by id, or ndjson with ?format=ndjson"""
+        if is_summary(request):
+            return streaming_response(request, Machine.objects.order_by('-id'), MachineSummarySerializer, key='id')
+        return streaming_response(request, self.get_queryset(), GetMachineSerializer, key='id')
 
     @action(detail=False, methods=['GET', 'POST'])
     def get_slot_type(self, request, pk=None):
@@ -129,54 +217,262 @@ class MachineViewset(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['GET', 'POST'])
     def lptn_solve(self, request, pk=None):
-        """Dummy: Solves LPTN model"""
+        """
+        Submits the steady state solve of the machine's thermal network
+
+        Parameters
+        ----------
+        request: HttpRequest
+            Optional query parameters n_axial and n_radial set the discretisation of every component
+
+        Returns
+        -------
+        response: JsonResponse
+            Contains the solve task id and status
+        """
+        try:
+            n_axial, n_radial = get_lptn_resolution(request.query_params)
+        except ValueError as err:
+            return JsonResponse({'error': str(err)}, status=400)
+
+        machine = self.get_object()
         res = {}
-        task = lptn_solve_task.delay()
+        task = lptn_solve_task.delay(machine.id, n_axial, n_radial)
+        register_task(task.id, request.user)
         res['task_id'] = task.id
         res['task_status'] = task.status
         return JsonResponse(res)
 
+    @action(detail=True, methods=['POST'])
+    def lptn_transient(self, request, pk=None):
+        """
+        Submits a transient solve of the machine's thermal network over a duty cycle
+
+        Parameters
+        ----------
+        request: HttpRequest
+            duty_cycle: [{"duration": s, "losses": {component: W}} or {"duration": s, "scale": factor}]
+            Optional n_axial, n_radial, n_output (number of time points) and initial_temperature
+
+        Returns
+        -------
+        response: JsonResponse
+            Contains the solve task id and status. The task reports PROGRESS while running.
+        """
+        duty_cycle = request.data.get('duty_cycle')
+        try:
+            n_axial, n_radial = get_lptn_resolution(request.data)
+            n_output = int(request.data.get('n_output', 200))
+            initial_temperature = request.data.get('initial_temperature')
+            if initial_temperature is not None:
+                initial_temperature = float(initial_temperature)
+            if not 2 <= n_output <= MAX_LPTN_OUTPUT:
+                raise ValueError(f'n_output must be 2-{MAX_LPTN_OUTPUT}')
+            get_duty_cycle(duty_cycle, {})
+        except (TypeError, ValueError, InvalidInputError) as err:
+            return JsonResponse({'error': str(err)}, status=400)
+
+        machine = self.get_object()
+        task = lptn_transient_task.delay(machine.id, duty_cycle, n_axial, n_radial, n_output, initial_temperature)
+        register_task(task.id, request.user)
+        return JsonResponse({'task_id': task.id, 'task_status': task.status})
+
+    @action(detail=True, methods=['POST'])
+    def lptn_solve_batch(self, request, pk=None):
+        """
+        Submits the steady state solve of the machine's thermal network for several operating points
+
+        Parameters
+        ----------
+        request: HttpRequest
+            operating_points: [{"losses": {component: W}} or {"scale": factor}]
+            Optional n_axial and n_radial
+
+        Returns
+        -------
+        response: JsonResponse
+            Contains the solve task id and status
+        """
+        operating_points = request.data.get('operating_points')
+        try:
+            n_axial, n_radial = get_lptn_resolution(request.data)
+            get_operating_points(operating_points, {})
+            if len(operating_points) > MAX_LPTN_POINTS:
+                raise ValueError(f'At most {MAX_LPTN_POINTS} operating points can be solved at once')
+        except (ValueError, InvalidInputError) as err:
+            return JsonResponse({'error': str(err)}, status=400)
+
+        machine = self.get_object()
+        task = lptn_batch_task.delay(machine.id, operating_points, n_axial, n_radial)
+        register_task(task.id, request.user)
+        return JsonResponse({'task_id': task.id, 'task_status': task.status})
+
+    @action(detail=False, methods=['GET'], url_path="(?P<machine_id>[^/.]+)/lptn_batch_task/(?P<task_id>[^/.]+)")
+    def get_lptn_batch_task(self, request, *args, **kwargs):
+        task = current_app.AsyncResult(kwargs.get('task_id'))
+        response_data = {'task_id': task.id, 'task_status': task.status}
+        if task.status == 'SUCCESS':
+            response_data['result'] = task.get()
+        return JsonResponse(response_data)
+
     @action(detail=False, methods=['GET'], url_path="(?P<machine_id>[^/.]+)/lptn_solve_task/(?P<task_id>[^/.]+)")
     def get_lptn_solve_task(self, request, *args, **kwargs):
-        machine_id = int(kwargs.get('machine_id'))
-        task_id = kwargs.get('task_id')
-        task = current_app.AsyncResult(task_id)
+        """
+        Returns the state of a solve task. Results are stored by the task itself when it completes,
+        events can be streamed from /api/machine/task_events/<task_id>/ instead of polling.
+        """
+        task = current_app.AsyncResult(kwargs.get('task_id'))
         response_data = {'task_id': task.id, 'task_status': task.status}
+        if task.status == 'SUCCESS':
+            response_data['result'] = task.result
+        elif task.status == 'PROGRESS':
+            response_data['progress'] = task.info
+        return JsonResponse(response_data)
+
+    @action(detail=True, methods=['POST'])
+    def clone(self, request, pk=None):
+        """
+        Copies the machine and its whole component tree, without LPTN results
+
+        Parameters
+        ----------
+        request: HttpRequest
+            copies: number of identical copies, default 1
+            or overrides: one object per copy, e.g. [{"name": "Variant", "stator": {"data": {"CoreLength": 0.2}}}]
 
+        Returns
+        -------
+        response: JsonResponse
+            Ids of the created machines and components
+        """
+        overrides = request.data.get('overrides')
+        try:
+            if overrides is None:
+                # Form data holds strings, json numbers. Checked before the overrides are built.
+                copies = request.data.get('copies', 1)
+                if isinstance(copies, str) and copies.isdigit() and len(copies) <= 4:
+                    copies = int(copies)
+                if isinstance(copies, bool) or not isinstance(copies, int) or not 0 < copies <= MAX_CLONES:
+                    raise ValueError(f'copies must be an integer between 1 and {MAX_CLONES}')
+                overrides = [{}] * copies
+            if not isinstance(overrides, list) or not 0 < len(overrides) <= MAX_CLONES:
+                raise ValueError(f'Between 1 and {MAX_CLONES} copies can be created at once')
+            machine = self.get_object()
+            owner = request.user if request.user.is_authenticated else None
+            ids = clone_machine(machine, overrides, owner)
+        except (TypeError, ValueError) as err:
+            return JsonResponse({'error': str(err)}, status=400)
+        return JsonResponse({'machines': ids}, status=201)
+
+    @action(detail=True, methods=['POST'])
+    def sweep(self, request, pk=None):
+        """
+        Submits the evaluation of variants of the machine for every combination of the swept parameters.
+        Variants of the same design are evaluated once, progress can be streamed from /api/machine/task_events/<task_id>/.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            parameters: [{"path": "stator.slot.data.Zs", "values": [36, 48]},
+                         {"path": "stator.data.ExternalRadius", "start": 0.09, "stop": 0.11, "num": 3}]
+            Optional lptn and image (default true) select the evaluations, n_axial and n_radial the LPTN resolution
+
+        Returns
+        -------
+        response: JsonResponse
+            Contains the sweep task id and status, the number of variants and of distinct designs.
+            Once complete, also the table of results, see get_sweep_task.
+        """
+        try:
+            n_axial, n_radial = get_lptn_resolution(request.data)
+            options = {'lptn': bool(request.data.get('lptn', True)), 'image': bool(request.data.get('image', True)),
+                       'n_axial': n_axial, 'n_radial': n_radial}
+            paths, variants = generate_variants(self.get_tree(pk), request.data.get('parameters'))
+        except (TypeError, ValueError) as err:
+            return JsonResponse({'error': str(err)}, status=400)
+
+        designs = {}
+        for variant in variants:
+            designs.setdefault(variant['design_hash'], variant.pop('machine'))
+        # The aggregation task id identifies the sweep, the designs report their progress under it
+        sweep_id = str(uuid.uuid4())
+        register_task(sweep_id, request.user)
+        header = [sweep_variant_task.s(sweep_id, len(designs), design_hash, machine_dict, options)
+                  for design_hash, machine_dict in designs.items()]
+        task = chord(header)(sweep_aggregate_task.s(paths, variants).set(task_id=sweep_id))
+        res_dict = {'task_id': task.id, 'task_status': task.status, 'variants': len(variants), 'designs': len(designs)}
         if task.status == 'SUCCESS':
-            result = task.get()
-            response_data['result'] = result
-
-            machine = Machine.objects.get(id=machine_id)
-            if machine.lptn_id:  # LPTN result update
-                lptn = LPTN.objects.get(id=machine.lptn_id)
-                lptn.result = result
-                lptn.save()
-            else:  # LPTN result insert
-                lptn_serializer = CreateLPTNSerializer
-                data = {
-                    'result': task.get()
-                }
-                serializer = lptn_serializer(data=data)
-                serializer.is_valid()
-                serializer.save()
-
-                machine.lptn_id = serializer.data['id']
-                machine.save()
-            # execute lptn_results_task
-            lptn_results_task.delay(machine_id)
+            res_dict['result'] = task.result
+        return JsonResponse(res_dict)
 
+    @action(detail=False, methods=['GET'], url_path="(?P<machine_id>[^/.]+)/sweep_task/(?P<task_id>[^/.]+)")
+    def get_sweep_task(self, request, *args, **kwargs):
+        """
+        Returns the state of a sweep, its progress while running and its table of results once complete:
+        {"columns": [parameters..., "design_hash", "valid", "error", "img_loc", "MaxTemperature", "<component>.MaxTemperature"...],
+        "rows": [[...] per variant], "variants", "designs"}
+        """
+        task = current_app.AsyncResult(kwargs.get('task_id'))
+        response_data = {'task_id': task.id, 'task_status': task.status}
+        if task.status == 'SUCCESS':
+            response_data['result'] = task.result
+        else:
+            event = get_latest_event(task.id)
+            if event is not None and event.get('state') == 'PROGRESS':
+                response_data['progress'] = event['meta']
         return JsonResponse(response_data)
 
+    @action(detail=False, methods=['GET'])
+    def component_results(self, request):
+        """
+        Ranks the stored LPTN results of one component across machines
+
+        Parameters
+        ----------
+        request: HttpRequest
+            component: component name, e.g. StatorWinding
+            Optional project_ids (comma separated), min_temperature and max_temperature (thresholds on the
+            ranked temperature), temperature (max or avg, default max), order (desc or asc, default desc), limit
+
+        Returns
+        -------
+        response: JsonResponse
+            [{"machine", "machine_name", "project", "component", "avg_temperature", "max_temperature"}]
+        """
+        params = request.query_params
+        component = params.get('component')
+        field = {'max': 'max_temperature', 'avg': 'avg_temperature'}.get(params.get('temperature', 'max'))
+        order = params.get('order', 'desc')
+        if not component or field is None or order not in ('asc', 'desc'):
+            return JsonResponse({'error': 'component is required, temperature must be max or avg and order asc or desc'},
+                                status=400)
+        try:
+            limit = min(int(params.get('limit', 50)), MAX_COMPONENT_RESULTS)
+            project_ids = [int(id) for id in params['project_ids'].split(',')] if params.get('project_ids') else None
+            min_temperature = float(params['min_temperature']) if 'min_temperature' in params else None
+            max_temperature = float(params['max_temperature']) if 'max_temperature' in params else None
+        except ValueError:
+            return JsonResponse({'error': 'limit, project_ids and temperature thresholds must be numeric'}, status=400)
+
+        # Only rows of the machine's current LPTN result
+        results = LPTNComponentResult.objects.filter(component=component, lptn_id=F('machine__lptn_id'))
+        if project_ids is not None:
+            results = results.filter(machine__project_id__in=project_ids)
+        if min_temperature is not None:
+            results = results.filter(**{f'{field}__gte': min_temperature})
+        if max_temperature is not None:
+            results = results.filter(**{f'{field}__lte': max_temperature})
+        results = results.order_by(field if order == 'asc' else f'-{field}', 'machine_id')[:max(limit, 0)]
+        rows = results.values('machine', 'component', 'avg_temperature', 'max_temperature',
+                              machine_name=F('machine__name'), project=F('machine__project_id'))
+        return JsonResponse(list(rows), safe=False)
+
     @action(detail=False, methods=['GET'], url_path="(?P<machine_id>[^/.]+)/get_result")
     def get_machine_result(self, request, *args, **kwargs):
-        machine_id = int(kwargs.get('machine_id'))
-        machine = Machine.objects.get(id=machine_id)
-
-        if machine.lptn_id:
-            return JsonResponse(machine.lptn.result)
-        else:
-            return JsonResponse(None, safe=False)
+        try:
+            return lptn_result_response(request, int(kwargs.get('machine_id')))
+        except (ValueError, Machine.DoesNotExist):
+            raise Http404
 
         # try:
         #     lptn = LPTN.objects.get(machine=machine_id)
@@ -189,85 +485,84 @@ class MachineViewset(viewsets.ModelViewSet):
         rotorType = Rotor.objects.values('type').get(id=pk)['type']
         return JsonResponse(rotorType, safe=False)
 
+    @action(detail=True, methods=['GET'])
+    def validate(self, request, pk=None):
+        """
+        Checks the machine input against the schema of every component type
+
+        Returns
+        -------
+        response: JsonResponse
+            {"valid": bool, "errors": [{"path", "message"}] of invalid values, "missing": [paths of required values]}
+        """
+        _, errors, missing = validate_machine(self.get_tree(pk))
+        return JsonResponse({'valid': not errors and not missing, 'errors': errors, 'missing': missing})
+
     @action(detail=True)
     def create_machine_image(self, request, pk=None):
         """
-        Checks if machine input is valid and generates 2D axial view of machine
+        Submits the check of the machine input and the generation of its 2D axial view
 
         Parameters
         ----------
         request: HttpRequest
+            Optional query parameters img_format (png or svg) and dpi
 
         Returns
         -------
         response: JsonResponse
-            Contains S3 image location, validity of machine dimensions, error msg (optional)
+            Contains the render task id and status.
+            Once rendered, also the S3 image location, validity of machine dimensions and error msg (optional)
         """
-        # Convert HttpRequest to json
-        machine = self.get_object()
-        data = GetMachineSerializer(machine).data
-        # res_dict = {"error": None}
+        img_format = request.query_params.get('img_format', 'png')
+        dpi = request.query_params.get('dpi')
+        try:
+            dpi = int(dpi) if dpi else None
+            get_axial_slice_key(pk, img_format, dpi)
+        except ValueError as err:
+            return JsonResponse({"error": str(err)}, status=400)
+
+        data = self.get_tree(pk)
+        _, errors, _ = validate_machine(data)
+        if errors:
+            return JsonResponse({"machine": data, "error": SchemaError(errors).args[0], "errors": errors}, status=400)
         res_dict = {"machine": data,
                     "error": None}
 
-        # #Debug
-        # machine_json = json.dumps(data, indent=4, sort_keys=True)
-        # os.makedirs('Debug', exist_ok=True)
-        # with open(os.path.join("Debug", "machine.json"), 'w') as file:
-        #     file.write(machine_json)
+        task = submit_machine_image(data, img_format, dpi)
+        register_task(task.id, request.user)
+        res_dict['task_id'] = task.id
+        res_dict['task_status'] = task.status
+        if task.status == 'SUCCESS':
+            res_dict.update(task.result)
+        return JsonResponse(res_dict)
 
-        res_status = 200
-        # Create image
-        try:
-            img_dict = create_axial_slice(data)
-            # if not img_dict["valid_machine"]:
-            #     res_status = 400
-            res_dict.update(img_dict)
-            response = JsonResponse(res_dict, status=res_status)
-        except Exception as err:
-            if settings.DEBUG:
-                err = traceback.format_exc()
-            res_dict["error"] = str(err)
-            response = JsonResponse(res_dict, status=res_status)
-        return response
+    @action(detail=False, methods=['GET'], url_path="(?P<machine_id>[^/.]+)/machine_image_task/(?P<task_id>[^/.]+)")
+    def get_machine_image_task(self, request, *args, **kwargs):
+        task_id = kwargs.get('task_id')
+        task = current_app.AsyncResult(task_id)
+        response_data = {'task_id': task.id, 'task_status': task.status}
+
+        if task.status == 'SUCCESS':
+            response_data.update(task.result)
+
+        return JsonResponse(response_data)
 
     @action(detail=False, methods=['GET'])
     def get_materials(self, request, *args, **kwargs):
-        files = glob.glob('Machine_api/Materials/*', recursive=True)
-        response = {}
-
-        for single_file in files:
-            with open(single_file, 'r') as file:
-                try:
-                    materials = []
-                    data = json.load(file)
-                    file_name = os.path.basename(file.name)
-                    response_key = file_name.split('.')[0]
-                    if response_key == 'AWG' or response_key == 'SWG':
-                        keys = [int(key) for key in data.keys()]
-                        for k in keys:
-                            materials.append(k)
-                    else:
-                        for key in data.keys():
-                            materials.append(key)
-                    response[response_key] = list(set(materials))
-                except KeyError:
-                    print(f'Skipping {single_file}')
-
-        return JsonResponse(response, safe=False)
+        return HttpResponse(material_catalog.listing_bytes(), content_type='application/json')
 
     @action(detail=False, methods=['POST'])
     def get_material_dict(self, request, *args, **kwargs):
         filename = request.data.get('filename')
         material = request.data.get('material')
 
-        with open('Machine_api/Materials/{}.json'.format(filename)) as file:
-            data = json.load(file)
-            response = {
-                'Thermal Conductivity': float(data[material].get('Thermal Conductivity')),
-                'Specific Heat': float(data[material].get('Specific Heat')),
-                'Density': float(data[material].get('Density'))
-            }
+        try:
+            response = material_catalog.get_thermal_properties(filename, material)
+        except KeyError:
+            return JsonResponse({'error': f'Unknown material {material} in {filename}'}, status=404)
+        except ValueError as err:
+            return JsonResponse({'error': str(err)}, status=400)
 
         return JsonResponse(response, safe=False)
 
@@ -342,3 +637,19 @@ class SlotViewset(ModelViewSet):
     queryset = Slot.objects.order_by('-id').all()
 
 
+class ProfilingStatsView(APIView):
+    """Percentiles of the requests profiled by this process, see utils.profiling, and the cold start time per worker"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            cold_starts = get_worker_stats('cold_start_seconds')
+        except redis.RedisError:
+            cold_starts = None
+        return Response({
+            'enabled': settings.REQUEST_PROFILING,
+            'sample_rate': settings.REQUEST_PROFILING_SAMPLE_RATE,
+            'actions': request_stats.summary(),
+            'counters': metrics.get_counters(),
+            'worker_cold_start_seconds': cold_starts,
+        })
@@ -1,12 +1,18 @@
+import hashlib
+import time
+
 import firebase_admin
-from django.contrib.auth.models import User
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
 from django.utils import timezone
 from firebase_admin.exceptions import FirebaseError
 from rest_framework import authentication
+from rest_framework.exceptions import AuthenticationFailed
 import firebase_admin.auth as auth
 from firebase_admin import credentials
 
 from Dimensions_api.settings import env
+from firebase_authentication.cache import TTLCache
 from firebase_authentication.exceptions import NoAuthToken, InvalidAuthToken
 
 cred=credentials.Certificate(
@@ -26,6 +32,87 @@ cred=credentials.Certificate(
 
 default_app = firebase_admin.initialize_app(cred)
 
+# Verified tokens are kept until they expire, users for USER_CACHE_TTL seconds but not beyond the expiry of their token.
+# Revocation is checked again once a cached token is older than REVOCATION_CHECK_INTERVAL, 0 disables the check.
+TOKEN_CACHE_SIZE = env.int("FIREBASE_TOKEN_CACHE_SIZE", default=10000)
+USER_CACHE_TTL = env.float("FIREBASE_USER_CACHE_TTL", default=300.0)
+REVOCATION_CHECK_INTERVAL = env.float("FIREBASE_REVOCATION_CHECK_INTERVAL", default=300.0)
+
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+user_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+User = get_user_model()
+# Fields of the cached user snapshots, every request builds its own instance from them
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+
+def verify_token(id_token, now=None):
+    """
+    Returns the decoded token, verifying it only if it is not cached or its revocation check is due
+
+    Parameters
+    ----------
+    id_token: str
+        Firebase ID token
+    now: float
+        Current epoch time, default: time.time()
+
+    Returns
+    -------
+    decoded_token: dict
+        Claims of the token
+    """
+    now = time.time() if now is None else now
+    key = hashlib.sha256(id_token.encode()).hexdigest()
+    cached = token_cache.get(key, now)
+    if cached is not None:
+        decoded_token, verified_at = cached
+        if not REVOCATION_CHECK_INTERVAL or now - verified_at < REVOCATION_CHECK_INTERVAL:
+            return decoded_token
+
+    try:
+        decoded_token = auth.verify_id_token(id_token, check_revoked=bool(REVOCATION_CHECK_INTERVAL))
+    except Exception:
+        token_cache.pop(key)
+        raise
+    token_cache.set(key, (decoded_token, now), expires_at=decoded_token.get("exp"), now=now)
+    return decoded_token
+
+
+def get_user(uid, expires_at=None, now=None):
+    """
+    Returns the user of a Firebase uid, creating it on first login
+
+    Parameters
+    ----------
+    uid: str
+        Firebase uid, stored as the user's USERNAME_FIELD
+    expires_at: float
+        Expiry of the token of the request (epoch seconds), the user is not cached beyond it
+    now: float
+        Current epoch time, default: time.time()
+
+    Returns
+    -------
+    user: User
+        A new instance per call, built from the cached field values. Whether the user is active is checked again
+        whenever the cached values expire, inactive users are rejected with AuthenticationFailed.
+    """
+    now = time.time() if now is None else now
+    values = user_cache.get(uid, now)
+    if values is not None:
+        return User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, values)
+
+    user, created = User.objects.get_or_create(**{User.USERNAME_FIELD: uid})
+    if not user.is_active:
+        raise AuthenticationFailed("User inactive or deleted")
+    cache_until = now + USER_CACHE_TTL
+    if expires_at is not None:
+        cache_until = min(cache_until, expires_at)
+    user_cache.set(uid, tuple(getattr(user, name) for name in USER_FIELDS), expires_at=cache_until, now=now)
+    return user
+
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
         auth_header = request.META.get("HTTP_AUTHORIZATION")
@@ -35,7 +122,7 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         id_token = auth_header.split(" ").pop()
         decoded_token = None
         try:
-            decoded_token = auth.verify_id_token(id_token)
+            decoded_token = verify_token(id_token)
         except Exception as err:
             raise InvalidAuthToken("Invalid auth token")
             pass
@@ -48,7 +135,7 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         except Exception as err:
             raise FirebaseError()
 
-        user, created = User.objects.get_or_create(username=uid)
+        user = get_user(uid, decoded_token.get("exp"))
         # user.profile.last_activity = timezone.localtime()
 
-        return (user, None)
\ No newline at end of file
+        return (user, None)
@@ -3,11 +3,9 @@
 from pyleecan.Classes.MachineIPMSM import MachineIPMSM
 from pyleecan.Classes.LamHole import LamHole
 from pyleecan.Classes.LamSlotWind import LamSlotWind
-from pyleecan.Classes.Frame import Frame
-from pyleecan.Classes.Shaft import Shaft
 from pyleecan.Classes.Winding import Winding
-from pyleecan.Functions.Load.import_class import import_class
 from utils.global_functions import convert_list_to_dict
+from .cache import build_conductor, build_frame, build_hole, build_shaft, build_slot
 
 def extend_MachineIPMSM():
     """Adds custom ECS methods to Pyleecan MachineIPMSM class"""
@@ -15,15 +13,16 @@ def extend_MachineIPMSM():
 
 def json_to_pyleecan(self, inp_dict, material_db=None):
     """
-    Creates pyleecan MachineIPMSM object from Frontend json input
+    Creates pyleecan MachineIPMSM object from Frontend json input.
+    Slots, holes, conductors, frame and shaft are reused from the component cache of the worker.
 
     Parameters
     ----------
     self: MachineIPMSM
     inp_dict: json
         Frontend User Input
-    material_db: list
-        List containing Pyleecan materials. If None, Machine is created without materials.
+    material_db: list or MaterialRegistry
+        Pyleecan materials, looked up by name. If None, Machine is created without materials.
 
     Returns
     -------
@@ -38,40 +37,38 @@ def json_to_pyleecan(self, inp_dict, material_db=None):
     inp_stator_lam = inp_stator["data"]
     inp_slot = inp_stator.get("slot")
     inp_cond = inp_stator.get("conductor")
-    inp_frame = inp_dict["housing"]["data"]
-    if material_db:
+    inp_housing = inp_dict["housing"]
+    inp_frame = inp_housing["data"]
+    if material_db is None:
+        material_dict = {}
+    elif isinstance(material_db, list):
         material_dict = convert_list_to_dict(material_db, 'name')
     else:
-        material_dict = {}
+        material_dict = material_db
 
     #Rotor
     rotor_mat = material_dict.get(inp_rotor_lam["Material"], -1)
     rotor = LamHole(L1=inp_rotor_lam["CoreLength"], Kf1=inp_rotor_lam["PackingFactor"], Rext=inp_rotor_lam["ExternalRadius"], Rint=inp_rotor_lam["InternalRadius"], mat_type=rotor_mat, is_stator=False, is_internal=True)
     mag_mat = material_dict.get(inp_hole["data"]["Material"], -1)
     air_mat = material_dict.get("Air", -1)
-    rotor_hole = import_class("pyleecan.Classes", inp_hole["type"])
-    rotor_hole = rotor_hole(init_dict=inp_hole["data"], mat_void=air_mat)
-    rotor.hole.append(rotor_hole)
-    rotor.hole[0].magnet_0.mat_type = mag_mat
+    rotor.hole.append(build_hole(inp_hole, mag_mat, air_mat))
 
     #Stator
     stator_mat = material_dict.get(inp_stator_lam["Material"], -1)
     stator = LamSlotWind(L1=inp_stator_lam["CoreLength"], Kf1=inp_stator_lam["PackingFactor"], Rext=inp_stator_lam["ExternalRadius"], Rint=inp_stator_lam["InternalRadius"], mat_type=stator_mat, is_stator=True, is_internal=False)
-    stator_slot = import_class("pyleecan.Classes", inp_slot.get("type"))
-    stator.slot = stator_slot(init_dict=inp_slot["data"])
+    stator.slot = build_slot(inp_slot)
     stator.winding = Winding(is_aper_a=True, p=inp_hole["data"]["Zh"]//2)  #, init_dict=inp_stator["Winding"])
     conductor_mat = material_dict.get(inp_cond["data"]["ConductorMaterial"], -1)
     insulation_mat = material_dict.get(inp_cond["data"]["InsulationMaterial"], -1)
-    stator_conductor = import_class("pyleecan.Classes", inp_cond["type"])
-    stator.winding.conductor = stator_conductor(cond_mat=conductor_mat, ins_mat=insulation_mat, init_dict=inp_cond["data"])
+    stator.winding.conductor = build_conductor(inp_cond, conductor_mat, insulation_mat)
 
     #Frame
     frame_mat = material_dict.get(inp_frame["Material"], -1)
-    frame = Frame(Lfra=inp_frame["FrameLength"], Rint=inp_frame["InternalRadius"], Rext=inp_frame["ExternalRadius"], mat_type=frame_mat)
+    frame = build_frame(inp_housing, frame_mat, "Frame")
 
     #Shaft
     shaft_mat = rotor_mat
-    shaft = Shaft(Drsh=inp_rotor_lam["InternalRadius"]*2, Lshaft=None, mat_type=shaft_mat)
+    shaft = build_shaft(inp_rotor, shaft_mat)
 
     #Create Machine
     machine_dict = {
@@ -0,0 +1,155 @@
+"""
+Per-worker cache of pyleecan components built from Frontend json.
+Slots, holes, conductors, frames and shafts are kept per (component table, id, revision), the revision being a digest
+of the component's type, data and materials, so editing one component rebuilds only that component.
+Laminations and machines are assembled anew on every call from the cached components.
+
+The cache keeps the built components as templates and returns a copy of them on every call, so each machine owns
+its components and machines can be used side by side. Only the materials are shared, they are not modified.
+"""
+
+import copy
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from pyleecan.Classes.Frame import Frame
+from pyleecan.Classes.FrameBar import FrameBar
+from pyleecan.Classes.Shaft import Shaft
+from pyleecan.Functions.Load.import_class import import_class
+
+from utils import metrics
+
+COMPONENT_CACHE_SIZE = int(os.environ.get("PYLEECAN_CACHE_SIZE", 256))
+
+
+@functools.lru_cache(maxsize=None)
+def get_class(type_name):
+    """Returns the class type_name of pyleecan.Classes, imported once per process"""
+    return import_class("pyleecan.Classes", type_name)
+
+
+def get_revision(component, *materials):
+    """
+    Returns a digest of the type and data of a serialized component and of the materials it is built with
+
+    Parameters
+    ----------
+    component: dict
+        {"id", "type", "data"}
+    materials:
+        Pyleecan materials or -1. Cached components reference their materials, so their ids are not reused.
+    """
+    content = json.dumps([component.get("type"), component.get("data")], sort_keys=True, default=str)
+    content += "".join(f":{id(material)}" for material in materials)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class ComponentCache:
+    """
+    Bounded LRU cache of built pyleecan components
+
+    Parameters
+    ----------
+    maxsize: int
+        Number of components kept, the least recently used is evicted first
+    """
+
+    def __init__(self, maxsize=COMPONENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, table, component, build, *materials):
+        """
+        Returns a copy of the component built by build(), built once per table, id and revision
+
+        Parameters
+        ----------
+        table: str
+            Name of the component table, e.g. slot, hole
+        component: dict
+            Serialized component {"id", "type", "data"}
+        build: callable
+            Builds the pyleecan object of component
+        materials:
+            Materials used by build, part of the revision. They are shared with the copy instead of copied.
+        """
+        key = (table, component.get("id"), get_revision(component, *materials))
+        obj = self.entries.get(key)
+        if obj is not None:
+            self.entries.move_to_end(key)
+            metrics.incr("pyleecan_cache.hit")
+        else:
+            metrics.incr("pyleecan_cache.miss")
+            obj = build()
+            self.entries[key] = obj
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                metrics.incr("pyleecan_cache.eviction")
+        # The cached object is never handed out, it would be re-parented into the machine using it
+        return copy.deepcopy(obj, {id(material): material for material in materials})
+
+    def clear(self):
+        self.entries.clear()
+
+
+_local = threading.local()
+
+
+def get_component_cache():
+    """Returns the component cache of the current thread"""
+    if not hasattr(_local, "cache"):
+        _local.cache = ComponentCache()
+    return _local.cache
+
+
+def get_hit_rate():
+    """Returns the share of components served from cache since the counters were reset, None if none was requested"""
+    return metrics.get_ratio("pyleecan_cache.hit", "pyleecan_cache.miss")
+
+
+def build_slot(inp_slot):
+    """Returns the pyleecan slot of a serialized slot"""
+    return get_component_cache().get("slot", inp_slot, lambda: get_class(inp_slot["type"])(init_dict=inp_slot["data"]))
+
+
+def build_hole(inp_hole, mag_mat, air_mat):
+    """Returns the pyleecan hole of a serialized hole, its magnet made of mag_mat"""
+    def build():
+        hole = get_class(inp_hole["type"])(init_dict=inp_hole["data"], mat_void=air_mat)
+        hole.magnet_0.mat_type = mag_mat
+        return hole
+    return get_component_cache().get("hole", inp_hole, build, mag_mat, air_mat)
+
+
+def build_conductor(inp_cond, cond_mat, ins_mat):
+    """Returns the pyleecan conductor of a serialized conductor"""
+    def build():
+        return get_class(inp_cond["type"])(cond_mat=cond_mat, ins_mat=ins_mat, init_dict=inp_cond["data"])
+    return get_component_cache().get("conductor", inp_cond, build, cond_mat, ins_mat)
+
+
+def build_frame(inp_housing, frame_mat, frame_type=None):
+    """Returns the pyleecan Frame or FrameBar of a serialized housing, frame_type defaults to the housing type"""
+    inp_housing = dict(inp_housing, type=frame_type or inp_housing["type"])
+    inp_frame = inp_housing["data"]
+
+    def build():
+        if inp_housing["type"] == "FrameBar":
+            return FrameBar(Nbar=inp_frame["NBar"], wbar=inp_frame["WidthBar"], Lfra=inp_frame["FrameLength"],
+                            Rint=inp_frame["InternalRadius"], Rext=inp_frame["ExternalRadius"], mat_type=frame_mat)
+        return Frame(Lfra=inp_frame["FrameLength"], Rint=inp_frame["InternalRadius"], Rext=inp_frame["ExternalRadius"], mat_type=frame_mat)
+    return get_component_cache().get("housing", inp_housing, build, frame_mat)
+
+
+def build_shaft(inp_rotor, shaft_mat):
+    """Returns the pyleecan Shaft fitting the bore of a serialized rotor"""
+    Drsh = inp_rotor["data"]["InternalRadius"]*2
+    shaft = {"id": inp_rotor.get("id"), "type": "Shaft", "data": Drsh}
+    return get_component_cache().get("shaft", shaft, lambda: Shaft(Drsh=Drsh, Lshaft=None, mat_type=shaft_mat), shaft_mat)
@@ -1,3 +1,9 @@
+import importlib
+import logging
+import pkgutil
+import time
+
+import pyleecan.Classes
 from pyleecan.Classes.MachineIPMSM import MachineIPMSM
 from pyleecan.Classes.MachineWRSM import MachineWRSM
 from pyleecan.Classes.MachineUD import MachineUD
@@ -7,12 +13,49 @@ from .MachineIPMSM import extend_MachineIPMSM
 from .MachineWRSM import extend_MachineWRSM
 from .MachineUD import extend_MachineUD
 
+logger = logging.getLogger(__name__)
+
+# Libraries imported by pyleecan methods on first use
+PRELOAD_MODULES = ("matplotlib.pyplot", "SciDataTool", "swat_em")
+_expanded = False
+
 def expand_pylee_classes():
-    """Adds additional methods to default pyleecan Classes"""
+    """Adds additional methods to default pyleecan Classes, once per process"""
+    global _expanded
+    if _expanded:
+        return
     #Machines
     extend_MachineIPMSM()
     extend_MachineWRSM()
     extend_MachineUD()
+    _expanded = True
+
+def preload_pyleecan():
+    """
+    Imports all pyleecan classes and the libraries their methods use, and patches the classes.
+    Called in the parent of forked workers, which then share the loaded modules.
+
+    Returns
+    -------
+    seconds: float
+        Time spent importing and patching
+    """
+    start = time.perf_counter()
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            logger.warning("Could not preload %s", module)
+    for module in pkgutil.iter_modules(pyleecan.Classes.__path__):
+        if module.name.startswith("_"):
+            continue
+        try:
+            importlib.import_module(f"pyleecan.Classes.{module.name}")
+        except ImportError as err:
+            #Classes depending on platform specific packages, e.g. FEMM on Windows
+            logger.debug("Could not preload pyleecan.Classes.%s: %s", module.name, err)
+    expand_pylee_classes()
+    return time.perf_counter() - start
 
 def get_pylee_machine(inp):
     """
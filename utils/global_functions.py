@@ -1,10 +1,38 @@
 """Contains generic functions that are used by multiple other modules"""
 
+import gzip
+import hashlib
+import io
+import mimetypes
 import os
 import jsonpickle
 import linecache
+import logging
+import threading
+import time
 import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from boto3.s3.transfer import TransferConfig
+
+logger = logging.getLogger(__name__)
+
+# Shared by all transfers. Every copy is a single request below the multipart threshold, which keeps
+# destination ETags equal to the source ETags so unchanged objects can be skipped.
+S3_TRANSFER_CONFIG = TransferConfig(multipart_threshold=64 * 1024 * 1024, max_concurrency=4)
+S3_MAX_WORKERS = 8
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    """Returns a process-wide boto3 S3 client. Clients are thread-safe and reuse their connection pool."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client('s3')
+    return _s3_client
 
 def display_memory_usage(key_type='lineno', limit=10, verbose=False):
     """Displays Total Memory Usage of executed Python code.
@@ -176,7 +204,16 @@ def convert_dict_to_floats(d):
             except (TypeError, ValueError) as e:
                 continue
 
-def s3_upload_dir(path, bucket='ecscohere', bucket_dir='', filter=None):
+def s3_etag(data, config=S3_TRANSFER_CONFIG):
+    """Returns the ETag S3 assigns to data (bytes) when uploaded with config, including multipart ETags"""
+    if len(data) < config.multipart_threshold:
+        return '"%s"' % hashlib.md5(data).hexdigest()
+    chunk = config.multipart_chunksize
+    digests = [hashlib.md5(data[start:start + chunk]).digest() for start in range(0, len(data), chunk)]
+    return '"%s-%d"' % (hashlib.md5(b''.join(digests)).hexdigest(), len(digests))
+
+def s3_upload_dir(path, bucket='ecscohere', bucket_dir='', filter=None, sync=False, compress=False,
+                  max_workers=S3_MAX_WORKERS, raise_errors=True):
     """
     Uploads all files in local directory to s3 bucket
 
@@ -190,16 +227,161 @@ def s3_upload_dir(path, bucket='ecscohere', bucket_dir='', filter=None):
         Bucket Directory files should be uploaded to. default: top level
     filter: str
         Only uploads files matching filter. default: None
+    sync: bool
+        Skips files whose size and ETag already match the bucket. default: False
+    compress: bool
+        Uploads text and json files gzip encoded. default: False
+    max_workers: int
+        Maximum number of concurrent uploads
+    raise_errors: bool
+        Raises S3UploadError once all uploads finished if any failed, instead of only reporting them. default: True
+
+    Returns
+    -------
+    manifest: dict
+        {"uploaded": {key: {"size", "etag", "seconds"}}, "skipped": [keys], "errors": {key: error}}
     """
-    s3C = boto3.client('s3')
-    for root, dirs, files in os.walk(path):
-        for file in files:
+    s3C = get_s3_client()
+    files = {}
+    for root, dirs, file_names in os.walk(path):
+        for file in file_names:
             if filter:
                 if not filter in file:
                     continue
+            files[os.path.join(bucket_dir, file)] = os.path.join(root, file)
+
+    remote = {}
+    if sync and files:
+        # Files are uploaded flat into bucket_dir, only its direct objects are listed
+        prefix = os.path.join(bucket_dir, '')
+        pages = s3C.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix, Delimiter='/')
+        for page in pages:
+            for obj in page.get('Contents', []):
+                remote[obj['Key']] = (obj['Size'], obj['ETag'])
+
+    manifest = {"uploaded": {}, "skipped": [], "errors": {}}
+
+    def upload(bucket_path, file_path):
+        extra_args = {}
+        content_type, _ = mimetypes.guess_type(file_path)
+        if content_type:
+            extra_args['ContentType'] = content_type
+        if compress and is_compressible(content_type):
+            with open(file_path, 'rb') as file:
+                # mtime=0 keeps the compressed bytes, and therefore the ETag, stable between runs
+                data = gzip.compress(file.read(), mtime=0)
+            extra_args['ContentEncoding'] = 'gzip'
+        elif sync:
+            with open(file_path, 'rb') as file:
+                data = file.read()
+        else:
+            data = None
+
+        if data is not None:
+            size, etag = len(data), s3_etag(data)
+            if sync and remote.get(bucket_path) == (size, etag):
+                return None
+        else:
+            size, etag = os.path.getsize(file_path), None
 
-            bucket_path = os.path.join(bucket_dir, file)
-            s3C.upload_file(os.path.join(root, file), bucket, bucket_path)
+        start = time.perf_counter()
+        if data is None:
+            s3C.upload_file(file_path, bucket, bucket_path, ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+        else:
+            s3C.upload_fileobj(io.BytesIO(data), bucket, bucket_path, ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+        return {"size": size, "etag": etag, "seconds": round(time.perf_counter() - start, 4)}
+
+    if files:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+            futures = {key: executor.submit(upload, key, file_path) for key, file_path in files.items()}
+        for key, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as err:
+                manifest["errors"][key] = str(err)
+                logger.warning("Uploading %s failed: %s", key, err)
+                continue
+            if result is None:
+                manifest["skipped"].append(key)
+            else:
+                manifest["uploaded"][key] = result
+    if raise_errors and manifest["errors"]:
+        raise S3UploadError(manifest)
+    return manifest
+
+def is_compressible(content_type):
+    """Returns True for text, json, xml and svg content types"""
+    if not content_type:
+        return False
+    return content_type.startswith('text/') or content_type.split('/')[-1] in ('json', 'xml', 'svg+xml', 'javascript')
+
+def s3_list_etags(bucket, prefix, s3C=None):
+    """Returns {key: ETag} of all objects under prefix in bucket"""
+    s3C = s3C or get_s3_client()
+    etags = {}
+    for page in s3C.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            etags[obj['Key']] = obj['ETag']
+    return etags
+
+def s3_copy_prefix(bucket, prefix, get_dest_key, dest_bucket=None, max_workers=S3_MAX_WORKERS, s3C=None):
+    """
+    Copies all objects under prefix concurrently. Objects whose ETag already matches at the destination are skipped.
+
+    Parameters
+    ----------
+    bucket: str
+        Source bucket
+    prefix: str
+        Source key prefix
+    get_dest_key: callable
+        Maps a source key to its destination key
+    dest_bucket: str
+        Destination bucket, default: bucket
+    max_workers: int
+        Maximum number of concurrent copies
+    s3C: botocore client
+        default: process-wide client
+
+    Returns
+    -------
+    report: dict
+        {"copied": [dest keys], "skipped": [dest keys], "errors": {dest key: error}, "timings": {dest key: s}}
+    """
+    s3C = s3C or get_s3_client()
+    dest_bucket = dest_bucket or bucket
+    sources = s3_list_etags(bucket, prefix, s3C)
+    dest_keys = {key: get_dest_key(key) for key in sources}
+    dest_prefix = os.path.commonprefix(list(dest_keys.values())) if dest_keys else ''
+    dest_etags = s3_list_etags(dest_bucket, dest_prefix, s3C) if dest_keys else {}
+
+    report = {"copied": [], "skipped": [], "errors": {}, "timings": {}}
+    pending = []
+    for key, etag in sources.items():
+        if dest_etags.get(dest_keys[key]) == etag:
+            report["skipped"].append(dest_keys[key])
+        else:
+            pending.append(key)
+
+    def copy(key):
+        start = time.perf_counter()
+        s3C.copy({"Bucket": bucket, "Key": key}, dest_bucket, dest_keys[key], Config=S3_TRANSFER_CONFIG)
+        return time.perf_counter() - start
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {key: executor.submit(copy, key) for key in pending}
+        for key, future in futures.items():
+            dest_key = dest_keys[key]
+            try:
+                report["timings"][dest_key] = round(future.result(), 4)
+                report["copied"].append(dest_key)
+            except Exception as err:
+                report["errors"][dest_key] = str(err)
+                logger.warning("Copying %s to %s failed: %s", key, dest_key, err)
+    logger.info("Copied %d, skipped %d, failed %d objects under %s",
+                len(report["copied"]), len(report["skipped"]), len(report["errors"]), prefix)
+    return report
 
 def setup_input(inp):
     """
@@ -289,4 +471,11 @@ def check_input(inp):
 class InvalidInputError(Exception):
     """Raise when invalid input is received from Frontend/Database"""
 
+class S3UploadError(Exception):
+    """Raised by s3_upload_dir when uploads failed, the manifest of all uploads is kept as manifest"""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        super().__init__(f"{len(manifest['errors'])} uploads failed: {', '.join(sorted(manifest['errors']))}")
+
 
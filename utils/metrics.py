@@ -0,0 +1,39 @@
+"""Process-local counters for hot paths"""
+
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def incr(name, value=1):
+    """Increments counter name by value"""
+    with _lock:
+        _counters[name] += value
+
+
+def set_value(name, value):
+    """Sets counter name to value, e.g. a duration measured once per process"""
+    with _lock:
+        _counters[name] = value
+
+
+def get_counters():
+    """Returns a copy of all counters"""
+    with _lock:
+        return dict(_counters)
+
+
+def get_ratio(hit_name, miss_name):
+    """Returns hits / (hits + misses) of two counters, None if both are zero"""
+    with _lock:
+        hits = _counters[hit_name]
+        total = hits + _counters[miss_name]
+    return hits / total if total else None
+
+
+def reset():
+    """Clears all counters"""
+    with _lock:
+        _counters.clear()
@@ -1,31 +1,184 @@
 """Generic Plotting Functions"""
 import os
+import io
+import json
+import hashlib
+import logging
+import threading
 import matplotlib as mpl
-import boto3
+import matplotlib.pyplot as plt
+from botocore.exceptions import ClientError
 
 from pyleecan.Classes.MachineUD import MachineUD
 from pylee_ext.main import expand_pylee_classes, get_pylee_machine
-from utils.global_functions import convert_dict_to_floats, setup_input
+from utils.global_functions import get_s3_client
+from utils.schema import coerce_machine
+from utils import metrics, profiling
 
-def create_axial_slice(machine_dict):
+logger = logging.getLogger(__name__)
+
+# Increase when the plot output changes for an unchanged geometry
+GEOMETRY_HASH_VERSION = 2
+# Components whose type and data are drawn in the axial slice
+GEOMETRY_COMPONENTS = {
+    "rotor": ("slot", "hole", "conductor"),
+    "stator": ("slot", "conductor"),
+    "housing": (),
+}
+# Supported image formats and their content types
+PLOT_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+MAX_PLOT_DPI = 600
+# pyplot keeps the current figure in global state
+_plot_lock = threading.Lock()
+
+def get_axial_slice_key(machine_id, img_format="png", dpi=None):
+    """
+    Returns S3 key of the axial slice image of a machine
+
+    Parameters
+    ----------
+    machine_id: int or str
+        Machine id or folder of the image
+    img_format: {'png', 'svg'}
+    dpi: int
+        Resolution of the image, matplotlib default if None
+
+    Returns
+    -------
+    img_key: str
+    """
+    if img_format not in PLOT_FORMATS:
+        raise ValueError(f"Unsupported image format {img_format}. Supported formats: {', '.join(PLOT_FORMATS)}")
+    if dpi is not None and not 0 < dpi <= MAX_PLOT_DPI:
+        raise ValueError(f"dpi must be between 1 and {MAX_PLOT_DPI}")
+    suffix = "" if dpi is None else f"_{dpi}dpi"
+    return f"{machine_id}/MachinePlot{suffix}.{img_format}"
+
+def render_plot(machine, img_format="png", dpi=None):
+    """
+    Plots machine into an in-memory buffer
+
+    Parameters
+    ----------
+    machine: Machine
+        Pyleecan machine
+    img_format: {'png', 'svg'}
+    dpi: int
+        Resolution of the image, matplotlib default if None
+
+    Returns
+    -------
+    buffer: io.BytesIO
+        Rendered image, positioned at its start
+    """
+    buffer = io.BytesIO()
+    with _plot_lock:
+        machine.plot(is_show_fig=False)
+        fig = plt.gcf()
+        try:
+            fig.savefig(buffer, format=img_format, dpi=dpi)
+        finally:
+            plt.close(fig)
+    buffer.seek(0)
+    return buffer
+
+def get_geometry_dict(machine_dict):
+    """
+    Extracts the geometry relevant subset of a machine
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Machine input after coerce_machine
+
+    Returns
+    -------
+    geometry: dict
+        Type and data of rotor, stator, housing and their slots, holes and conductors
+    """
+    geometry = {"type": machine_dict.get("type")}
+    for part, children in GEOMETRY_COMPONENTS.items():
+        inp_part = machine_dict.get(part) or {}
+        geometry[part] = {"type": inp_part.get("type"), "data": inp_part.get("data")}
+        for child in children:
+            inp_child = inp_part.get(child)
+            if inp_child:
+                geometry[part][child] = {"type": inp_child.get("type"), "data": inp_child.get("data")}
+            else:
+                geometry[part][child] = None
+    return geometry
+
+def get_geometry_hash(machine_dict):
+    """Returns canonical sha256 hash of the geometry relevant subset of machine_dict"""
+    geometry = get_geometry_dict(machine_dict)
+    geometry["version"] = GEOMETRY_HASH_VERSION
+    geometry_json = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(geometry_json.encode()).hexdigest()
+
+def get_cached_axial_slice(s3, bucket, manifest_key, geometry_hash):
+    """Returns stored manifest of the last render if it was rendered from geometry_hash, else None"""
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=manifest_key)
+    except ClientError:
+        return None
+    manifest = json.loads(obj["Body"].read())
+    if manifest.get("geometry_hash") != geometry_hash:
+        return None
+    return manifest
+
+def create_axial_slice(machine_dict, img_format="png", dpi=None, img_dir=None):
     """
     Checks if machine input is valid and generates 2D axial view of machine
+    Skips checking, plotting and uploading if the stored image was rendered from the same geometry
 
     Parameters
     ----------
     machine_dict: dict
         Machine Input from Frontend
+    img_format: {'png', 'svg'}
+        Image format
+    dpi: int
+        Resolution of the image, matplotlib default if None
+    img_dir: str
+        Folder of the image in the bucket, default: the machine id
 
     Returns
     -------
     img_dict: dict
         Contains S3 image location, validity of machine dimensions, error msg (optional)
     """
+    machine_dict = coerce_machine(machine_dict)
+
+    bucket = os.environ["BUCKET_NAME"]
+    id = machine_dict['id']
+    img_key = get_axial_slice_key(img_dir or id, img_format, dpi)
+    manifest_key = os.path.splitext(img_key)[0] + ".json"
+    s3_img_path = f"s3://{bucket}/{img_key}"
+    s3 = get_s3_client()
+
+    #Return stored image if geometry is unchanged
+    geometry_hash = get_geometry_hash(machine_dict)
+    manifest = get_cached_axial_slice(s3, bucket, manifest_key, geometry_hash)
+    if manifest is not None:
+        metrics.incr("axial_slice.cache_hit")
+        logger.info("Axial slice cache hit for machine %s", id)
+        img_dict = {
+            "valid_machine": manifest["valid_machine"],
+            "img_loc": s3_img_path
+        }
+        if manifest.get("error") is not None:
+            img_dict["error"] = manifest["error"]
+        return img_dict
+    metrics.incr("axial_slice.cache_miss")
+    logger.info("Axial slice cache miss for machine %s", id)
+
     expand_pylee_classes()
-    convert_dict_to_floats(machine_dict)
-    setup_input(machine_dict)
     machine = get_pylee_machine(machine_dict)
-    machine = machine.json_to_pyleecan(machine_dict)
+    with profiling.span("pyleecan_build"):
+        machine = machine.json_to_pyleecan(machine_dict)
 
     #Convert user input to pyleecan format
     # machine_dict = json.load(os.path.join('Debug', 'machine.json'))
@@ -34,6 +187,7 @@ def create_axial_slice(machine_dict):
 
     #Check machine
     valid_machine = True
+    err_msg = None
     try:
         if isinstance(machine, MachineUD):
             machine.check(machine_dict)
@@ -44,20 +198,18 @@ def create_axial_slice(machine_dict):
         err_msg = str(err)
 
     #Plot machine
-    os.makedirs('temp', exist_ok=True)
-    img_path = os.path.join('temp', 'MachinePlot.png')
-    machine.plot(save_path=img_path, is_show_fig=False)
+    with profiling.span("plot"):
+        img_buffer = render_plot(machine, img_format, dpi)
 
-    #Upload image to S3
-    bucket = os.environ["BUCKET_NAME"]
-    id = machine_dict['id']
-    s3_img_path = f"s3://{bucket}/{id}/MachinePlot.png"
-    s3 = boto3.resource('s3')
-    s3.meta.client.upload_file(img_path, f"{bucket}", f"{id}/MachinePlot.png")
-
-    #Delete Local Plot
-    if os.path.exists(img_path):
-        os.remove(img_path)
+    #Upload image and geometry hash to S3
+    extra_args = {"Metadata": {"geometry-hash": geometry_hash}, "ContentType": PLOT_FORMATS[img_format]}
+    s3.upload_fileobj(img_buffer, bucket, img_key, ExtraArgs=extra_args)
+    manifest = {
+        "geometry_hash": geometry_hash,
+        "valid_machine": valid_machine,
+        "error": err_msg
+    }
+    s3.put_object(Bucket=bucket, Key=manifest_key, Body=json.dumps(manifest).encode(), ContentType="application/json")
 
     img_dict = {
         "valid_machine": valid_machine,
@@ -90,4 +242,4 @@ def get_temp_color(t, t_min=0.0, t_max=100.0, cmap='jet'):
     if t > t_max:
         raise ValueError("Current temperature is above maximum temperature")
     t_norm = (t-t_min)/(t_max-t_min)
-    return temp_map(t_norm)
\ No newline at end of file
+    return temp_map(t_norm)
@@ -0,0 +1,206 @@
+"""
+Opt-in profiling of sampled requests.
+ProfilingMiddleware records wall time, SQL queries, serializer and pyleecan time and optionally the tracemalloc peak
+of a share of the requests, returns them in a Server-Timing header and aggregates percentiles per view action.
+The queries and serialization of streaming responses run while their content is sent, after the view returned.
+They are only part of the aggregated stats, as "stream" time, since the headers have been sent by then.
+"""
+
+import contextlib
+import contextvars
+import math
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+# Number of most recent requests per action the percentiles are computed from
+STATS_WINDOW = 1000
+# Action of requests not resolved to a view, e.g. 404s, so their stats do not grow with the requested urls
+UNRESOLVED = "unresolved"
+
+_profile = contextvars.ContextVar("profile", default=None)
+# tracemalloc is process-wide, only one request is traced at a time
+_trace_lock = threading.Lock()
+
+
+def percentile(values, q):
+    """Returns the nearest-rank q-th percentile of values"""
+    values = sorted(values)
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+class Profile:
+    """Timings in ms and counters of one request"""
+
+    def __init__(self):
+        self.action = None
+        self.timings = {}
+        self.queries = 0
+        self.peak_kb = None
+
+    def add(self, name, ms):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def execute(self, execute, sql, params, many, context):
+        """Execute wrapper timing the SQL queries of the request"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add("db", (time.perf_counter() - start) * 1000)
+
+    def get_metrics(self):
+        """Returns {metric: value} of the request, e.g. for the aggregated stats"""
+        metrics = dict(self.timings, queries=self.queries)
+        if self.peak_kb is not None:
+            metrics["peak_kb"] = self.peak_kb
+        return metrics
+
+    def server_timing(self):
+        """Returns the value of the Server-Timing header"""
+        entries = []
+        for name, ms in self.timings.items():
+            description = f';desc="{self.queries} queries"' if name == "db" else ""
+            entries.append(f"{name};dur={ms:.1f}{description}")
+        if self.peak_kb is not None:
+            entries.append(f'mem;desc="peak {self.peak_kb:.0f} kB"')
+        return ", ".join(entries)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Adds the time spent in the block to the timing name of the profiled request, if any"""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, (time.perf_counter() - start) * 1000)
+
+
+class RequestStats:
+    """Metrics of the most recent profiled requests per view action, kept per process"""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = {}
+
+    def record(self, action, metrics):
+        with self._lock:
+            self._requests.setdefault(action, deque(maxlen=self.window)).append(metrics)
+
+    def summary(self):
+        """
+        Returns the percentiles of each metric per action
+
+        Returns
+        -------
+        summary: dict
+            {action: {"count": profiled requests, metric: {"p50", "p95", "p99"}}}, times in ms
+        """
+        with self._lock:
+            requests = {action: list(values) for action, values in self._requests.items()}
+        summary = {}
+        for action, values in requests.items():
+            names = sorted({name for metrics in values for name in metrics})
+            summary[action] = {"count": len(values)}
+            for name in names:
+                samples = [metrics.get(name, 0) for metrics in values]
+                summary[action][name] = {f"p{q}": round(percentile(samples, q), 3) for q in (50, 95, 99)}
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+
+
+request_stats = RequestStats()
+
+
+def get_view_name(view_func, method):
+    """Returns the name of a view, ViewSet.action for Django REST framework viewsets"""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{cls.__name__}.{actions.get(method.lower(), method.lower())}"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a share of the requests, set by REQUEST_PROFILING_SAMPLE_RATE.
+    Only active if REQUEST_PROFILING is set, tracemalloc peaks are recorded if REQUEST_PROFILING_TRACEMALLOC is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        self.trace_memory = settings.REQUEST_PROFILING_TRACEMALLOC
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = Profile()
+        token = _profile.set(profile)
+        traced = self.trace_memory and _trace_lock.acquire(blocking=False)
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile.execute):
+                response = self.get_response(request)
+        finally:
+            profile.add("total", (time.perf_counter() - start) * 1000)
+            if traced:
+                profile.peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+                tracemalloc.stop()
+                _trace_lock.release()
+            _profile.reset(token)
+
+        response["Server-Timing"] = profile.server_timing()
+        if response.streaming:
+            response.streaming_content = self.profile_stream(profile, response.streaming_content)
+        else:
+            request_stats.record(profile.action or UNRESOLVED, profile.get_metrics())
+        return response
+
+    @staticmethod
+    def profile_stream(profile, content):
+        """Yields the chunks of content, profiling their production, and records the request once it is sent"""
+        content = iter(content)
+        try:
+            while True:
+                token = _profile.set(profile)
+                start = time.perf_counter()
+                try:
+                    with connection.execute_wrapper(profile.execute):
+                        chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    ms = (time.perf_counter() - start) * 1000
+                    profile.add("stream", ms)
+                    profile.add("total", ms)
+                    _profile.reset(token)
+                yield chunk
+        finally:
+            request_stats.record(profile.action or UNRESOLVED, profile.get_metrics())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _profile.get()
+        if profile is not None:
+            profile.action = get_view_name(view_func, request.method)
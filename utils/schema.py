@@ -0,0 +1,313 @@
+"""
+Validation and coercion of serialized machines in a single pass.
+Schemas of slots, holes, conductors and windings are compiled from the property checks of the pyleecan class
+named by the component type, laminations and frames have explicit schemas.
+"""
+
+import functools
+import importlib
+import inspect
+import math
+import pkgutil
+import re
+
+from utils.global_functions import InvalidInputError
+
+# Matches the setters of pyleecan's generated classes, e.g. check_var("Zs", value, "int", Vmin=0)
+CHECK_VAR = re.compile(r'check_var\(\s*"(\w+)",\s*value,\s*"(\w+)"([^)]*)\)')
+BOUND = re.compile(r'(Vmin|Vmax)=([-+\w.]+)')
+SCALAR_KINDS = ("float", "int", "bool", "str")
+
+
+class Field:
+    """
+    Expected kind and bounds of a value
+
+    Parameters
+    ----------
+    kind: {'float', 'int', 'bool', 'str'}
+    vmin, vmax: float
+        Inclusive bounds of numbers
+    required: bool
+        Reported as missing by validate_machine if absent
+    """
+
+    def __init__(self, kind, vmin=None, vmax=None, required=False):
+        self.kind = kind
+        self.vmin = vmin
+        self.vmax = vmax
+        self.required = required
+
+    def coerce(self, value):
+        """Returns value converted to kind. Raises ValueError with a message if not possible or out of bounds."""
+        if value is None:
+            return None
+        if self.kind == "str":
+            if not isinstance(value, str):
+                raise ValueError(f"expected a string, got {value!r}")
+            return value
+        if self.kind == "bool":
+            if isinstance(value, bool):
+                return value
+            if value in ("true", "false", "True", "False", 0, 1):
+                return value in ("true", "True", 1)
+            raise ValueError(f"expected a boolean, got {value!r}")
+        if isinstance(value, bool):
+            raise ValueError(f"expected a number, got {value!r}")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"expected a number, got {value!r}")
+        # nan passes every bound check
+        if not math.isfinite(number):
+            raise ValueError(f"expected a finite number, got {value!r}")
+        if self.kind == "int":
+            if not number.is_integer():
+                raise ValueError(f"expected an integer, got {value!r}")
+            number = int(number)
+        if self.vmin is not None and number < self.vmin:
+            raise ValueError(f"must be >= {self.vmin}, got {number}")
+        if self.vmax is not None and number > self.vmax:
+            raise ValueError(f"must be <= {self.vmax}, got {number}")
+        return number
+
+
+LAMINATION_SCHEMA = {
+    "CoreLength": Field("float", vmin=0, required=True),
+    "ExternalRadius": Field("float", vmin=0, required=True),
+    "InternalRadius": Field("float", vmin=0, required=True),
+    "PackingFactor": Field("float", vmin=0, vmax=1, required=True),
+    "Material": Field("str", required=True),
+}
+FRAME_SCHEMA = {
+    "FrameLength": Field("float", vmin=0, required=True),
+    "ExternalRadius": Field("float", vmin=0, required=True),
+    "InternalRadius": Field("float", vmin=0, required=True),
+    "Material": Field("str", required=True),
+}
+HOUSING_SCHEMAS = {
+    "Frame": FRAME_SCHEMA,
+    "FrameBar": dict(FRAME_SCHEMA, NBar=Field("int", vmin=1, required=True), WidthBar=Field("float", vmin=0, required=True)),
+}
+# Frontend fields of pyleecan components that are not pyleecan properties
+EXTRA_FIELDS = {
+    "hole": {"Material": Field("str", required=True)},
+    "conductor": {"ConductorMaterial": Field("str", required=True), "InsulationMaterial": Field("str", required=True)},
+}
+# Database id of a serialized component
+ID_FIELD = Field("int", vmin=1)
+PYLEECAN_COMPONENTS = {"stator": ("slot", "winding", "conductor"), "rotor": ("slot", "winding", "conductor", "hole")}
+# Pyleecan classes serialized components can be of
+COMPONENT_CLASS_PREFIXES = ("Slot", "Hole", "Cond", "Winding")
+
+
+@functools.lru_cache(maxsize=None)
+def get_pyleecan_schema(type_name):
+    """
+    Returns {property: Field} of the pyleecan class type_name, compiled once per process
+
+    Parameters
+    ----------
+    type_name: str
+        Name of a class in pyleecan.Classes, e.g. SlotW11
+
+    Returns
+    -------
+    schema: dict
+        Scalar properties of the class and its pyleecan base classes.
+        None if pyleecan is not installed or installed without its sources.
+    """
+    try:
+        importlib.import_module("pyleecan")
+    except ImportError:
+        return None
+    if not re.fullmatch(r"\w+", type_name):
+        raise KeyError(type_name)
+    try:
+        cls = getattr(importlib.import_module(f"pyleecan.Classes.{type_name}"), type_name)
+    except (ImportError, AttributeError):
+        raise KeyError(type_name)
+
+    schema = {}
+    for base in reversed(cls.__mro__):
+        if not base.__module__.startswith("pyleecan.Classes."):
+            continue
+        try:
+            source = inspect.getsource(base)
+        except (OSError, TypeError):
+            return None
+        for name, kind, args in CHECK_VAR.findall(source):
+            if kind not in SCALAR_KINDS:
+                schema.pop(name, None)
+                continue
+            bounds = {key: float(value) for key, value in BOUND.findall(args)}
+            schema[name] = Field(kind, bounds.get("Vmin"), bounds.get("Vmax"))
+    return schema
+
+
+def compile_schemas():
+    """Compiles the schemas of every pyleecan class a component can be of, e.g. before workers are forked"""
+    try:
+        classes = importlib.import_module("pyleecan.Classes")
+    except ImportError:
+        return
+    for module in pkgutil.iter_modules(classes.__path__):
+        if module.name.startswith(COMPONENT_CLASS_PREFIXES):
+            try:
+                get_pyleecan_schema(module.name)
+            except KeyError:
+                continue
+
+
+def coerce_loose(value):
+    """Converts numeric leaves of nested dicts to float, like convert_dict_to_floats, returning a copy"""
+    if isinstance(value, dict):
+        return {key: coerce_loose(item) for key, item in value.items()}
+    if isinstance(value, bool) or value is None or isinstance(value, list):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class MachineValidator:
+    """Single pass over a serialized machine, collecting errors and missing fields with their paths"""
+
+    def __init__(self):
+        self.errors = []
+        self.missing = []
+
+    def coerce_data(self, data, schema, path):
+        if data is None:
+            return None
+        if not isinstance(data, dict):
+            self.errors.append({"path": path, "message": "expected an object"})
+            return data
+        result = {}
+        for key, value in data.items():
+            field = schema.get(key)
+            if field is None:
+                result[key] = coerce_loose(value)
+                continue
+            try:
+                result[key] = field.coerce(value)
+            except ValueError as err:
+                self.errors.append({"path": f"{path}.{key}", "message": str(err)})
+                result[key] = value
+        for key, field in schema.items():
+            if field.required and data.get(key) is None:
+                self.missing.append(f"{path}.{key}")
+        return result
+
+    def coerce_component(self, component, schema, path):
+        """Coerces id and data of a {"id", "type", "data"} component with schema"""
+        if component is None:
+            return None
+        if not isinstance(component, dict):
+            self.errors.append({"path": path, "message": "expected an object"})
+            return component
+        result = dict(component)
+        try:
+            if result.get("id") is not None:
+                result["id"] = ID_FIELD.coerce(result["id"])
+        except ValueError as err:
+            self.errors.append({"path": f"{path}.id", "message": str(err)})
+        if schema is None:
+            result["data"] = coerce_loose(component.get("data"))
+        else:
+            result["data"] = self.coerce_data(component.get("data"), schema, f"{path}.data")
+        return result
+
+    def get_child_schema(self, child, component, path):
+        type_name = component.get("type") if isinstance(component, dict) else None
+        if type_name is None:
+            return {}
+        try:
+            schema = get_pyleecan_schema(type_name)
+        except KeyError:
+            self.errors.append({"path": f"{path}.type", "message": f"unknown type {type_name!r}"})
+            return None
+        if schema is None:
+            return None
+        return dict(schema, **EXTRA_FIELDS.get(child, {}))
+
+    def coerce_machine(self, machine_dict):
+        result = {}
+        for key, value in machine_dict.items():
+            if key in PYLEECAN_COMPONENTS:
+                lamination = value
+                if not isinstance(lamination, dict):
+                    result[key] = self.coerce_component(lamination, None, key)
+                    continue
+                schema = LAMINATION_SCHEMA if lamination.get("type") is not None else {}
+                result[key] = self.coerce_component(lamination, schema, key)
+                for child in PYLEECAN_COMPONENTS[key]:
+                    if child in lamination:
+                        path = f"{key}.{child}"
+                        child_schema = self.get_child_schema(child, lamination[child], path)
+                        result[key][child] = self.coerce_component(lamination[child], child_schema, path)
+            elif key == "housing":
+                type_name = (value or {}).get("type")
+                result[key] = self.coerce_component(value, HOUSING_SCHEMAS.get(type_name, {}), key)
+            elif key in ("cooling", "loss"):
+                result[key] = coerce_loose(value)
+            elif key == "id":
+                result[key] = int(value) if value is not None else None
+            else:
+                result[key] = value
+        result["type"] = get_machine_type(result)
+        return result
+
+
+def get_machine_type(machine_dict):
+    """Returns IPMSM or WRSM for the rotor and stator types of machine_dict, None otherwise"""
+    rotor_type = (machine_dict.get("rotor") or {}).get("type")
+    stator_type = (machine_dict.get("stator") or {}).get("type")
+    if rotor_type == "LamHole" and stator_type == "LamSlot":
+        return "IPMSM"
+    if rotor_type == "LamSlot" and stator_type == "LamSlot":
+        return "WRSM"
+    return None
+
+
+class SchemaError(InvalidInputError):
+    """Raised when values of a machine cannot be coerced, errors holds [{"path", "message"}]"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("ERROR: Invalid input\n" + "\n".join(f"{e['path']}: {e['message']}" for e in errors))
+
+
+def validate_machine(machine_dict):
+    """
+    Validates a serialized machine without raising
+
+    Parameters
+    ----------
+    machine_dict: dict
+        Machine serialized by GetMachineSerializer
+
+    Returns
+    -------
+    machine: dict
+        Coerced copy of machine_dict
+    errors: list
+        [{"path", "message"}] of values that could not be coerced
+    missing: list
+        Paths of required values that are not set
+    """
+    validator = MachineValidator()
+    machine = validator.coerce_machine(machine_dict)
+    return machine, validator.errors, validator.missing
+
+
+def coerce_machine(machine_dict):
+    """
+    Returns a copy of a serialized machine with every value converted to the type its component expects.
+    Replaces convert_dict_to_floats and setup_input. Raises SchemaError listing every invalid value.
+    """
+    machine, errors, _ = validate_machine(machine_dict)
+    if errors:
+        raise SchemaError(errors)
+    return machine